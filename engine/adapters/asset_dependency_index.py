@@ -0,0 +1,172 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from adapters.logger import Logger
+from domain.entities import Asset, Shot
+from infra.config import Config
+
+logger = Logger()
+
+
+def descripcion_hash(asset: Asset) -> str:
+    """Short hash of the catalog text that goes into a shot's prompt."""
+    return hashlib.sha256(asset.descripcion_visual.encode("utf-8")).hexdigest()[:16]
+
+
+def shot_key(video_id: str, block_id: str, shot_id: str) -> str:
+    return f"{video_id}/{block_id}/{shot_id}"
+
+
+class AssetUsage(BaseModel):
+    """A shot generated from a catalog asset, and the asset version it used"""
+    video_id: str
+    block_id: str
+    shot_id: str
+    content_hash: Optional[str] = None
+    descripcion_hash: Optional[str] = None
+    recorded_at: float = 0.0
+    stale: bool = False
+    stale_reasons: List[str] = []
+
+
+class AssetDependencyIndex:
+    """
+    Reverse index asset_id -> shots generated with it, persisted as JSON.
+
+    Each link records the asset file hash and the descripcion_visual hash at generation time,
+    so after a catalog edit exactly the shots built from the old version can be found.
+    Writes are read-modify-write under a file lock, so several workers can share the file.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or Config.ASSET_DEPENDENCY_INDEX_PATH)
+        self._lock = threading.Lock()
+        self._by_asset: Dict[str, Dict[str, dict]] = {}
+        self._asset_of: Dict[str, str] = {}  # shot key -> asset_id
+        self._loaded_stat: Optional[tuple] = None  # (inode, mtime_ns, size) of the version in memory
+
+    def record(self, shot: Shot) -> None:
+        """Links the shot to its asset (dropping any previous link of the same shot)."""
+        key = shot_key(shot.video_id, shot.block_id, shot.shot_id)
+        with self._lock, self._file_lock():
+            self._refresh()
+            self._unlink(key)
+            if shot.asset_id:
+                self._by_asset.setdefault(shot.asset_id, {})[key] = {
+                    "content_hash": shot.asset_content_hash,
+                    "descripcion_hash": shot.asset_descripcion_hash,
+                    "recorded_at": time.time(),
+                }
+                self._asset_of[key] = shot.asset_id
+            self._save()
+
+    def usages(self, asset_id: str, asset: Optional[Asset] = None,
+               content_hash: Optional[str] = None) -> List[AssetUsage]:
+        """
+        Shots that used the asset. With the current catalog entry / file hash, each usage is
+        flagged stale when it was generated from a different version.
+        """
+        with self._lock:
+            self._refresh()
+            links = dict(self._by_asset.get(asset_id, {}))
+
+        current_descripcion = descripcion_hash(asset) if asset else None
+        result = []
+        for key, link in sorted(links.items()):
+            video_id, block_id, shot_id = key.split("/", 2)
+            reasons = []
+            if asset is None:
+                reasons.append("asset_removed")
+            else:
+                if content_hash and link.get("content_hash") != content_hash:
+                    reasons.append("image_changed")
+                if link.get("descripcion_hash") != current_descripcion:
+                    reasons.append("descripcion_changed")
+            result.append(AssetUsage(video_id=video_id, block_id=block_id, shot_id=shot_id,
+                                     content_hash=link.get("content_hash"),
+                                     descripcion_hash=link.get("descripcion_hash"),
+                                     recorded_at=link.get("recorded_at", 0.0),
+                                     stale=bool(reasons), stale_reasons=reasons))
+        return result
+
+    def rebuild(self, videos_dir: Path) -> int:
+        """
+        Recreates the index from the metadata.json files under videos_dir (for shots generated
+        before the index existed). Returns the number of linked shots.
+        """
+        by_asset: Dict[str, Dict[str, dict]] = {}
+        asset_of: Dict[str, str] = {}
+        for metadata_path in Path(videos_dir).glob("*/block_*/shot_*/metadata.json"):
+            try:
+                data = json.loads(metadata_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable {metadata_path}: {e}")
+                continue
+            if not data.get("asset_id") or data.get("estado") != "COMPLETADO":
+                continue
+            key = shot_key(data["video_id"], data["block_id"], data["shot_id"])
+            by_asset.setdefault(data["asset_id"], {})[key] = {
+                "content_hash": data.get("asset_content_hash"),
+                "descripcion_hash": data.get("asset_descripcion_hash"),
+                "recorded_at": metadata_path.stat().st_mtime,
+            }
+            asset_of[key] = data["asset_id"]
+
+        with self._lock, self._file_lock():
+            self._by_asset, self._asset_of = by_asset, asset_of
+            self._save()
+        logger.info(f"Rebuilt asset dependency index: {len(asset_of)} shots, {len(by_asset)} assets")
+        return len(asset_of)
+
+    def _unlink(self, key: str) -> None:
+        previous = self._asset_of.pop(key, None)
+        if previous is not None:
+            shots = self._by_asset.get(previous, {})
+            shots.pop(key, None)
+            if not shots:
+                self._by_asset.pop(previous, None)
+
+    def _refresh(self) -> None:
+        """Re-reads the file if another worker changed it since we last loaded/saved it."""
+        try:
+            stat = self._stat()
+        except FileNotFoundError:
+            return
+        if stat == self._loaded_stat:
+            return
+        try:
+            by_asset = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read asset dependency index {self.path}: {e}")
+            return
+        self._by_asset = by_asset
+        self._asset_of = {key: asset_id for asset_id, shots in by_asset.items() for key in shots}
+        self._loaded_stat = stat
+
+    def _save(self) -> None:
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._by_asset, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+        self._loaded_stat = self._stat()
+
+    def _stat(self) -> tuple:
+        # Every save replaces the file, so the inode changes even within one mtime tick
+        stat = self.path.stat()
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.path.parent, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
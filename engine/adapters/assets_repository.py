@@ -1,69 +1,446 @@
+import base64
+import bisect
+import fcntl
+import hashlib
 import json
 import os
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Optional, List
+from typing import Dict, Iterator, Mapping, NamedTuple, Optional, List, Set
 from domain.entities import Asset
+from adapters.catalog_index import CatalogIndex, build_catalog_index
 from adapters.logger import Logger
+from infra.config import Config
+from infra.hashing import file_sha256
+from infra.metrics import metrics
+from infra.text import tokenize
+
+# Extensions to resolve, in priority order
+FILE_EXTENSIONS = [".jpeg", ".jpg", ".png"]
+
+
+class AssetFile(NamedTuple):
+    """Indexed physical file of a catalog asset"""
+    stem: str
+    path: Path
+    size: int
+    mtime_ns: int
+    content_hash: Optional[str] = None  # filled lazily, see AssetsRepository.get_file_entry
+
+
+class SecondaryIndexes(NamedTuple):
+    """Sorted id lists per mv_context_default / tipo_asset and a keyword inverted index"""
+    sorted_ids: List[str]
+    by_context: Dict[str, List[str]]
+    by_tipo: Dict[str, List[str]]
+    by_token: Dict[str, Set[str]]
+
+
+class CatalogSnapshot:
+    """
+    Immutable view of one version of assets.json. Swapped as a whole on reload.
+    `assets` is either a plain dict or the memory-mapped CatalogIndex shared by all workers.
+    Secondary indexes are built once per version, on first query, so queries never rescan the catalog.
+    Readers pin the snapshot they use (acquire / release); a replaced snapshot is retired and its
+    memory-mapped index closed once its last reader is done.
+    """
+    def __init__(self, assets: Mapping[str, Asset], mtime_ns: int, size: int, content_hash: str):
+        self.assets = assets
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.content_hash = content_hash
+        self.loaded_at = time.time()
+        self._indexes: Optional[SecondaryIndexes] = None
+        self._indexes_lock = threading.Lock()
+        self._readers = 0
+        self._retired = False
+        self._close_assets = False
+        self._readers_lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._readers_lock:
+            self._readers += 1
+
+    def release(self) -> None:
+        with self._readers_lock:
+            self._readers -= 1
+            done = self._retired and self._readers == 0
+        if done:
+            self._close()
+
+    def retire(self, close_assets: bool) -> None:
+        """Replaced by a newer version; `close_assets` is False when the new one reuses the same index."""
+        with self._readers_lock:
+            self._retired = True
+            self._close_assets = close_assets
+            done = self._readers == 0
+        if done:
+            self._close()
+
+    def _close(self) -> None:
+        if self._close_assets and isinstance(self.assets, CatalogIndex):
+            self.assets.close()
+
+    def indexes(self) -> SecondaryIndexes:
+        if self._indexes is None:
+            with self._indexes_lock:
+                if self._indexes is None:
+                    self._indexes = self._build_indexes()
+        return self._indexes
+
+    def _build_indexes(self) -> SecondaryIndexes:
+        sorted_ids: List[str] = sorted(self.assets)
+        by_context: Dict[str, List[str]] = {}
+        by_tipo: Dict[str, List[str]] = {}
+        by_token: Dict[str, Set[str]] = {}
+        for asset_id in sorted_ids:
+            asset = self.assets[asset_id]
+            by_context.setdefault(asset.mv_context_default, []).append(asset_id)
+            by_tipo.setdefault(asset.tipo_asset, []).append(asset_id)
+            text = " ".join(filter(None, [asset.asset_id.replace("_", " "), asset.file_name.replace("_", " "),
+                                          asset.descripcion_visual, asset.uso_sugerido, asset.notas]))
+            for token in set(tokenize(text)):
+                by_token.setdefault(token, set()).add(asset_id)
+        return SecondaryIndexes(sorted_ids, by_context, by_tipo, by_token)
+
+
+class CatalogPage(NamedTuple):
+    """One page of a catalog query"""
+    items: List[Asset]
+    total: int
+    next_cursor: Optional[str]
+    etag: str
+
 
 class AssetsRepository:
     """
     Repository to access the Assets Catalog (JSON) and resolve physical files.
+    The catalog is hot-reloaded: edits to assets.json are detected (mtime + hash),
+    parsed off the request path and swapped in atomically.
+    With `index_path`, the parsed catalog is written once as a binary index that every
+    worker memory-maps instead of parsing assets.json itself (adapters/catalog_index.py).
     """
-    def __init__(self, catalog_path: str, files_dir: str):
+    def __init__(self, catalog_path: str, files_dir: str, index_path: Optional[str] = None):
         self.catalog_path = Path(catalog_path)
         self.files_dir = Path(files_dir)
+        self.index_path = Path(index_path) if index_path else None
         self.logger = Logger()
-        self._assets_cache: Dict[str, Asset] = {}
-        self._loaded = False
+
+        # Current catalog version; readers just grab the reference
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # one parse at a time
+        self._reload_thread: Optional[threading.Thread] = None
+        self._catalog_checked_at = 0.0
+
+        # File index: stem -> AssetFile. Replaced as a whole on refresh.
+        self._files: Dict[str, AssetFile] = {}
+        self._files_lock = threading.Lock()
+        self._rescan_lock = threading.Lock()  # one directory scan at a time
+        self._files_dir_mtime_ns: Optional[int] = None
+        self._files_checked_at = 0.0
+        self._files_scanned_at = 0.0
 
     def load_catalog(self):
-        """Loads the assets catalog from JSON file into memory."""
-        if self._loaded:
+        """Loads the assets catalog from JSON file into memory (first call only, later changes are hot-reloaded)."""
+        if self._snapshot is not None:
             return
+        self.reload()
+        self.refresh_file_index(force=True)
 
-        try:
-            if not self.catalog_path.exists():
+    def reload(self, force: bool = False) -> dict:
+        """
+        Re-reads assets.json and swaps in the new catalog if its content changed.
+        Concurrent callers wait for the parse in progress instead of parsing twice.
+        A catalog that fails to parse never replaces the current one.
+        """
+        started = time.perf_counter()
+        with self._reload_lock:
+            current = self._snapshot
+            try:
+                stat = self.catalog_path.stat()
+            except OSError:
                 self.logger.warning(f"Assets catalog not found at {self.catalog_path}")
-                return
+                return {"reloaded": False, "assets": len(current.assets) if current else 0, "error": "catalog not found"}
+
+            if current is not None and not force and (current.mtime_ns, current.size) == (stat.st_mtime_ns, stat.st_size):
+                return {"reloaded": False, "assets": len(current.assets), "catalog_hash": current.content_hash}
+
+            try:
+                snapshot = self._load_snapshot(stat, current, force)
+            except Exception as e:
+                metrics.incr("catalog.reload_failures")
+                self.logger.error(f"Failed to load assets catalog: {e}")
+                return {"reloaded": False, "assets": len(current.assets) if current else 0, "error": str(e)}
+
+            with self._swap_lock:
+                previous, self._snapshot = self._snapshot, snapshot
+            if previous is not None:
+                previous.retire(close_assets=previous.assets is not snapshot.assets)
 
-            with open(self.catalog_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-            assets_list = data.get("assets", [])
-            for asset_data in assets_list:
-                # Handle potential missing optional fields gracefully if needed
-                # For now assuming schema matches
-                try:
-                    asset = Asset(**asset_data)
-                    self._assets_cache[asset.asset_id] = asset
-                except Exception as e:
-                    self.logger.error(f"Failed to parse asset {asset_data.get('asset_id')}: {e}")
-            
-            self._loaded = True
-            self.logger.info(f"Loaded {len(self._assets_cache)} assets from catalog.")
-
-        except Exception as e:
-            self.logger.error(f"Failed to load assets catalog: {e}")
+        duration = time.perf_counter() - started
+        metrics.observe("catalog.reload_seconds", duration)
+        self.logger.info(f"Loaded {len(snapshot.assets)} assets from catalog in {duration * 1000:.1f} ms.")
+        return {"reloaded": True, "assets": len(snapshot.assets), "catalog_hash": snapshot.content_hash,
+                "source": "index" if isinstance(snapshot.assets, CatalogIndex) else "json",
+                "duration_ms": round(duration * 1000, 2)}
+
+    def _load_snapshot(self, stat: os.stat_result, current: Optional[CatalogSnapshot], force: bool) -> CatalogSnapshot:
+        # Another worker may already have indexed this exact version
+        if self.index_path is not None and not force:
+            index = CatalogIndex.open_if_fresh(self.index_path, stat.st_mtime_ns, stat.st_size)
+            if index is not None:
+                return CatalogSnapshot(index, stat.st_mtime_ns, stat.st_size, index.source_hash)
+
+        raw = self.catalog_path.read_bytes()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        if current is not None and not force and current.content_hash == content_hash:
+            # Touched but not edited: just remember the new mtime
+            return CatalogSnapshot(current.assets, stat.st_mtime_ns, stat.st_size, content_hash)
+
+        assets = self._parse_catalog(raw)
+        if self.index_path is not None:
+            try:
+                index = self._publish_index(assets, stat, content_hash)
+                return CatalogSnapshot(index, stat.st_mtime_ns, stat.st_size, content_hash)
+            except OSError as e:
+                self.logger.warning(f"Could not write catalog index {self.index_path}, using in-process catalog: {e}")
+        return CatalogSnapshot(assets, stat.st_mtime_ns, stat.st_size, content_hash)
+
+    def _publish_index(self, assets: Dict[str, Asset], stat: os.stat_result, content_hash: str) -> CatalogIndex:
+        """Builds the shared index under an exclusive file lock so concurrent workers build it only once."""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path.with_name(self.index_path.name + ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            index = CatalogIndex.open_if_fresh(self.index_path, stat.st_mtime_ns, stat.st_size)
+            if index is not None and index.source_hash == content_hash:
+                return index
+            if index is not None:
+                index.close()
+            build_catalog_index(list(assets.values()), self.index_path, stat.st_mtime_ns, stat.st_size, content_hash)
+        self.logger.info(f"Wrote catalog index {self.index_path} ({len(assets)} assets)")
+        return CatalogIndex(self.index_path)
 
     def get_asset(self, asset_id: str) -> Optional[Asset]:
         """Retrieves an asset by its ID."""
-        if not self._loaded:
+        with self._reading() as snapshot:
+            return snapshot.assets.get(asset_id)
+
+    def query_assets(self, mv_context: Optional[str] = None, tipo_asset: Optional[str] = None,
+                     q: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50) -> CatalogPage:
+        """
+        Filters the catalog through the secondary indexes (filters are ANDed, keywords too).
+        Results are ordered by asset_id; `cursor` is the opaque next_cursor of the previous page.
+        The ETag identifies the page: catalog version + query + cursor.
+        """
+        with self._reading() as snapshot:
+            return self._query(snapshot, mv_context, tipo_asset, q, cursor, limit)
+
+    def _query(self, snapshot: CatalogSnapshot, mv_context: Optional[str], tipo_asset: Optional[str],
+               q: Optional[str], cursor: Optional[str], limit: int) -> CatalogPage:
+        indexes = snapshot.indexes()
+
+        candidates: List[List[str]] = []
+        if mv_context:
+            candidates.append(indexes.by_context.get(mv_context, []))
+        if tipo_asset:
+            candidates.append(indexes.by_tipo.get(tipo_asset, []))
+        token_sets = [indexes.by_token.get(token, set()) for token in tokenize(q)]
+
+        if not candidates and not token_sets:
+            ids = indexes.sorted_ids
+        elif candidates:
+            # Walk the smallest sorted list, check membership in the rest
+            candidates.sort(key=len)
+            others = [set(c) for c in candidates[1:]] + token_sets
+            ids = [i for i in candidates[0] if all(i in other for other in others)]
+        else:
+            token_sets.sort(key=len)
+            ids = sorted(set.intersection(*token_sets))
+
+        start = 0
+        if cursor:
+            start = bisect.bisect_right(ids, self._decode_cursor(cursor))
+        page_ids = ids[start:start + limit]
+        next_cursor = None
+        if start + limit < len(ids) and page_ids:
+            next_cursor = base64.urlsafe_b64encode(page_ids[-1].encode("utf-8")).decode("ascii")
+
+        query_key = json.dumps([mv_context, tipo_asset, q, cursor, limit])
+        etag = f'"{snapshot.content_hash[:16]}-{hashlib.sha1(query_key.encode("utf-8")).hexdigest()[:12]}"'
+        return CatalogPage([snapshot.assets[i] for i in page_ids], len(ids), next_cursor, etag)
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> str:
+        try:
+            return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        except Exception:
+            raise ValueError(f"Invalid cursor: {cursor}")
+
+    def list_assets(self) -> List[Asset]:
+        """All assets of the current catalog version."""
+        with self._reading() as snapshot:
+            return list(snapshot.assets.values())
+
+    def catalog_version(self) -> str:
+        """Content hash of the catalog being served; changes on every effective reload."""
+        return self._current_snapshot().content_hash
+
+    @contextmanager
+    def _reading(self) -> Iterator[CatalogSnapshot]:
+        """The current catalog, pinned: a reload does not close its index while the block runs."""
+        fallback = self._current_snapshot()
+        with self._swap_lock:
+            snapshot = self._snapshot or fallback
+            snapshot.acquire()
+        try:
+            yield snapshot
+        finally:
+            snapshot.release()
+
+    def _current_snapshot(self) -> CatalogSnapshot:
+        """Returns the catalog to serve from, scheduling a background reload if assets.json changed."""
+        snapshot = self._snapshot
+        if snapshot is None:
             self.load_catalog()
-        
-        return self._assets_cache.get(asset_id)
+            return self._snapshot or CatalogSnapshot({}, 0, 0, "")
+
+        now = time.monotonic()
+        if now - self._catalog_checked_at >= Config.ASSETS_CATALOG_CHECK_SEC:
+            self._catalog_checked_at = now
+            try:
+                stat = self.catalog_path.stat()
+                changed = (stat.st_mtime_ns, stat.st_size) != (snapshot.mtime_ns, snapshot.size)
+            except OSError:
+                changed = False
+            if changed and not (self._reload_thread and self._reload_thread.is_alive()):
+                self._reload_thread = threading.Thread(target=self.reload, name="catalog-reload", daemon=True)
+                self._reload_thread.start()
+        return snapshot
+
+    def _parse_catalog(self, raw: bytes) -> Dict[str, Asset]:
+        data = json.loads(raw.decode("utf-8"))
+        assets: Dict[str, Asset] = {}
+        for asset_data in data.get("assets", []):
+            # Invalid entries are skipped, the rest of the catalog stays usable
+            try:
+                asset = Asset(**asset_data)
+                assets[asset.asset_id] = asset
+            except Exception as e:
+                self.logger.error(f"Failed to parse asset {asset_data.get('asset_id')}: {e}")
+        return assets
 
     def resolve_file_path(self, file_name: str) -> Optional[Path]:
         """
         Resolves the absolute path for an asset file.
-        Checks for extensions: .jpeg, .jpg, .png.
+        Checks for extensions: .jpeg, .jpg, .png (in that order).
         Returns None if file not found.
         """
-        # Extensions to try in order
-        extensions = [".jpeg", ".jpg", ".png"]
-        
-        for ext in extensions:
-            path = self.files_dir / f"{file_name}{ext}"
-            if path.exists():
-                return path
-        
-        return None
+        entry = self._lookup_file(file_name)
+        return entry.path if entry else None
+
+    def get_file_entry(self, file_name: str) -> Optional[AssetFile]:
+        """
+        Returns the indexed file (path, size, mtime, content hash) for an asset file name.
+        The SHA-256 is computed on first use and kept until the file's size/mtime change.
+        """
+        entry = self._lookup_file(file_name)
+        if entry is None or entry.content_hash is not None:
+            return entry
+
+        try:
+            hashed = entry._replace(content_hash=file_sha256(entry.path))
+        except OSError as e:
+            self.logger.warning(f"Could not hash asset file {entry.path}: {e}")
+            return entry
+        with self._files_lock:
+            if self._files.get(file_name) == entry:
+                self._files[file_name] = hashed
+        return hashed
+
+    def list_files(self) -> List[AssetFile]:
+        """All indexed asset files (one per stem)."""
+        self.refresh_file_index()
+        return list(self._files.values())
+
+    def refresh_file_index(self, force: bool = False) -> None:
+        """
+        Keeps the file index in sync with ASSETS_FILES_DIR without probing files on every lookup:
+        - at most every ASSETS_INDEX_CHECK_SEC, one stat of the directory; its mtime changes when files are added/removed/renamed.
+        - every ASSETS_INDEX_RESCAN_SEC a full rescan, which also catches files overwritten in place.
+        Unchanged files (same size and mtime) keep their already computed hash.
+        While one caller rescans, the others keep using the current index (they only wait for the
+        very first scan). A scan that fails keeps the previous index.
+        """
+        now = time.monotonic()
+        if not force and now - self._files_checked_at < Config.ASSETS_INDEX_CHECK_SEC:
+            return
+        self._files_checked_at = now
+
+        try:
+            dir_mtime_ns = self.files_dir.stat().st_mtime_ns
+        except OSError:
+            if self._files:
+                self.logger.warning(f"Assets files dir not available: {self.files_dir}")
+            with self._files_lock:
+                self._files = {}
+                self._files_dir_mtime_ns = None
+            return
+
+        rescan_due = now - self._files_scanned_at >= Config.ASSETS_INDEX_RESCAN_SEC
+        if not force and not rescan_due and dir_mtime_ns == self._files_dir_mtime_ns:
+            return
+
+        first_scan = self._files_dir_mtime_ns is None
+        if not self._rescan_lock.acquire(blocking=first_scan):
+            return
+        try:
+            if first_scan and self._files_dir_mtime_ns is not None:
+                return  # indexed by the caller we waited for
+            files = self._scan_files(self._files)
+            if files is None:
+                return
+            with self._files_lock:
+                self._files = files
+                self._files_dir_mtime_ns = dir_mtime_ns
+            self._files_scanned_at = now
+        finally:
+            self._rescan_lock.release()
+        self.logger.info(f"Indexed {len(files)} asset files in {self.files_dir}")
+
+    def _scan_files(self, previous: Dict[str, AssetFile]) -> Optional[Dict[str, AssetFile]]:
+        """One pass over ASSETS_FILES_DIR; None if it could not be listed. Files that vanish mid-scan are skipped."""
+        files: Dict[str, AssetFile] = {}
+        priority = {ext: i for i, ext in enumerate(FILE_EXTENSIONS)}
+        try:
+            with os.scandir(self.files_dir) as it:
+                for dir_entry in it:
+                    stem, ext = os.path.splitext(dir_entry.name)
+                    if ext not in priority or not dir_entry.is_file():
+                        continue
+                    current = files.get(stem)
+                    if current is not None and priority[current.path.suffix] <= priority[ext]:
+                        continue
+                    try:
+                        stat = dir_entry.stat()
+                    except OSError:
+                        continue  # deleted or renamed since it was listed
+                    old = previous.get(stem)
+                    content_hash = None
+                    if old is not None and old.path.name == dir_entry.name and \
+                            (old.size, old.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+                        content_hash = old.content_hash
+                    files[stem] = AssetFile(stem, Path(dir_entry.path), stat.st_size, stat.st_mtime_ns, content_hash)
+        except OSError as e:
+            self.logger.warning(f"Could not scan assets files dir {self.files_dir}, keeping the previous index: {e}")
+            return None
+        return files
+
+    def _lookup_file(self, file_name: str) -> Optional[AssetFile]:
+        if self._files_dir_mtime_ns is None:
+            self.refresh_file_index(force=True)
+        else:
+            self.refresh_file_index()
+        return self._files.get(file_name)
@@ -0,0 +1,163 @@
+import mmap
+import os
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from domain.entities import Asset
+
+# Binary catalog index, built once from assets.json and memory-mapped read-only by every
+# worker process (the OS shares the pages), so no worker parses / validates the JSON.
+#
+# Layout (little-endian):
+#   header   : magic, version, count, capacity, reserved, source mtime_ns, source size, source sha256
+#   hash     : `capacity` u32 slots (record index + 1, 0 = empty), open addressing on FNV-1a(asset_id)
+#   records  : `count` fixed-width records, (offset u32, length u32) into the string table per field
+#   strings  : UTF-8 string table
+MAGIC = b"HLCATIX1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIIQQ32s")
+FIELDS = ["asset_id", "file_name", "tipo_asset", "mv_context_default", "descripcion_visual", "uso_sugerido", "notas"]
+RECORD = struct.Struct("<" + "II" * len(FIELDS))
+SLOT = struct.Struct("<I")
+NULL_LENGTH = 0xFFFFFFFF  # marks a None value (notas)
+
+
+def _fnv1a(data: bytes) -> int:
+    h = 0xcbf29ce484222325
+    for byte in data:
+        h = ((h ^ byte) * 0x100000001b3) & 0xFFFFFFFFFFFFFFFF
+    return h
+
+
+def build_catalog_index(assets: List[Asset], path: Path, source_mtime_ns: int, source_size: int,
+                        source_hash: str) -> None:
+    """Writes the binary index for `assets` atomically (temp file + rename)."""
+    count = len(assets)
+    capacity = 1
+    while capacity < max(2 * count, 1):
+        capacity *= 2
+
+    strings = bytearray()
+    records = bytearray()
+    slots = [0] * capacity
+    for index, asset in enumerate(assets):
+        values = []
+        for field in FIELDS:
+            value = getattr(asset, field)
+            if value is None:
+                values += [0, NULL_LENGTH]
+                continue
+            encoded = value.encode("utf-8")
+            values += [len(strings), len(encoded)]
+            strings += encoded
+        records += RECORD.pack(*values)
+
+        slot = _fnv1a(asset.asset_id.encode("utf-8")) & (capacity - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (capacity - 1)
+        slots[slot] = index + 1
+
+    header = HEADER.pack(MAGIC, VERSION, count, capacity, 0, source_mtime_ns, source_size, bytes.fromhex(source_hash))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(struct.pack(f"<{capacity}I", *slots))
+        f.write(records)
+        f.write(strings)
+    os.replace(tmp, path)
+
+
+class CatalogIndex(Mapping):
+    """
+    Read-only, memory-mapped view of a catalog index file.
+    Behaves like a Dict[str, Asset]; Asset objects are materialized on access.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, capacity, _, mtime_ns, size, digest = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"Not a catalog index (v{VERSION}): {self.path}")
+        self.count = count
+        self.capacity = capacity
+        self.source_mtime_ns = mtime_ns
+        self.source_size = size
+        self.source_hash = digest.hex()
+        self._slots_offset = HEADER.size
+        self._records_offset = self._slots_offset + capacity * SLOT.size
+        self._strings_offset = self._records_offset + count * RECORD.size
+
+    @classmethod
+    def open_if_fresh(cls, path: Path, source_mtime_ns: int, source_size: int) -> Optional["CatalogIndex"]:
+        """Opens the index only if it was built from the current assets.json (same mtime and size)."""
+        try:
+            index = cls(path)
+        except (OSError, ValueError, struct.error):
+            return None
+        if (index.source_mtime_ns, index.source_size) != (source_mtime_ns, source_size):
+            index.close()
+            return None
+        return index
+
+    def close(self) -> None:
+        self._mm.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._mm.closed
+
+    # --- Mapping API -----------------------------------------------------------
+
+    def __getitem__(self, asset_id: str) -> Asset:
+        record = self._find(asset_id)
+        if record is None:
+            raise KeyError(asset_id)
+        return self._materialize(record)
+
+    def __contains__(self, asset_id) -> bool:
+        return isinstance(asset_id, str) and self._find(asset_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for record in range(self.count):
+            yield self._field(record, 0)
+
+    def __len__(self) -> int:
+        return self.count
+
+    # --- Internals ---------------------------------------------------------------
+
+    def _find(self, asset_id: str) -> Optional[int]:
+        if not self.count:
+            return None
+        key = asset_id.encode("utf-8")
+        slot = _fnv1a(key) & (self.capacity - 1)
+        while True:
+            (entry,) = SLOT.unpack_from(self._mm, self._slots_offset + slot * SLOT.size)
+            if entry == 0:
+                return None
+            record = entry - 1
+            if self._raw_field(record, 0) == key:
+                return record
+            slot = (slot + 1) & (self.capacity - 1)
+
+    def _raw_field(self, record: int, field: int) -> Optional[bytes]:
+        offset, length = struct.unpack_from("<II", self._mm, self._records_offset + record * RECORD.size + field * 8)
+        if length == NULL_LENGTH:
+            return None
+        start = self._strings_offset + offset
+        return self._mm[start:start + length]
+
+    def _field(self, record: int, field: int) -> Optional[str]:
+        raw = self._raw_field(record, field)
+        return raw.decode("utf-8") if raw is not None else None
+
+    def _materialize(self, record: int) -> Asset:
+        # Values were validated when the index was built: skip pydantic validation
+        return Asset.model_construct(**{name: self._field(record, i) for i, name in enumerate(FIELDS)})
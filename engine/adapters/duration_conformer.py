@@ -0,0 +1,90 @@
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from adapters.ffmpeg_adapter import FFmpegAdapter, Span
+from adapters.media_verifier import Mp4Scanner, VideoInfo, audio_format, video_format
+from domain.errors import MediaProcessingError
+from infra.config import Config
+from infra.metrics import metrics
+
+
+class ConformResult(NamedTuple):
+    path: str
+    duration_sec: float
+    action: str  # trimmed | looped
+    reencoded_sec: float  # length of the partial GOP re-encoded at the cut (0: pure stream copy)
+
+
+class DurationConformer:
+    """
+    Conforms a clip to the shot's duracion_seg (Veo returns fixed-length clips) without re-encoding it:
+    a longer clip is cut at the target, a shorter one is repeated and cut. Whole GOPs are
+    stream-copied (split at their keyframe); only the partial GOP between the last keyframe and the
+    cut point is re-encoded, and nothing is when the cut falls on a keyframe.
+    """
+
+    def __init__(self, ffmpeg: Optional[FFmpegAdapter] = None, tolerance_sec: Optional[float] = None):
+        self.ffmpeg = ffmpeg or FFmpegAdapter()
+        self.scanner = Mp4Scanner()
+        self.tolerance_sec = Config.CONFORM_TOLERANCE_SEC if tolerance_sec is None else tolerance_sec
+
+    def conform(self, video_path: str, target_sec: float, output_path: str) -> Optional[ConformResult]:
+        """
+        Writes the conformed clip to output_path. None when the clip is already within
+        CONFORM_TOLERANCE_SEC of the target (an outdated output_path is removed).
+        """
+        info = self._info(video_path)
+        if abs(info.duration_sec - target_sec) <= self.tolerance_sec:
+            Path(output_path).unlink(missing_ok=True)
+            return None
+        frame = 1.0 / info.fps if info.fps else 1.0 / Config.LOCAL_MOTION_FPS
+        target = round(target_sec / frame) * frame
+        repeats = math.floor((target + frame / 2) / info.duration_sec)
+        rest = target - repeats * info.duration_sec
+
+        os.makedirs(Path(output_path).parent, exist_ok=True)
+        work = Path(tempfile.mkdtemp(prefix=".conform.", dir=Path(output_path).parent))
+        try:
+            pieces, reencoded = [video_path] * repeats, 0.0
+            if rest > frame / 2:
+                head, reencoded = self._head(video_path, rest, info, work)
+                pieces += head
+            self.ffmpeg.concat_copy(pieces, output_path)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+        action = "trimmed" if target < info.duration_sec else "looped"
+        metrics.incr("video.conform", action=action, reencoded=str(reencoded > 0).lower())
+        return ConformResult(str(output_path), round(self._info(output_path).duration_sec, 3), action,
+                             round(reencoded, 3))
+
+    def _head(self, video_path: str, length: float, info: VideoInfo, work: Path) -> Tuple[List[str], float]:
+        """The first `length` seconds of the clip, and how much of it had to be re-encoded."""
+        keyframes = self.ffmpeg.keyframe_times(video_path)
+        half_frame = 0.5 / info.fps if info.fps else 0.02
+        origin = keyframes[0] if keyframes else 0.0
+        cut = origin + length
+        key = max((k for k in keyframes if k <= cut + half_frame), default=origin)
+        pieces = []
+        if key > origin + half_frame:
+            prefix = work / "prefix.mp4"
+            self.ffmpeg.split(video_path, [key], keyframes, [str(prefix), None])
+            pieces.append(str(prefix))
+        reencoded = cut - key
+        if reencoded > half_frame:
+            gop = work / "gop.mp4"
+            self.ffmpeg.encode_span(Span(video_path, key, cut), str(gop), video_format(info), audio_format(info))
+            pieces.append(str(gop))
+        else:
+            reencoded = 0.0
+        return pieces, reencoded
+
+    def _info(self, path: str) -> VideoInfo:
+        problems, info = self.scanner.scan(path)
+        if problems or info is None or info.duration_sec <= 0:
+            raise MediaProcessingError(f"Cannot conform {path}: {'; '.join(problems) or 'no video'}")
+        return info
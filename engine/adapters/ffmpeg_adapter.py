@@ -0,0 +1,279 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from adapters.logger import Logger
+from domain.errors import MediaProcessingError
+from infra.config import Config
+
+logger = Logger()
+
+# Codec name (as reported by ffprobe / media_verifier) -> ffmpeg encoder used to produce it
+VIDEO_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+AUDIO_ENCODERS = {"aac": "aac", "opus": "libopus"}
+# xfade transitions offered for assembly (usecases/assemble_video.py)
+TRANSITIONS = ("fade", "fadeblack", "fadewhite", "dissolve", "wipeleft", "wiperight", "slideleft", "slideright",
+               "circleopen", "circleclose")
+
+
+class Span(NamedTuple):
+    """Part of a clip, from `start` to `end` seconds."""
+    path: str
+    start: float
+    end: float
+
+
+class FFmpegAdapter:
+    """
+    Thin wrapper over the ffmpeg binary. Outputs are written to a temporary file next to the
+    destination and moved into place when ffmpeg succeeds, so a failed run never leaves a
+    truncated mp4 where a valid one is expected.
+    """
+
+    def __init__(self, ffmpeg_bin: Optional[str] = None):
+        self.ffmpeg_bin = ffmpeg_bin or Config.FFMPEG_BIN
+
+    def encode_rgb_frames(self, frames: Iterable[bytes], width: int, height: int, fps: int, output_path: str,
+                          crf: Optional[int] = None, preset: Optional[str] = None) -> str:
+        """Encodes raw rgb24 frames (width*height*3 bytes each) as an H.264 mp4."""
+        crf = crf if crf is not None else Config.LOCAL_MOTION_CRF
+        preset = preset or Config.LOCAL_MOTION_PRESET
+        tmp = self._tmp_path(output_path)
+        cmd = [
+            self.ffmpeg_bin, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+            # Keyframe every 2 s so the tail can be seeked without decoding the whole clip
+            "-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-g", str(fps * 2), "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart", "-f", "mp4", str(tmp),
+        ]
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise MediaProcessingError(f"Could not run ffmpeg ({self.ffmpeg_bin}): {e}")
+
+        try:
+            for frame in frames:
+                proc.stdin.write(frame)
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass  # ffmpeg exited early, its stderr says why
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            tmp.unlink(missing_ok=True)
+            raise
+        stderr = proc.stderr.read().decode("utf-8", "replace")
+        proc.stderr.close()
+        self._finish(proc.wait(), stderr, tmp, output_path)
+        return str(output_path)
+
+    def extract_last_frame(self, video_path: str, output_path: str, tail_sec: float = 0.25) -> str:
+        """
+        Writes the last frame of a video as PNG. Seeks to `tail_sec` before the end (ffmpeg jumps to the
+        keyframe before that point), so only the tail is decoded; `-update` keeps overwriting the single
+        output image, leaving the final frame.
+        """
+        tmp = self._tmp_path(output_path)
+        cmd = [
+            self.ffmpeg_bin, "-y", "-loglevel", "error", "-sseof", f"-{tail_sec}", "-i", str(video_path),
+            "-an", "-update", "1", "-f", "image2", "-c:v", "png", str(tmp),
+        ]
+        self._run(cmd, tmp, output_path)
+        if not os.path.exists(output_path):
+            raise MediaProcessingError(f"ffmpeg found no video frames in {video_path}")
+        return str(output_path)
+
+    def sample_gray_frames(self, video_path: str, sample_fps: float, width: int, height: int) -> bytes:
+        """
+        Decodes `sample_fps` frames per second of the video as raw 8-bit grayscale, scaled to
+        width x height (width*height bytes per frame, concatenated).
+        """
+        cmd = [
+            self.ffmpeg_bin, "-loglevel", "error", "-i", str(video_path), "-an",
+            "-vf", f"fps={sample_fps:g},scale={width}:{height}:flags=area,format=gray",
+            "-f", "rawvideo", "-pix_fmt", "gray", "-",
+        ]
+        try:
+            proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise MediaProcessingError(f"Could not run ffmpeg ({self.ffmpeg_bin}): {e}")
+        if proc.returncode != 0:
+            raise MediaProcessingError(f"ffmpeg failed ({proc.returncode}): "
+                                       f"{proc.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+        return proc.stdout
+
+    def concat_copy(self, video_paths: List[str], output_path: str) -> str:
+        """
+        Joins mp4s with the concat demuxer, copying the streams (no decode or encode). The inputs must
+        have the same streams with the same codec, size, frame rate and audio layout.
+        """
+        tmp = self._tmp_path(output_path)
+        listing = tmp.with_suffix(".txt")
+        # concat demuxer syntax: single-quoted paths, a quote is written as '\''
+        listing.write_text("".join("file '{}'\n".format(str(Path(p).resolve()).replace("'", "'\\''"))
+                                   for p in video_paths), encoding="utf-8")
+        cmd = [
+            self.ffmpeg_bin, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", str(listing),
+            "-map", "0", "-c", "copy", "-movflags", "+faststart", "-f", "mp4", str(tmp),
+        ]
+        try:
+            self._run(cmd, tmp, output_path)
+        finally:
+            listing.unlink(missing_ok=True)
+        return str(output_path)
+
+    def normalize(self, video_path: str, output_path: str, video: Optional[Tuple[str, int, int, float]] = None,
+                  audio: Optional[Tuple[str, int, int]] = None, audio_action: str = "copy") -> str:
+        """
+        Rewrites a clip so it can be stream-copied next to others. `video` = (codec, width, height, fps)
+        re-encodes the picture (letterboxed to that size); None copies it untouched. `audio_action` is
+        copy | encode (to `audio` = (codec, sample_rate, channels)) | silence (adds a silent track in
+        that format, for clips without sound).
+        """
+        tmp = self._tmp_path(output_path)
+        cmd = [self.ffmpeg_bin, "-y", "-loglevel", "error", "-i", str(video_path)]
+        if audio_action == "silence":
+            codec, rate, channels = audio
+            cmd += ["-f", "lavfi", "-i", f"anullsrc=r={rate}:cl={'mono' if channels == 1 else 'stereo'}"]
+        cmd += ["-map", "0:v:0", "-map", "1:a:0" if audio_action == "silence" else "0:a:0?"]
+        if video is None:
+            cmd += ["-c:v", "copy"]
+        else:
+            codec, width, height, fps = video
+            cmd += [
+                "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                       f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps:g}",
+                "-c:v", VIDEO_ENCODERS.get(codec, "libx264"), "-preset", Config.ASSEMBLY_PRESET,
+                "-crf", str(Config.ASSEMBLY_CRF), "-pix_fmt", "yuv420p", "-g", str(max(1, round(fps * 2))),
+            ]
+        if audio_action == "copy":
+            cmd += ["-c:a", "copy"]
+        else:
+            codec, rate, channels = audio
+            cmd += ["-c:a", AUDIO_ENCODERS.get(codec, "aac"), "-ar", str(rate), "-ac", str(channels),
+                    "-b:a", Config.ASSEMBLY_AUDIO_BITRATE]
+            if audio_action == "silence":
+                cmd += ["-shortest"]
+        cmd += ["-movflags", "+faststart", "-f", "mp4", str(tmp)]
+        self._run(cmd, tmp, output_path)
+        return str(output_path)
+
+    def keyframe_times(self, video_path: str) -> List[float]:
+        """Presentation times (seconds) of the video's keyframes; only the keyframes are decoded."""
+        cmd = [self.ffmpeg_bin, "-hide_banner", "-skip_frame", "nokey", "-i", str(video_path),
+               "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-"]
+        try:
+            proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise MediaProcessingError(f"Could not run ffmpeg ({self.ffmpeg_bin}): {e}")
+        stderr = proc.stderr.decode("utf-8", "replace")
+        if proc.returncode != 0:
+            raise MediaProcessingError(f"ffmpeg failed ({proc.returncode}): {stderr.strip()[-500:]}")
+        return sorted(float(t) for t in re.findall(r"pts_time:\s*(-?[\d.]+)", stderr))
+
+    def split(self, video_path: str, times: List[float], keyframes: List[float],
+              output_paths: List[Optional[str]]) -> None:
+        """
+        Cuts a video at the keyframes at `times` (seconds, from keyframe_times) by stream copy, with
+        the segment muxer: it splits at the keyframe packet, so B-frames stay with their GOP and every
+        part decodes on its own. Part i (len(times) + 1 parts) is moved to output_paths[i], or dropped
+        if that is None.
+        """
+        # The segmenter cuts at the first keyframe at or after each time, on timestamps that can be
+        # shifted a little (audio priming): ask for the middle of the GOP before each cut
+        split_times = [(max((k for k in keyframes if k < t - 0.001), default=0.0) + t) / 2 for t in times]
+        target_dir = Path(next(p for p in output_paths if p)).parent
+        os.makedirs(target_dir, exist_ok=True)
+        work = Path(tempfile.mkdtemp(prefix=".split.", dir=target_dir))
+        try:
+            cmd = [
+                self.ffmpeg_bin, "-y", "-loglevel", "error", "-i", str(video_path), "-map", "0", "-c", "copy",
+                "-f", "segment", "-segment_times", ",".join(f"{t:.6f}" for t in split_times),
+                "-reset_timestamps", "1", "-segment_format", "mp4", "-segment_format_options", "movflags=+faststart",
+                str(work / "part_%03d.mp4"),
+            ]
+            try:
+                proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            except OSError as e:
+                raise MediaProcessingError(f"Could not run ffmpeg ({self.ffmpeg_bin}): {e}")
+            if proc.returncode != 0:
+                raise MediaProcessingError(f"ffmpeg failed ({proc.returncode}): "
+                                           f"{proc.stderr.decode('utf-8', 'replace').strip()[-500:]}")
+            parts = sorted(work.glob("part_*.mp4"))
+            if len(parts) != len(times) + 1:
+                raise MediaProcessingError(f"Splitting {video_path} at {times} gave {len(parts)} parts")
+            for part, output_path in zip(parts, output_paths):
+                if output_path:
+                    os.chmod(part, 0o644)
+                    os.replace(part, output_path)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    def encode_span(self, span: Span, output_path: str, video: Tuple[str, int, int, float],
+                    audio: Optional[Tuple[str, int, int]] = None) -> str:
+        """Re-encodes one span of a clip in the given formats (as in normalize())."""
+        return self.crossfade([span], output_path, "fade", 0.0, video, audio)
+
+    def crossfade(self, spans: List[Span], output_path: str, transition: str, duration: float,
+                  video: Tuple[str, int, int, float], audio: Optional[Tuple[str, int, int]] = None) -> str:
+        """
+        Encodes the spans one after the other, each overlapping the previous one by `duration` seconds
+        with the xfade `transition` (and an audio crossfade). `video` / `audio` are the output formats,
+        as in normalize(). Each span must last at least 2 * duration (the first and last, duration).
+        """
+        codec, width, height, fps = video
+        cmd = [self.ffmpeg_bin, "-y", "-loglevel", "error"]
+        for span in spans:
+            if span.start:
+                cmd += ["-ss", f"{span.start:.6f}"]
+            cmd += ["-t", f"{span.end - span.start:.6f}", "-i", str(span.path)]
+        graph = []
+        for i in range(len(spans)):
+            graph.append(f"[{i}:v]settb=AVTB,fps={fps:g},scale={width}:{height},setsar=1,format=yuv420p[v{i}]")
+            if audio:
+                graph.append(f"[{i}:a]aresample={audio[1]}[a{i}]")
+        video_out, audio_out, offset = "[v0]", "[a0]", 0.0
+        for i, span in enumerate(spans[:-1], start=1):
+            offset += span.end - span.start - duration
+            graph.append(f"{video_out}[v{i}]xfade=transition={transition}:duration={duration:g}:"
+                         f"offset={offset:.6f}[x{i}]")
+            video_out = f"[x{i}]"
+            if audio:
+                graph.append(f"{audio_out}[a{i}]acrossfade=d={duration:g}[y{i}]")
+                audio_out = f"[y{i}]"
+        tmp = self._tmp_path(output_path)
+        cmd += ["-filter_complex", ";".join(graph), "-map", video_out,
+                "-c:v", VIDEO_ENCODERS.get(codec, "libx264"), "-preset", Config.ASSEMBLY_PRESET,
+                "-crf", str(Config.ASSEMBLY_CRF), "-pix_fmt", "yuv420p"]
+        if audio:
+            cmd += ["-map", audio_out, "-c:a", AUDIO_ENCODERS.get(audio[0], "aac"), "-ar", str(audio[1]),
+                    "-ac", str(audio[2]), "-b:a", Config.ASSEMBLY_AUDIO_BITRATE]
+        cmd += ["-movflags", "+faststart", "-f", "mp4", str(tmp)]
+        self._run(cmd, tmp, output_path)
+        return str(output_path)
+
+    def _run(self, cmd, tmp: Path, output_path: str) -> None:
+        try:
+            proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise MediaProcessingError(f"Could not run ffmpeg ({self.ffmpeg_bin}): {e}")
+        if proc.returncode == 0 and not tmp.exists():
+            return
+        self._finish(proc.returncode, proc.stderr.decode("utf-8", "replace"), tmp, output_path)
+
+    def _finish(self, returncode: int, stderr: str, tmp: Path, output_path: str) -> None:
+        if returncode != 0:
+            tmp.unlink(missing_ok=True)
+            raise MediaProcessingError(f"ffmpeg failed ({returncode}): {stderr.strip()[-500:]}")
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, output_path)
+
+    @staticmethod
+    def _tmp_path(output_path: str) -> Path:
+        path = Path(output_path)
+        os.makedirs(path.parent, exist_ok=True)
+        return path.with_name(f".{path.stem}.{os.getpid()}.tmp{path.suffix}")
@@ -0,0 +1,41 @@
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from adapters.ffmpeg_adapter import FFmpegAdapter
+from adapters.logger import Logger
+from infra.config import Config
+from infra.hashing import file_sha256
+from infra.metrics import metrics
+
+logger = Logger()
+
+
+class LastFrameCache:
+    """
+    Last frame of shot videos, extracted with a tail seek (no full decode) and cached as
+    `{sha256[:32]}.png` of the video content: a regenerated video gets a new frame, an
+    unchanged one is never decoded twice. Concurrent requests for the same video share one extraction.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, ffmpeg: Optional[FFmpegAdapter] = None):
+        self.cache_dir = Path(cache_dir or Config.LAST_FRAME_CACHE_DIR)
+        self.ffmpeg = ffmpeg or FFmpegAdapter()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def last_frame(self, video_path: str) -> str:
+        digest = file_sha256(Path(video_path))[:32]
+        target = self.cache_dir / f"{digest}.png"
+        with self._key_lock(digest):
+            if target.exists():
+                metrics.incr("frames.cache", result="hit")
+                return str(target)
+            metrics.incr("frames.cache", result="miss")
+            self.ffmpeg.extract_last_frame(video_path, str(target))
+        logger.info(f"Extracted last frame of {video_path} -> {target.name}")
+        return str(target)
+
+    def _key_lock(self, digest: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(digest, threading.Lock())
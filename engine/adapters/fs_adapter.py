@@ -1,17 +1,31 @@
 import os
+import json
 import shutil
 import base64
+import threading
 import requests
 from pathlib import Path
-from domain.entities import Shot
+from typing import List, Optional
+from domain.entities import AssetMode, QualityTier, Shot
+from domain.errors import MediaProcessingError, NetworkError
 from infra.paths import ASSETS_DIR
+from infra.retry import retry
+
 
 class FSAdapter:
     def _get_shot_dir(self, shot: Shot) -> Path:
-        """Construct canonical path for shot assets: assets/videos/{video_id}/block_{block_id}/shot_{shot_id}/"""
-        return ASSETS_DIR / "videos" / shot.video_id / f"block_{shot.block_id}" / f"shot_{shot.shot_id}"
+        """
+        Construct canonical path for shot assets: assets/videos/{video_id}/block_{block_id}/shot_{shot_id}/
+        DRAFT renders go to its draft/ subfolder so they never overwrite the final ones.
+        """
+        return self._shot_dir(shot.video_id, shot.block_id, shot.shot_id, shot.quality_tier)
 
-    def save_image(self, shot: Shot, img_data: str) -> str:
+    def _shot_dir(self, video_id: str, block_id: str, shot_id: str, tier: QualityTier = QualityTier.FINAL) -> Path:
+        shot_dir = ASSETS_DIR / "videos" / video_id / f"block_{block_id}" / f"shot_{shot_id}"
+        return shot_dir / "draft" if tier == QualityTier.DRAFT else shot_dir
+
+    def save_image(self, shot: Shot, img_data: str, stem: str = "image") -> str:
+        """Saves a generated image as {stem}.{ext} (`image_last` for the last keyframe of IMAGE_2F_VIDEO)."""
         shot_dir = self._get_shot_dir(shot)
         os.makedirs(shot_dir, exist_ok=True)
         
@@ -26,33 +40,61 @@ class FSAdapter:
                 elif "image/webp" in header:
                     ext = ".webp"
                 
-                file_path = shot_dir / f"image{ext}"
+                file_path = shot_dir / f"{stem}{ext}"
                 
                 data = base64.b64decode(encoded)
-                with open(file_path, "wb") as f:
-                    f.write(data)
-                
-                # Ensure world-readable permissions for web server access
-                os.chmod(file_path, 0o644)
+                self._replace_file(file_path, data)
                 
                 return str(file_path)
             except Exception as e:
                 print(f"Error saving base64 image: {e}")
-                file_path = shot_dir / "image_error.txt"
+                file_path = shot_dir / f"{stem}_error.txt"
                 with open(file_path, "w") as f:
                     f.write(f"Failed to decode: {str(e)}\n\nData: {img_data[:100]}...")
                 return str(file_path)
                 
         else:
             # Fallback for URLs or raw data
-            file_path = shot_dir / "image.png"
-            with open(file_path, "w") as f:
-                f.write(f"Image data from {img_data}")
-            os.chmod(file_path, 0o644)
+            file_path = shot_dir / f"{stem}.png"
+            self._replace_file(file_path, f"Image data from {img_data}".encode("utf-8"))
             
         return str(file_path)
 
+    def save_image_file(self, shot: Shot, source_path: str, stem: str = "image") -> str:
+        """
+        Puts an image already on disk (a continuity frame, a shared keyframe) into the shot folder.
+        Hardlinked when possible: images are only ever replaced, never rewritten in place (see
+        _replace_file), so regenerating either shot leaves the other's file untouched.
+        """
+        shot_dir = self._get_shot_dir(shot)
+        os.makedirs(shot_dir, exist_ok=True)
+        file_path = shot_dir / f"{stem}{Path(source_path).suffix.lower() or '.png'}"
+        if file_path.exists() and os.path.samefile(source_path, file_path):
+            return str(file_path)
+        file_path.unlink(missing_ok=True)
+        try:
+            os.link(source_path, file_path)
+        except OSError:  # other filesystem, or no hardlink support
+            shutil.copyfile(source_path, file_path)
+            os.chmod(file_path, 0o644)
+        return str(file_path)
+
+    @staticmethod
+    def _replace_file(file_path: Path, data: bytes) -> None:
+        """Writes a new file and swaps it in, so other hardlinks to the old one keep their content."""
+        tmp = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        # Ensure world-readable permissions for web server access
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, file_path)
+
     def save_video(self, shot: Shot, vid_data: str) -> str:
+        """
+        Saves the shot's video from a data URI or downloads it from a result URL (recorded as
+        shot.video_source_url, so a corrupt copy can be downloaded again). Download failures raise:
+        nothing is written over the previous video.
+        """
         shot_dir = self._get_shot_dir(shot)
         os.makedirs(shot_dir, exist_ok=True)
         file_path = shot_dir / "video.mp4"
@@ -62,41 +104,64 @@ class FSAdapter:
             try:
                 header, encoded = vid_data.split(",", 1)
                 data = base64.b64decode(encoded)
-                with open(file_path, "wb") as f:
-                    f.write(data)
-                
-                # Ensure world-readable permissions
-                os.chmod(file_path, 0o644)
-                
-                print(f"Video saved from base64: {len(data)} bytes")
-                return str(file_path)
             except Exception as e:
-                print(f"Error saving base64 video: {e}")
-                error_path = shot_dir / "video_error.txt"
-                with open(error_path, "w") as f:
-                    f.write(f"Failed to decode video: {str(e)}")
-                return str(error_path)
+                raise MediaProcessingError(f"Failed to decode video: {e}")
+            self._replace_file(file_path, data)
+            print(f"Video saved from base64: {len(data)} bytes")
+            return str(file_path)
         
         # Check if it's a mock URL
         elif "mock" in vid_data:
              with open(file_path, "w") as f:
                  f.write(f"Simulated video content from {vid_data}")
         else:
-             # Try real download from URL
-             try:
-                 print(f"Downloading video from {vid_data}...")
-                 with requests.get(vid_data, stream=True, timeout=120) as r:
-                     r.raise_for_status()
-                     with open(file_path, 'wb') as f:
-                         for chunk in r.iter_content(chunk_size=8192): 
-                             f.write(chunk)
-             except Exception as e:
-                 print(f"Failed to download video: {e}")
-                 with open(file_path, "w") as f:
-                     f.write(f"Failed to download video from {vid_data}. Error: {e}")
+             self.download(vid_data, file_path)
+             shot.video_source_url = vid_data
             
         return str(file_path)
 
+    @retry(name="media.download")
+    def download(self, url: str, file_path) -> str:
+        """
+        Streams `url` to a temporary file and moves it into place only when complete: a cut
+        connection (fewer bytes than Content-Length) raises and leaves any previous file untouched.
+        """
+        file_path = Path(file_path)
+        os.makedirs(file_path.parent, exist_ok=True)
+        tmp = file_path.with_name(f".{file_path.name}.{os.getpid()}.{threading.get_ident()}.part")
+        print(f"Downloading {url[:80]}...")
+        try:
+            with requests.get(url, stream=True, timeout=(10, 120)) as r:
+                r.raise_for_status()
+                # Content-Length counts the encoded bytes when the body is compressed
+                expected = 0 if r.headers.get("Content-Encoding") else int(r.headers.get("Content-Length") or 0)
+                received = 0
+                with open(tmp, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                        received += len(chunk)
+            if expected and received != expected:
+                raise NetworkError(f"Incomplete download of {url}: {received} of {expected} bytes")
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, file_path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        print(f"Downloaded {received} bytes to {file_path}")
+        return str(file_path)
+
+    def video_output_path(self, shot: Shot) -> str:
+        """Where save_video puts the shot's video, for videos rendered locally straight to disk."""
+        shot_dir = self._get_shot_dir(shot)
+        os.makedirs(shot_dir, exist_ok=True)
+        return str(shot_dir / "video.mp4")
+
+    def conformed_video_path(self, shot: Shot) -> str:
+        """Where the shot's video conformed to duracion_seg is kept, next to the original."""
+        shot_dir = self._get_shot_dir(shot)
+        os.makedirs(shot_dir, exist_ok=True)
+        return str(shot_dir / "video_conformed.mp4")
+
     def save_metadata(self, shot: Shot) -> str:
         shot_dir = self._get_shot_dir(shot)
         os.makedirs(shot_dir, exist_ok=True)
@@ -115,6 +180,51 @@ class FSAdapter:
             
         return str(file_path)
 
+    def load_metadata(self, video_id: str, block_id: str, shot_id: str,
+                      tier: QualityTier = QualityTier.FINAL) -> Optional[Shot]:
+        """Reads back the shot saved by save_metadata (None if the shot was never processed in that tier)."""
+        file_path = self._shot_dir(video_id, block_id, shot_id, tier) / "metadata.json"
+        if not file_path.exists():
+            return None
+        with open(file_path) as f:
+            return Shot.model_validate(json.load(f))
+
+    def list_metadata(self, video_id: str, tier: QualityTier = QualityTier.FINAL) -> List[Shot]:
+        """Every shot of the video saved in that tier, in no particular order."""
+        pattern = "block_*/shot_*/draft/metadata.json" if tier == QualityTier.DRAFT else "block_*/shot_*/metadata.json"
+        shots = []
+        for file_path in (ASSETS_DIR / "videos" / video_id).glob(pattern):
+            with open(file_path) as f:
+                shots.append(Shot.model_validate(json.load(f)))
+        return shots
+
+    def assembly_dir(self, video_id: str, tier: QualityTier = QualityTier.FINAL) -> Path:
+        """Where the assembled video of a tier and its intermediate files live."""
+        return ASSETS_DIR / "videos" / video_id / "assembly" / tier.value.lower()
+
+    def has_valid_artifacts(self, shot: Shot) -> bool:
+        """
+        True if the shot's image (both keyframes for IMAGE_2F_VIDEO, and the video unless STILL_ONLY)
+        exist and are real media files, not the error/placeholder text files written when decoding
+        or downloading failed.
+        """
+        images = [shot.image_path]
+        if shot.asset_mode == AssetMode.IMAGE_2F_VIDEO:
+            images.append(shot.image_last_path)
+        if not all(self._is_media(path, [b"\x89PNG", b"\xff\xd8\xff", b"RIFF"]) for path in images):
+            return False
+        if shot.asset_mode == AssetMode.STILL_ONLY:
+            return True
+        return self._is_media(shot.video_path, [b"ftyp"], offset=4)
+
+    @staticmethod
+    def _is_media(path: Optional[str], signatures, offset: int = 0) -> bool:
+        if not path or not os.path.isfile(path):
+            return False
+        with open(path, "rb") as f:
+            head = f.read(16)[offset:]
+        return any(head.startswith(sig) for sig in signatures)
+
     def get_public_url(self, local_path: str) -> str:
         """
         Converts a local file path to a public URL accessible by Kie.ai.
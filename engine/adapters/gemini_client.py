@@ -1,8 +1,13 @@
+import io
+import threading
 import time
 import requests
+from PIL import Image
 from adapters.logger import Logger
-from domain.errors import ImageGenerationError, PromptError
+from domain.errors import ImageGenerationCancelled, ImageGenerationError, PromptError
+from domain.failures import KieFailure, classify_failure
 from infra.config import Config
+from infra.retry import retry, RetryPolicy, next_retry_delay
 from typing import Optional
 
 logger = Logger()
@@ -19,17 +24,23 @@ class KieNanoBananaClient:
         self.model = Config.KIE_NANO_BANANA_MODEL
         self.poll_interval = 5  # seconds (increased to reduce spam)
         self.max_polls = 120  # max ~10 minutes (Pro model is slower)
+        self.retry_policy = RetryPolicy()
         
         if not self.api_key:
             logger.warning("KIE_API_KEY not found in environment variables.")
 
-    def generate(self, prompt: str, ref_image_url: Optional[str] = None) -> str:
+    def generate(self, prompt: str, ref_image_url: Optional[str] = None, model: Optional[str] = None,
+                 resolution: Optional[str] = None, cancel_event: Optional[threading.Event] = None) -> str:
         """
         Generate an image using Kie.ai Nano Banana API.
         
         Args:
             prompt: Text prompt for image generation
             ref_image_url: Optional URL of an image to use as reference/anchor
+            model: Model override (quality tier), defaults to KIE_NANO_BANANA_MODEL
+            resolution: Resolution override (quality tier), defaults to KIE_IMAGE_RESOLUTION
+            cancel_event: When set, no task is submitted (nor resubmitted after a retry backoff), polling
+                stops and ImageGenerationCancelled is raised
             
         Returns:
             URL of the generated image
@@ -42,10 +53,13 @@ class KieNanoBananaClient:
 
         try:
             # Step 1: Create task
-            task_id = self._create_task(prompt, ref_image_url)
+            task_id = self._create_task(prompt, ref_image_url, model or self.model,
+                                        resolution or Config.KIE_IMAGE_RESOLUTION, cancel_event)
             
             # Step 2: Poll until completion
-            image_url = self._poll_until_complete(task_id)
+            image_url = self._poll_until_complete(task_id, cancel_event)
+            if cancel_event is not None and cancel_event.is_set():
+                raise ImageGenerationCancelled(f"Kie.ai task {task_id} no longer needed", retryable=False)
             
             # Step 3: Download and return as data URI
             return self._download_image(image_url)
@@ -56,8 +70,13 @@ class KieNanoBananaClient:
             logger.error(f"Kie.ai Nano Banana generation failed: {e}")
             raise ImageGenerationError(f"Image generation failed: {e}")
 
-    def _create_task(self, prompt: str, ref_image_url: Optional[str] = None) -> str:
-        """Submit image generation task to Kie.ai API."""
+    @retry(name="kie.image.create_task", idempotent=False)
+    def _create_task(self, prompt: str, ref_image_url: Optional[str], model: str, resolution: str,
+                     cancel_event: Optional[threading.Event] = None) -> str:
+        """Submit image generation task to Kie.ai API (not if the caller no longer needs the image)."""
+        if cancel_event is not None and cancel_event.is_set():
+            # Checked on every retry too, so a cancelled straggler never pays for a task
+            raise ImageGenerationCancelled("Image no longer needed, task not submitted", retryable=False)
         url = f"{self.base_url}/api/v1/jobs/createTask"
         
         headers = {
@@ -68,8 +87,8 @@ class KieNanoBananaClient:
         input_data = {
             "prompt": prompt,
             "output_format": "png",
-            "aspect_ratio": "16:9",
-            "resolution": "1K"
+            "aspect_ratio": Config.KIE_IMAGE_ASPECT_RATIO,
+            "resolution": resolution
         }
         
         logger.info(f"Using prompt: {prompt}")
@@ -83,8 +102,11 @@ class KieNanoBananaClient:
              # Let's trust the guide: only image_input.
              logger.info(f"Using reference image: {ref_image_url} (image_input)")
         
+        if model.startswith("google/"):
+            model, input_data = self._base_model_input(model, input_data)
+        
         payload = {
-            "model": self.model,
+            "model": model,
             "input": input_data
         }
         
@@ -95,12 +117,12 @@ class KieNanoBananaClient:
         if response.status_code != 200:
             error_msg = response.text
             logger.error(f"Kie.ai API error: {error_msg}")
-            raise ImageGenerationError(f"Kie.ai API returned {response.status_code}: {error_msg}")
+            raise ImageGenerationError(f"Kie.ai API returned {response.status_code}: {error_msg}", status_code=response.status_code)
         
         data = response.json()
         
         if data.get("code") != 200:
-            raise ImageGenerationError(f"Kie.ai error: {data.get('msg')}")
+            raise ImageGenerationError(f"Kie.ai error: {data.get('msg')}", status_code=data.get("code"))
         
         task_id = data.get("data", {}).get("taskId")
         
@@ -110,35 +132,54 @@ class KieNanoBananaClient:
         logger.info(f"Kie.ai task created: {task_id}")
         return task_id
 
-    def _poll_until_complete(self, task_id: str) -> str:
-        """Poll task status until image is ready."""
+    @staticmethod
+    def _base_model_input(model: str, input_data: dict) -> tuple:
+        """
+        Base (non-Pro) Nano Banana models, used for drafts, take the size as image_size and
+        references as image_urls on their -edit variant; they have no resolution setting.
+        """
+        converted = {
+            "prompt": input_data["prompt"],
+            "output_format": input_data["output_format"],
+            "image_size": input_data["aspect_ratio"]
+        }
+        if input_data.get("image_input"):
+            converted["image_urls"] = input_data["image_input"]
+            if not model.endswith("-edit"):
+                model = f"{model}-edit"
+        return model, converted
+
+    def _poll_until_complete(self, task_id: str, cancel_event: Optional[threading.Event] = None) -> str:
+        """Poll task status until image is ready (or `cancel_event` is set)."""
         url = f"{self.base_url}/api/v1/jobs/recordInfo"
         
         headers = {
             "Authorization": f"Bearer {self.api_key}"
         }
         
+        poll_errors = 0  # consecutive failed polls, reset on every good response
+        
+        cancel_event = cancel_event or threading.Event()
+        
         for attempt in range(self.max_polls):
+            if cancel_event.is_set():
+                raise ImageGenerationCancelled(f"Kie.ai task {task_id} no longer needed", retryable=False)
             logger.info(f"Polling Kie.ai task (attempt {attempt + 1}/{self.max_polls})...")
             
             try:
                 response = requests.get(url, headers=headers, params={"taskId": task_id}, timeout=30)
-            except requests.RequestException as e:
-                logger.warning(f"Network error during poll: {e}. Retrying in {self.poll_interval}s...")
-                time.sleep(self.poll_interval)
+                if response.status_code != 200:
+                    raise ImageGenerationError(f"Poll returned {response.status_code}: {response.text}", status_code=response.status_code)
+                data = response.json()
+                if data.get("code") != 200:
+                    raise ImageGenerationError(f"Poll error: {data.get('message')}", status_code=data.get("code"))
+            except (requests.RequestException, ImageGenerationError) as e:
+                # Transient errors back off (and consume retry budget), permanent ones raise
+                cancel_event.wait(next_retry_delay(e, poll_errors, self.retry_policy, "kie.image.poll"))
+                poll_errors += 1
                 continue
             
-            if response.status_code != 200:
-                logger.warning(f"Poll returned {response.status_code}: {response.text}")
-                time.sleep(self.poll_interval)
-                continue
-            
-            data = response.json()
-            
-            if data.get("code") != 200:
-                logger.warning(f"Poll error: {data.get('message')}")
-                time.sleep(self.poll_interval)
-                continue
+            poll_errors = 0
             
             task_data = data.get("data", {})
             state = task_data.get("state")
@@ -161,14 +202,18 @@ class KieNanoBananaClient:
             elif state == "fail":
                 fail_code = task_data.get("failCode", "")
                 fail_msg = task_data.get("failMsg", "Unknown error")
-                raise ImageGenerationError(f"Kie.ai task failed [{fail_code}]: {fail_msg}")
+                failure = KieFailure(source="image", fail_code=str(fail_code), fail_msg=fail_msg,
+                                     category=classify_failure(fail_code, fail_msg))
+                raise ImageGenerationError(f"Kie.ai task failed [{fail_code}] ({failure.category.value}): {fail_msg}",
+                                           failure=failure)
             
-            # Still processing (waiting, queuing, generating)
+            # Still processing (waiting, queuing, generating); a cancel wakes the wait up
             logger.info(f"Task state: {state}")
-            time.sleep(self.poll_interval)
+            cancel_event.wait(self.poll_interval)
         
         raise ImageGenerationError(f"Kie.ai task timed out after {self.max_polls * self.poll_interval} seconds")
 
+    @retry(name="kie.image.download")
     def _download_image(self, image_url: str) -> str:
         """Download image and return as data URI."""
         import base64
@@ -178,7 +223,7 @@ class KieNanoBananaClient:
         response = requests.get(image_url, timeout=60)
         
         if response.status_code != 200:
-            raise ImageGenerationError(f"Failed to download image: {response.status_code}")
+            raise ImageGenerationError(f"Failed to download image: {response.status_code}", status_code=response.status_code)
         
         # Determine mime type from content-type header or default to png
         content_type = response.headers.get("Content-Type", "image/png")
@@ -190,6 +235,9 @@ class KieNanoBananaClient:
             mime_type = "image/png"
         
         image_bytes = response.content
+        # Content-Length counts the encoded bytes when the body is compressed
+        length = None if response.headers.get("Content-Encoding") else response.headers.get("Content-Length")
+        self._check_image(image_bytes, length)
         image_b64 = base64.b64encode(image_bytes).decode("utf-8")
         
         logger.info(f"Image downloaded: {len(image_bytes)} bytes")
@@ -197,5 +245,18 @@ class KieNanoBananaClient:
         return f"data:{mime_type};base64,{image_b64}"
 
 
+    @staticmethod
+    def _check_image(image_bytes: bytes, content_length: Optional[str]) -> None:
+        """A cut or garbled download raises a retryable error, so the retry downloads it again."""
+        if content_length and content_length.isdigit() and int(content_length) != len(image_bytes):
+            raise ImageGenerationError(f"Incomplete image download: {len(image_bytes)} of {content_length} bytes",
+                                       retryable=True)
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as img:
+                img.load()
+        except Exception as e:
+            raise ImageGenerationError(f"Downloaded image does not decode: {e}", retryable=True)
+
+
 # Alias for backward compatibility
 GeminiImageClient = KieNanoBananaClient
@@ -0,0 +1,73 @@
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from adapters.logger import Logger
+from infra.config import Config
+from infra.metrics import metrics
+
+logger = Logger()
+
+
+def quantile(ordered: List[float], q: float) -> float:
+    """Nearest-rank quantile of an already sorted list."""
+    return ordered[int(q * (len(ordered) - 1))] if ordered else 0.0
+
+
+class LatencyStore:
+    """
+    Recent per-stage latencies (image generation, video generation...) persisted as JSON,
+    so time estimates survive restarts. Keeps the last `max_samples` per stage; writes are
+    read-modify-write under a file lock so all workers contribute to the same file.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_samples: Optional[int] = None):
+        self.path = Path(path or Config.LATENCY_STORE_PATH)
+        self.max_samples = max_samples or Config.LATENCY_MAX_SAMPLES
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        metrics.observe("shot.stage_seconds", seconds, stage=stage)
+        try:
+            with self._lock, self._file_lock():
+                samples = self._read()
+                stage_samples = samples.setdefault(stage, [])
+                stage_samples.append(round(seconds, 3))
+                del stage_samples[: max(0, len(stage_samples) - self.max_samples)]
+                self._write(samples)
+        except OSError as e:
+            logger.warning(f"Could not record {stage} latency: {e}")
+
+    def samples(self, stage: str) -> List[float]:
+        with self._lock:
+            return list(self._read().get(stage, []))
+
+    def all_samples(self) -> Dict[str, List[float]]:
+        with self._lock:
+            return self._read()
+
+    def _read(self) -> Dict[str, List[float]]:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable latency store {self.path}, starting over: {e}")
+            return {}
+
+    def _write(self, samples: Dict[str, List[float]]) -> None:
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(samples, f)
+        os.replace(tmp, self.path)
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.path.parent, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
@@ -0,0 +1,126 @@
+from typing import Iterator, NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+
+from adapters.ffmpeg_adapter import FFmpegAdapter
+from adapters.logger import Logger
+from infra.config import Config
+
+logger = Logger()
+
+
+class Move(NamedTuple):
+    """
+    Ken Burns trajectory over the image: `zoom` is the crop size relative to the full 16:9 frame
+    (1.0 = whole frame, 0.8 = 1.25x magnified), `dx`/`dy` the crop centre within the free margin
+    (-1 = left/top edge, 1 = right/bottom edge). Each is (start, end); `shake` adds handheld jitter.
+    """
+    zoom: tuple = (1.0, 1.0)
+    dx: tuple = (0.0, 0.0)
+    dy: tuple = (0.0, 0.0)
+    shake: float = 0.0
+
+
+# One trajectory per camera_move in usecases.utils_prompt.CAMERA_MOVES.
+# Orbits cannot change the viewpoint of a still: they are approximated as a pan with a slow push in.
+MOVES = {
+    "static": Move(),
+    "zoom_in": Move(zoom=(1.0, 0.8)),
+    "zoom_out": Move(zoom=(0.8, 1.0)),
+    "dolly_in": Move(zoom=(1.0, 0.72)),
+    "dolly_out": Move(zoom=(0.72, 1.0)),
+    "orbit_left": Move(zoom=(0.88, 0.8), dx=(1.0, -1.0)),
+    "orbit_right": Move(zoom=(0.88, 0.8), dx=(-1.0, 1.0)),
+    "pan_left": Move(zoom=(0.85, 0.85), dx=(1.0, -1.0)),
+    "pan_right": Move(zoom=(0.85, 0.85), dx=(-1.0, 1.0)),
+    "tilt_up": Move(zoom=(0.85, 0.85), dy=(1.0, -1.0)),
+    "tilt_down": Move(zoom=(0.85, 0.85), dy=(-1.0, 1.0)),
+    "handheld_subtle": Move(zoom=(0.92, 0.92), shake=0.35),
+}
+
+
+def smoothstep(t: np.ndarray) -> np.ndarray:
+    """Ease in/out so moves start and stop without a jolt."""
+    return t * t * (3.0 - 2.0 * t)
+
+
+def crop_boxes(move: Move, frames: int, src_w: int, src_h: int, aspect: float) -> np.ndarray:
+    """
+    (frames, 4) array of (left, top, right, bottom) crop boxes in source pixels, all with the
+    output aspect ratio. The full frame is the largest centred box of that aspect in the image.
+    """
+    full_w = min(src_w, src_h * aspect)
+    full_h = full_w / aspect
+    t = smoothstep(np.linspace(0.0, 1.0, frames)) if frames > 1 else np.zeros(1)
+
+    zoom = move.zoom[0] + (move.zoom[1] - move.zoom[0]) * t
+    dx = move.dx[0] + (move.dx[1] - move.dx[0]) * t
+    dy = move.dy[0] + (move.dy[1] - move.dy[0]) * t
+    if move.shake:
+        # Sum of incommensurate sines: smooth, non-repeating drift
+        phase = np.arange(frames) / max(1, Config.LOCAL_MOTION_FPS)
+        dx = dx + move.shake * (0.6 * np.sin(2 * np.pi * 0.31 * phase) + 0.4 * np.sin(2 * np.pi * 0.77 * phase + 1.3))
+        dy = dy + move.shake * (0.6 * np.sin(2 * np.pi * 0.23 * phase + 0.7) + 0.4 * np.sin(2 * np.pi * 0.61 * phase))
+    dx, dy = np.clip(dx, -1.0, 1.0), np.clip(dy, -1.0, 1.0)
+
+    crop_w, crop_h = full_w * zoom, full_h * zoom
+    cx = src_w / 2 + dx * (full_w - crop_w) / 2
+    cy = src_h / 2 + dy * (full_h - crop_h) / 2
+    return np.stack([cx - crop_w / 2, cy - crop_h / 2, cx + crop_w / 2, cy + crop_h / 2], axis=1)
+
+
+class LocalMotionRenderer:
+    """
+    Renders a camera move over a still image as an mp4, on CPU: crop trajectories are computed
+    with NumPy, each frame is a subpixel crop+resize of the image and ffmpeg encodes the raw frames.
+    Takes seconds where a Veo task takes minutes, at no API cost, for shots whose motion is
+    just a camera move (static, zoom, pan, tilt...).
+    """
+
+    def __init__(self, ffmpeg: Optional[FFmpegAdapter] = None, width: Optional[int] = None,
+                 height: Optional[int] = None, fps: Optional[int] = None):
+        self.ffmpeg = ffmpeg or FFmpegAdapter()
+        self.width = width or Config.LOCAL_MOTION_WIDTH
+        self.height = height or Config.LOCAL_MOTION_HEIGHT
+        self.fps = fps or Config.LOCAL_MOTION_FPS
+
+    @staticmethod
+    def supports(camera_move: Optional[str]) -> bool:
+        return (camera_move or "static").strip().lower() in MOVES
+
+    def render(self, image_path: str, camera_move: Optional[str], duration_sec: float, output_path: str) -> str:
+        move_name = (camera_move or "static").strip().lower()
+        move = MOVES.get(move_name)
+        if move is None:
+            logger.warning(f"No local rendering for camera_move '{camera_move}', using a static shot")
+            move = MOVES["static"]
+
+        frames = max(1, round(duration_sec * self.fps))
+        with Image.open(image_path) as img:
+            source = self._working_copy(img, move)
+        boxes = crop_boxes(move, frames, source.width, source.height, self.width / self.height)
+        logger.info(f"Rendering {move_name} locally: {frames} frames at {self.width}x{self.height}")
+        return self.ffmpeg.encode_rgb_frames(self._frames(source, boxes), self.width, self.height, self.fps,
+                                             output_path)
+
+    def _working_copy(self, img: Image.Image, move: Move) -> Image.Image:
+        """RGB copy no larger than needed for the tightest crop, so per-frame resampling stays cheap."""
+        source = img.convert("RGB")
+        full_w = min(source.width, source.height * self.width / self.height)
+        needed_w = self.width / min(move.zoom)
+        scale = needed_w / full_w
+        if scale < 0.5:
+            source = source.resize((max(1, round(source.width * scale)), max(1, round(source.height * scale))),
+                                   Image.LANCZOS)
+        return source
+
+    def _frames(self, source: Image.Image, boxes: np.ndarray) -> Iterator[bytes]:
+        size = (self.width, self.height)
+        previous, frame = None, None
+        for box in boxes:
+            box = tuple(float(v) for v in box)
+            if box != previous:  # static stretches reuse the last frame
+                frame = source.resize(size, Image.BICUBIC, box=box).tobytes()
+                previous = box
+            yield frame
@@ -0,0 +1,329 @@
+import json
+import os
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+from adapters.logger import Logger
+from domain.entities import AssetMode, Shot
+from infra.config import Config
+from infra.metrics import metrics
+
+logger = Logger()
+
+# ISO BMFF boxes holding other boxes, on the path to the ones read below
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+# Sample entry fourcc -> codec name as reported by ffprobe
+CODECS = {b"avc1": "h264", b"avc3": "h264", b"hvc1": "hevc", b"hev1": "hevc", b"av01": "av1", b"vp09": "vp9",
+          b"mp4a": "aac", b"Opus": "opus"}
+
+
+class VideoInfo(NamedTuple):
+    codec: Optional[str]
+    width: int
+    height: int
+    duration_sec: float
+    fps: float = 0.0  # from the mp4 headers only
+    audio: Optional[str] = None  # "codec/sample_rate/channels" of the first audio track (mp4 headers only)
+
+
+def video_format(info: VideoInfo) -> Tuple[str, int, int, float]:
+    """(codec, width, height, fps): clips with the same one can be joined by stream copy."""
+    return info.codec, info.width, info.height, info.fps
+
+
+def audio_format(info: VideoInfo) -> Optional[Tuple[str, int, int]]:
+    """(codec, sample_rate, channels) of the audio track, None for silent clips."""
+    if not info.audio:
+        return None
+    codec, rate, channels = info.audio.split("/")
+    return codec, int(rate), int(channels)
+
+
+class MediaReport(NamedTuple):
+    """
+    Result of verifying a media file. `problems` make the file unusable (truncated, undecodable,
+    wrong codec/size): it is re-downloaded or regenerated. `warnings` are reported only
+    (e.g. a duration other than the shot's duracion_seg).
+    """
+    problems: Tuple[str, ...] = ()
+    warnings: Tuple[str, ...] = ()
+    video: Optional[VideoInfo] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def _boxes(data: bytes, start: int, end: int, problems: List[str]) -> Iterator[Tuple[bytes, int, int]]:
+    """(type, payload start, box end) of the boxes in data[start:end]; overruns are reported in `problems`."""
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                problems.append(f"truncated {kind.decode('latin-1')} box header")
+                return
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset  # extends to the end
+        if size < header:
+            problems.append(f"invalid {kind.decode('latin-1')} box size {size}")
+            return
+        if offset + size > end:
+            problems.append(f"truncated {kind.decode('latin-1')} box: needs {offset + size - end} more bytes")
+            return
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def _full_box(data: bytes, offset: int) -> Tuple[int, int]:
+    """(version, offset after the version/flags word) of a full box payload."""
+    return data[offset], offset + 4
+
+
+class Mp4Scanner:
+    """
+    Reads the box structure of an mp4 without decoding it: every top-level box must fit in the file
+    (a cut download fails here even when the moov is intact), the movie must have a video track,
+    and its chunk offsets must point inside the file.
+    """
+
+    def scan(self, path: str) -> Tuple[List[str], Optional[VideoInfo]]:
+        problems: List[str] = []
+        file_size = os.path.getsize(path)
+        top = {}
+        with open(path, "rb") as f:
+            offset = 0
+            while offset + 8 <= file_size:
+                f.seek(offset)
+                head = f.read(16)
+                size, kind = struct.unpack_from(">I4s", head)
+                if size == 1 and len(head) == 16:
+                    size = struct.unpack_from(">Q", head, 8)[0]
+                elif size == 0:
+                    size = file_size - offset
+                if size < 8:
+                    problems.append(f"invalid {kind.decode('latin-1')} box size {size}")
+                    break
+                if offset + size > file_size:
+                    problems.append(f"truncated {kind.decode('latin-1')} box: "
+                                    f"needs {offset + size - file_size} more bytes")
+                    break
+                top.setdefault(kind, (offset, size))
+                offset += size
+            for required in (b"ftyp", b"moov", b"mdat"):
+                if required not in top and not problems:
+                    problems.append(f"no {required.decode()} box")
+            if b"moov" not in top:
+                return problems, None
+            moov_offset, moov_size = top[b"moov"]
+            f.seek(moov_offset)
+            moov = f.read(moov_size)
+
+        info, chunk_end = self._movie(moov, problems)
+        if chunk_end > file_size:
+            problems.append(f"media data truncated: chunks reference offset {chunk_end}, file has {file_size} bytes")
+        return problems, info
+
+    def _movie(self, moov: bytes, problems: List[str]) -> Tuple[Optional[VideoInfo], int]:
+        duration = 0.0
+        video = audio = None
+        chunk_end = 0
+        for kind, start, end in _boxes(moov, 8, len(moov), problems):
+            if kind == b"mvhd":
+                version, pos = _full_box(moov, start)
+                if version == 1:
+                    timescale, length = struct.unpack_from(">IQ", moov, pos + 16)
+                else:
+                    timescale, length = struct.unpack_from(">II", moov, pos + 8)
+                duration = length / timescale if timescale else 0.0
+            elif kind == b"trak":
+                track = self._track(moov, start, end, problems)
+                chunk_end = max(chunk_end, track["chunk_end"])
+                if track["handler"] == b"vide" and video is None:
+                    video = track
+                elif track["handler"] == b"soun" and audio is None:
+                    audio = track
+        if video is None:
+            problems.append("no video track")
+            return None, chunk_end
+        fps = round(video["samples"] / video["duration"], 3) if video["duration"] else 0.0
+        audio_format = f"{audio['codec']}/{audio['sample_rate']}/{audio['channels']}" if audio else None
+        return VideoInfo(video["codec"], video["width"], video["height"], duration or video["duration"],
+                         fps, audio_format), chunk_end
+
+    def _track(self, data: bytes, start: int, end: int, problems: List[str]) -> dict:
+        track = {"handler": None, "codec": None, "width": 0, "height": 0, "duration": 0.0, "chunk_end": 0,
+                 "samples": 0, "sample_rate": 0, "channels": 0}
+        sizes: List[int] = []
+        stack = [(start, end)]
+        while stack:
+            box_start, box_end = stack.pop()
+            for kind, pos, stop in _boxes(data, box_start, box_end, problems):
+                if kind in CONTAINER_BOXES:
+                    stack.append((pos, stop))
+                elif kind == b"tkhd":
+                    version, pos = _full_box(data, pos)
+                    width, height = struct.unpack_from(">II", data, pos + (84 if version == 1 else 72))
+                    track["width"], track["height"] = width >> 16, height >> 16
+                elif kind == b"mdhd":
+                    version, pos = _full_box(data, pos)
+                    if version == 1:
+                        timescale, length = struct.unpack_from(">IQ", data, pos + 16)
+                    else:
+                        timescale, length = struct.unpack_from(">II", data, pos + 8)
+                    track["duration"] = length / timescale if timescale else 0.0
+                elif kind == b"hdlr":
+                    track["handler"] = data[pos + 8:pos + 12]
+                elif kind == b"stsd":
+                    fourcc = data[pos + 12:pos + 16]
+                    track["codec"] = CODECS.get(fourcc, fourcc.decode("latin-1").strip())
+                    # AudioSampleEntry: 8 + 8 reserved bytes, channelcount, samplesize, 4 bytes, 16.16 samplerate
+                    if pos + 44 <= stop:
+                        track["channels"] = struct.unpack_from(">H", data, pos + 32)[0]
+                        track["sample_rate"] = struct.unpack_from(">I", data, pos + 40)[0] >> 16
+                elif kind == b"stsz":
+                    sample_size, count = struct.unpack_from(">II", data, pos + 4)
+                    track["samples"] = count
+                    if sample_size == 0 and count:
+                        sizes = [struct.unpack_from(">I", data, pos + 12 + 4 * (count - 1))[0]]
+                    else:
+                        sizes = [sample_size]
+                elif kind in (b"stco", b"co64"):
+                    count = struct.unpack_from(">I", data, pos + 4)[0]
+                    if count:
+                        fmt, entry = (">Q", 8) if kind == b"co64" else (">I", 4)
+                        last = struct.unpack_from(fmt, data, pos + 8 + entry * (count - 1))[0]
+                        track["chunk_end"] = max(track["chunk_end"], last)
+        # The last chunk ends at least one (the last) sample after its offset
+        if track["chunk_end"] and sizes:
+            track["chunk_end"] += sizes[-1]
+        return track
+
+
+class MediaVerifier:
+    """
+    Verifies downloaded / rendered media before a shot is marked done, so corruption shows up
+    where it is cheap to fix (re-download from the result URL) instead of in the final cut.
+
+    Videos: mp4 structure (Mp4Scanner), then codec, resolution and duration, from ffprobe when it
+    is installed (from the mp4 headers otherwise). Images: full decode of the header and data,
+    and minimum dimensions. Checks run on a small worker pool, which bounds the ffprobe processes
+    running at once however many shots/requests verify concurrently.
+    """
+
+    def __init__(self, ffprobe_bin: Optional[str] = None, workers: Optional[int] = None):
+        self.ffprobe_bin = ffprobe_bin or Config.FFPROBE_BIN
+        self.scanner = Mp4Scanner()
+        self._pool = ThreadPoolExecutor(max_workers=workers or Config.MEDIA_VERIFY_WORKERS,
+                                        thread_name_prefix="verify")
+
+    def verify_shot(self, shot: Shot, download: Optional[Callable[[str, str], str]] = None) -> MediaReport:
+        """Images and video of a shot (as stored in its metadata); see verify_video for `download`."""
+        images = [shot.image_path]
+        if shot.asset_mode == AssetMode.IMAGE_2F_VIDEO:
+            images.append(shot.image_last_path)
+        reports = [self.verify_image(path) for path in images]
+        video = None
+        if shot.video_path or shot.asset_mode != AssetMode.STILL_ONLY:
+            video = self.verify_video(shot.video_path, shot.duracion_seg, shot.video_source_url, download)
+            reports.append(video)
+        return MediaReport(problems=sum((r.problems for r in reports), ()),
+                           warnings=sum((r.warnings for r in reports), ()),
+                           video=video.video if video else None)
+
+    def verify_video(self, path: Optional[str], expected_sec: Optional[float] = None,
+                     source_url: Optional[str] = None,
+                     download: Optional[Callable[[str, str], str]] = None) -> MediaReport:
+        """
+        With `source_url` and `download(url, path)`, an invalid video is downloaded again (up to
+        MEDIA_REDOWNLOAD_ATTEMPTS times) instead of being reported straight away: a cut or garbled
+        transfer is fixed for the price of a download, not of a new Veo task.
+        """
+        report = self._pool.submit(self._verify_video, path, expected_sec).result()
+        attempts = Config.MEDIA_REDOWNLOAD_ATTEMPTS if source_url and download and path else 0
+        for attempt in range(attempts):
+            if report.ok:
+                break
+            logger.warning(f"{os.path.basename(path)} failed verification ({'; '.join(report.problems)}), "
+                           f"downloading it again ({attempt + 1}/{attempts})")
+            metrics.incr("media.redownload", kind="video")
+            try:
+                download(source_url, path)
+            except Exception as e:
+                logger.warning(f"Re-download of {source_url} failed: {e}")
+                break
+            report = self._pool.submit(self._verify_video, path, expected_sec).result()
+        return report
+
+    def verify_image(self, path: Optional[str]) -> MediaReport:
+        return self._pool.submit(self._verify_image, path).result()
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+
+    def _verify_video(self, path: Optional[str], expected_sec: Optional[float]) -> MediaReport:
+        if not path or not os.path.isfile(path):
+            return self._report("video", problems=[f"video missing: {path}"])
+        try:
+            problems, info = self.scanner.scan(path)
+        except (OSError, struct.error) as e:
+            problems, info = [f"unreadable mp4 structure: {e}"], None
+        if not problems and shutil.which(self.ffprobe_bin):
+            try:
+                info = self._ffprobe(path)
+            except Exception as e:
+                problems.append(f"ffprobe failed: {e}")
+        if problems or info is None:
+            return self._report("video", problems=problems or ["no video stream"])
+
+        warnings = []
+        codecs = [c.strip() for c in Config.MEDIA_VIDEO_CODECS.split(",") if c.strip()]
+        if codecs and info.codec not in codecs:
+            problems.append(f"codec {info.codec}, expected {'/'.join(codecs)}")
+        if min(info.width, info.height) < Config.MEDIA_MIN_VIDEO_SIDE:
+            problems.append(f"resolution {info.width}x{info.height} below {Config.MEDIA_MIN_VIDEO_SIDE}px")
+        if info.duration_sec <= 0:
+            problems.append("zero duration")
+        elif expected_sec and abs(info.duration_sec - expected_sec) > Config.MEDIA_DURATION_TOLERANCE_SEC:
+            warnings.append(f"duration {info.duration_sec:.2f}s, shot expects {expected_sec:.2f}s")
+        return self._report("video", problems, warnings, info)
+
+    def _ffprobe(self, path: str) -> VideoInfo:
+        cmd = [self.ffprobe_bin, "-v", "error", "-select_streams", "v:0",
+               "-show_entries", "stream=codec_name,width,height:format=duration", "-of", "json", path]
+        proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True, timeout=30)
+        if proc.returncode != 0:
+            raise ValueError(proc.stderr.decode("utf-8", "replace").strip()[-300:])
+        data = json.loads(proc.stdout or b"{}")
+        streams = data.get("streams") or []
+        if not streams:
+            raise ValueError("no video stream")
+        stream = streams[0]
+        return VideoInfo(stream.get("codec_name"), int(stream.get("width") or 0), int(stream.get("height") or 0),
+                         float(data.get("format", {}).get("duration") or 0.0))
+
+    def _verify_image(self, path: Optional[str]) -> MediaReport:
+        if not path or not os.path.isfile(path):
+            return self._report("image", problems=[f"image missing: {path}"])
+        try:
+            with Image.open(path) as img:
+                size = img.size
+                img.load()  # decodes everything: a cut file raises here
+        except Exception as e:
+            return self._report("image", problems=[f"undecodable image {os.path.basename(path)}: {e}"])
+        if min(size) < Config.MEDIA_MIN_IMAGE_SIDE:
+            return self._report("image", problems=[f"image {size[0]}x{size[1]} below {Config.MEDIA_MIN_IMAGE_SIDE}px"])
+        return self._report("image")
+
+    @staticmethod
+    def _report(kind: str, problems=(), warnings=(), info: Optional[VideoInfo] = None) -> MediaReport:
+        metrics.incr("media.verify", kind=kind, result="ok" if not problems else "invalid")
+        return MediaReport(tuple(problems), tuple(warnings), info)
@@ -0,0 +1,160 @@
+import hashlib
+import hmac
+import os
+import secrets
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from adapters.logger import Logger
+from infra.config import Config
+from infra.hashing import file_sha256
+from infra.metrics import metrics
+
+logger = Logger()
+
+
+def load_signing_key(path: str) -> str:
+    """
+    Signing key kept in `path`, generated on first use. Created with a hard link from a private
+    temp file, so concurrent workers never read a partial key and all end up with the same one.
+    """
+    key_path = Path(path)
+    if not key_path.exists():
+        os.makedirs(key_path.parent, exist_ok=True)
+        tmp = key_path.parent / f".{key_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(tmp, key_path)
+            logger.info(f"Generated reference signing key in {key_path}")
+        except FileExistsError:
+            pass  # another worker created it first
+        finally:
+            tmp.unlink()
+    key = key_path.read_text(encoding="utf-8").strip()
+    if not key:
+        raise ValueError(f"Empty reference signing key in {key_path}")
+    return key
+
+
+class ReferenceHost:
+    """
+    Hosts reference images (shot keyframes, catalog assets) for Kie.ai under
+    content-hashed, expiring signed URLs served by the engine itself (GET /refs/{name}).
+
+    Files are linked into REFERENCE_HOST_DIR as `{sha256[:32]}{ext}` and a
+    hash -> URL cache guarantees the same content is never re-hosted while its URL is valid.
+    URLs are signed with REFERENCE_SIGNING_KEY, or a random key persisted in REFERENCE_SIGNING_KEY_PATH.
+    """
+
+    def __init__(self, hosted_dir: Optional[str] = None, public_base_url: Optional[str] = None,
+                 secret: Optional[str] = None, ttl_sec: Optional[int] = None,
+                 min_remaining_sec: Optional[int] = None, verify_reachable: Optional[bool] = None):
+        self.hosted_dir = Path(hosted_dir or Config.REFERENCE_HOST_DIR)
+        self.public_base_url = (public_base_url or Config.PUBLIC_BASE_URL).rstrip("/")
+        self.secret = (secret or Config.REFERENCE_SIGNING_KEY
+                       or load_signing_key(Config.REFERENCE_SIGNING_KEY_PATH)).encode("utf-8")
+        self.ttl_sec = ttl_sec if ttl_sec is not None else Config.REFERENCE_URL_TTL_SEC
+        self.min_remaining_sec = min_remaining_sec if min_remaining_sec is not None else Config.REFERENCE_URL_MIN_REMAINING_SEC
+        self.verify_reachable = verify_reachable if verify_reachable is not None else Config.REFERENCE_VERIFY_REACHABLE
+        self._lock = threading.Lock()
+        self._urls: Dict[str, Tuple[str, float]] = {}  # name -> (url, expires_at)
+        self._hashes: Dict[Tuple[str, int, int], str] = {}  # (path, size, mtime_ns) -> sha256
+
+    # --- Public API -------------------------------------------------------
+
+    def url_for(self, local_path: str, content_hash: Optional[str] = None) -> str:
+        """Returns a signed URL for the file, reusing a cached one while it is still valid."""
+        path = Path(local_path)
+        name = self._hosted_name(path, content_hash)
+
+        with self._lock:
+            cached = self._urls.get(name)
+        if cached and self._still_works(name, *cached):
+            metrics.incr("refs.url_cache", result="hit")
+            return cached[0]
+
+        metrics.incr("refs.url_cache", result="miss")
+        return self._publish(path, name)
+
+    def rehost(self, local_path: str, content_hash: Optional[str] = None) -> str:
+        """Drops any cached URL for the file and publishes it again with a fresh signature."""
+        path = Path(local_path)
+        name = self._hosted_name(path, content_hash)
+        with self._lock:
+            self._urls.pop(name, None)
+        hosted = self.hosted_dir / name
+        if hosted.exists():
+            hosted.unlink()
+        metrics.incr("refs.rehost")
+        return self._publish(path, name)
+
+    def resolve(self, name: str, exp: int, sig: str) -> Optional[Path]:
+        """Validates a signed request for /refs/{name}. Returns the hosted file, or None if invalid/expired."""
+        if "/" in name or "\\" in name or name.startswith("."):
+            return None
+        if exp < time.time():
+            return None
+        if not hmac.compare_digest(self._sign(name, exp), sig or ""):
+            return None
+        path = self.hosted_dir / name
+        return path if path.is_file() else None
+
+    # --- Internals ----------------------------------------------------------
+
+    def _hosted_name(self, path: Path, content_hash: Optional[str]) -> str:
+        digest = content_hash or self._content_hash(path)
+        return f"{digest[:32]}{path.suffix.lower()}"
+
+    def _content_hash(self, path: Path) -> str:
+        stat = path.stat()
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._hashes.get(key)
+        if digest is None:
+            digest = file_sha256(path)
+            with self._lock:
+                self._hashes[key] = digest
+        return digest
+
+    def _publish(self, path: Path, name: str) -> str:
+        hosted = self.hosted_dir / name
+        if not hosted.exists():
+            os.makedirs(self.hosted_dir, exist_ok=True)
+            tmp = self.hosted_dir / f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.link(path, tmp)
+            except OSError:
+                # Different filesystem (e.g. network-mounted catalog): fall back to a copy
+                shutil.copy2(path, tmp)
+                os.chmod(tmp, 0o644)
+            os.replace(tmp, hosted)
+
+        expires_at = int(time.time()) + self.ttl_sec
+        url = f"{self.public_base_url}/refs/{name}?exp={expires_at}&sig={self._sign(name, expires_at)}"
+        with self._lock:
+            self._urls[name] = (url, expires_at)
+        logger.info(f"Hosted reference {path.name} as {name} (valid {self.ttl_sec}s)")
+        return url
+
+    def _still_works(self, name: str, url: str, expires_at: float) -> bool:
+        """A cached URL is reused only if it will not expire soon and its hosted file is still there."""
+        if expires_at - time.time() < self.min_remaining_sec:
+            return False
+        if not (self.hosted_dir / name).exists():
+            return False
+        if self.verify_reachable:
+            try:
+                return requests.head(url, timeout=5).status_code == 200
+            except requests.RequestException:
+                return False
+        return True
+
+    def _sign(self, name: str, exp: int) -> str:
+        return hmac.new(self.secret, f"{name}:{exp}".encode("utf-8"), hashlib.sha256).hexdigest()[:32]
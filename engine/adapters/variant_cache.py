@@ -0,0 +1,153 @@
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from adapters.logger import Logger
+from infra.config import Config
+from infra.hashing import file_sha256
+from infra.metrics import metrics
+
+logger = Logger()
+
+# Long edge in pixels of each Kie.ai output resolution
+RESOLUTION_LONG_EDGE = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+
+def target_box(resolution: str, aspect_ratio: str) -> Tuple[int, int]:
+    """Pixel box (width, height) of an output resolution/aspect ratio, e.g. ("1K", "16:9") -> (1024, 576)."""
+    long_edge = RESOLUTION_LONG_EDGE.get(resolution.upper(), RESOLUTION_LONG_EDGE["1K"])
+    w, h = (int(part) for part in aspect_ratio.split(":"))
+    if w >= h:
+        return long_edge, round(long_edge * h / w)
+    return round(long_edge * w / h), long_edge
+
+
+def _render_variant(source: str, target_stem: str, box: Tuple[int, int], quality: int) -> Optional[str]:
+    """
+    Runs in a worker process: downscales `source` to cover `box` (never upscaled) and recompresses it,
+    as PNG when it has transparency and JPEG otherwise.
+    Returns the variant path, or None (nothing written) when the source is already small enough.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        # Fill the box on its short side so the model still gets full detail at the output framing
+        scale = max(box[0] / img.width, box[1] / img.height)
+        if scale >= 1:
+            # Already at or below the output size: recompressing would only lose quality
+            return None
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        target = f"{target_stem}{'.png' if has_alpha else '.jpg'}"
+        tmp = f"{target}.{os.getpid()}.tmp"
+        if has_alpha:
+            img.save(tmp, format="PNG", optimize=True)
+        else:
+            img.convert("RGB").save(tmp, format="JPEG", quality=quality, optimize=True, progressive=True)
+
+    if os.path.getsize(tmp) >= os.path.getsize(source):
+        os.remove(tmp)
+        return None
+    os.replace(tmp, target)
+    return target
+
+
+class VariantCache:
+    """
+    Derived copies of reference assets, downscaled/recompressed for one output resolution and aspect ratio.
+
+    Variants are named `{sha256[:32]}_{resolution}_{aspect}{ext}`: keyed by source content, so an
+    edited asset gets a new variant and stale ones are simply never asked for again.
+    Rendering runs in a process pool (Pillow is CPU-bound and holds the GIL); concurrent shots
+    asking for the same variant wait on the same job.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, workers: Optional[int] = None,
+                 quality: Optional[int] = None):
+        self.cache_dir = Path(cache_dir or Config.VARIANT_CACHE_DIR)
+        self.workers = workers or Config.VARIANT_WORKERS
+        self.quality = quality or Config.VARIANT_JPEG_QUALITY
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+
+    def variant_for(self, source_path: str, resolution: Optional[str] = None, aspect_ratio: Optional[str] = None,
+                    content_hash: Optional[str] = None) -> str:
+        """
+        Path of the variant of `source_path` for the given output; the source itself when a variant
+        is not worth it (already small enough) or cannot be rendered.
+        """
+        resolution = resolution or Config.KIE_IMAGE_RESOLUTION
+        aspect_ratio = aspect_ratio or Config.KIE_IMAGE_ASPECT_RATIO
+        source = Path(source_path)
+        stem = self._stem(source, resolution, aspect_ratio, content_hash)
+
+        cached = self._cached(source, stem)
+        if cached is not None:
+            metrics.incr("variants.cache", result="hit")
+            return cached
+
+        metrics.incr("variants.cache", result="miss")
+        skip_marker = self.cache_dir / f"{stem}.orig"
+        try:
+            variant = self._submit(stem, source, target_box(resolution, aspect_ratio)).result()
+        except Exception as e:
+            logger.warning(f"Could not render variant of {source.name}, using the original: {e}")
+            return str(source)
+
+        if variant is None:
+            # Remember that the original is already small enough
+            skip_marker.touch()
+            return str(source)
+
+        logger.info(f"Variant {Path(variant).name}: {source.stat().st_size} -> {os.path.getsize(variant)} bytes")
+        return variant
+
+    def lookup(self, source_path: str, resolution: Optional[str] = None, aspect_ratio: Optional[str] = None,
+               content_hash: Optional[str] = None) -> Optional[str]:
+        """Like variant_for, but never renders: None if the variant is not cached yet."""
+        source = Path(source_path)
+        stem = self._stem(source, resolution or Config.KIE_IMAGE_RESOLUTION,
+                          aspect_ratio or Config.KIE_IMAGE_ASPECT_RATIO, content_hash)
+        return self._cached(source, stem)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _stem(source: Path, resolution: str, aspect_ratio: str, content_hash: Optional[str]) -> str:
+        digest = content_hash or file_sha256(source)
+        return f"{digest[:32]}_{resolution}_{aspect_ratio.replace(':', 'x')}"
+
+    def _cached(self, source: Path, stem: str) -> Optional[str]:
+        for ext in (".jpg", ".png"):
+            cached = self.cache_dir / f"{stem}{ext}"
+            if cached.exists():
+                return str(cached)
+        if (self.cache_dir / f"{stem}.orig").exists():
+            return str(source)
+        return None
+
+    def _submit(self, stem: str, source: Path, box: Tuple[int, int]) -> Future:
+        with self._lock:
+            future = self._pending.get(stem)
+            if future is not None:
+                return future
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            future = self._pool.submit(_render_variant, str(source), str(self.cache_dir / stem), box, self.quality)
+            self._pending[stem] = future
+        future.add_done_callback(lambda _: self._forget(stem))
+        return future
+
+    def _forget(self, stem: str) -> None:
+        with self._lock:
+            self._pending.pop(stem, None)
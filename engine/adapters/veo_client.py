@@ -1,10 +1,12 @@
 import time
-import base64
 import requests
 import json
 from adapters.logger import Logger
-from domain.errors import VideoGenerationError
+from domain.errors import VideoGenerationError, VideoQueueTimeout
+from domain.failures import KieFailure, classify_failure
+from adapters.reference_host import ReferenceHost
 from infra.config import Config
+from infra.retry import retry, RetryPolicy, next_retry_delay
 
 logger = Logger()
 
@@ -14,26 +16,33 @@ class KieVeoClient:
     Uses async task-based API with polling.
     """
     
-    def __init__(self):
+    def __init__(self, reference_host: ReferenceHost = None):
         self.api_key = Config.KIE_API_KEY
         self.base_url = Config.KIE_API_BASE
         self.model = Config.KIE_VEO_MODEL
         self.poll_interval = 10  # seconds
         self.max_polls = 60  # max ~10 minutes
+        self.retry_policy = RetryPolicy()
+        self.reference_host = reference_host or ReferenceHost()
         
         if not self.api_key:
             logger.warning("KIE_API_KEY not found - Veo video generation will fail")
 
-    def generate(self, image_path: str, prompt_video: str) -> str:
+    def generate(self, image_path: str, prompt_video: str, rehost: bool = False, model: str = None,
+                 max_wait_sec: float = None, last_image_path: str = None) -> str:
         """
         Generate video using Kie.ai Veo API with image-to-video.
         
         Args:
             image_path: Path to the image file on disk
             prompt_video: Text prompt for video generation
+            rehost: Publish the image under a fresh URL (Kie.ai could not fetch the previous one)
+            model: Model override (quality tier), defaults to KIE_VEO_MODEL
+            max_wait_sec: Stop waiting for the task after this long (raises VideoQueueTimeout)
+            last_image_path: Last keyframe (IMAGE_2F_VIDEO): the video goes from image_path to it
             
         Returns:
-            Data URI string with base64 encoded video
+            URL of the generated video on Kie.ai
         """
         if not self.api_key:
             raise VideoGenerationError("KIE_API_KEY is missing for Veo")
@@ -42,21 +51,19 @@ class KieVeoClient:
             raise VideoGenerationError("Image path is required for image-to-video generation")
 
         try:
-            # Step 1: Upload image and get URL (or use direct upload if supported)
-            # For now, we'll need to upload the image to a publicly accessible URL
-            # This is a limitation - Kie.ai requires image URLs, not base64
-            logger.warning("Kie.ai Veo requires image URLs. Using local path workaround...")
+            # Step 1: Kie.ai requires image URLs, not base64: host the image(s) ourselves
+            paths = [image_path, last_image_path] if last_image_path else [image_path]
+            if rehost:
+                image_urls = [self.reference_host.rehost(path) for path in paths]
+            else:
+                image_urls = [self.reference_host.url_for(path) for path in paths]
             
             # Step 2: Submit the generation job
-            task_id = self._submit_job(image_path, prompt_video)
+            task_id = self._submit_job(image_urls, prompt_video, model or self.model)
             
-            # Step 3: Poll until completion
-            video_url = self._poll_until_complete(task_id)
-            
-            # Step 4: Download the video
-            video_data = self._download_video(video_url)
-            
-            return video_data
+            # Step 3: Poll until completion. The video is downloaded straight to disk by
+            # FSAdapter.save_video, which keeps the URL to download it again if the copy is corrupt
+            return self._poll_until_complete(task_id, max_wait_sec)
 
         except VideoGenerationError:
             raise
@@ -64,8 +71,9 @@ class KieVeoClient:
             logger.error(f"Kie.ai Veo generation failed: {e}")
             raise VideoGenerationError(f"Video generation failed: {e}")
 
-    def _submit_job(self, image_path: str, prompt: str) -> str:
-        """Submit video generation job to Kie.ai Veo API."""
+    @retry(name="kie.veo.submit_job", idempotent=False)
+    def _submit_job(self, image_urls: list, prompt: str, model: str) -> str:
+        """Submit video generation job to Kie.ai Veo API (one image, or first and last frames)."""
         url = f"{self.base_url}/api/v1/veo/generate"
         
         headers = {
@@ -73,37 +81,31 @@ class KieVeoClient:
             "Authorization": f"Bearer {self.api_key}"
         }
         
-        # UPLOAD TO TMPFILES.ORG TO BYPASS FIREWALL ISSUES
-        try:
-            image_url = self._upload_to_tmpfiles(image_path)
-            logger.info(f"Uploaded temp image for Veo: {image_url}")
-        except Exception as e:
-            logger.error(f"Failed to upload to temp host, falling back to local public URL: {e}")
-            image_url = self._get_public_image_url(image_path)
-        
         payload = {
             "prompt": prompt,
-            "model": self.model,
+            "model": model,
             "aspectRatio": "16:9",
-            "imageUrls": [image_url]
+            "imageUrls": image_urls
         }
+        if len(image_urls) == 2:
+            payload["generationType"] = "FIRST_AND_LAST_FRAMES_2_VIDEO"
 
-        print(f" Estee es el modelooo {self.model}")
+        print(f" Estee es el modelooo {model}")
         
         logger.info(f"Submitting Kie.ai Veo job with prompt: {prompt[:50]}...")
-        logger.info(f"Image URL: {image_url}")
+        logger.info(f"Image URLs: {image_urls}")
         
         response = requests.post(url, headers=headers, json=payload, timeout=60)
         
         if response.status_code != 200:
             error_msg = response.text
             logger.error(f"Kie.ai Veo API error: {error_msg}")
-            raise VideoGenerationError(f"Kie.ai Veo API returned {response.status_code}: {error_msg}")
+            raise VideoGenerationError(f"Kie.ai Veo API returned {response.status_code}: {error_msg}", status_code=response.status_code)
         
         data = response.json()
         
         if data.get("code") != 200:
-            raise VideoGenerationError(f"Kie.ai Veo error: {data.get('msg')}")
+            raise VideoGenerationError(f"Kie.ai Veo error: {data.get('msg')}", status_code=data.get("code"))
         
         task_id = data.get("data", {}).get("taskId")
         
@@ -113,79 +115,39 @@ class KieVeoClient:
         logger.info(f"Kie.ai Veo task created: {task_id}")
         return task_id
 
-    def _upload_to_tmpfiles(self, image_path: str) -> str:
-        """Upload image to tmpfiles.org and return DIRECT download URL."""
-        upload_url = "https://tmpfiles.org/api/v1/upload"
-        
-        with open(image_path, 'rb') as f:
-            files = {'file': f}
-            response = requests.post(upload_url, files=files, timeout=60)
-            
-        if response.status_code != 200:
-            raise Exception(f"Tmpfiles upload failed: {response.text}")
-            
-        data = response.json()
-        if data.get("status") != "success":
-             raise Exception(f"Tmpfiles error: {data}")
-             
-        # URL returned is like: https://tmpfiles.org/12345/image.png
-        # We need direct link: https://tmpfiles.org/dl/12345/image.png
-        page_url = data.get("data", {}).get("url")
-        if not page_url:
-            raise Exception("No URL in tmpfiles response")
-            
-        # Convert to direct link
-        return page_url.replace("tmpfiles.org/", "tmpfiles.org/dl/")
-    
-    def _get_public_image_url(self, image_path: str) -> str:
-        """Convert local image path to public URL."""
-        from pathlib import Path
-        from infra.paths import ASSETS_DIR
-        
-        # Convert to Path object
-        img_path = Path(image_path)
-        assets_path = Path(ASSETS_DIR)
-        
-        # Get relative path from assets directory
-        try:
-            relative_path = img_path.relative_to(assets_path)
-        except ValueError:
-            raise VideoGenerationError(f"Image path {image_path} is not within assets directory")
-        
-        # Construct public URL
-        public_url = f"{Config.PUBLIC_BASE_URL}/assets/{relative_path.as_posix()}"
-        
-        return public_url
-
-    def _poll_until_complete(self, task_id: str) -> str:
-        """Poll the operation status until video is ready."""
+    def _poll_until_complete(self, task_id: str, max_wait_sec: float = None) -> str:
+        """Poll the operation status until video is ready (or `max_wait_sec` have passed)."""
         url = f"{self.base_url}/api/v1/veo/record-info"
         
         headers = {
             "Authorization": f"Bearer {self.api_key}"
         }
         
+        poll_errors = 0  # consecutive failed polls, reset on every good response
+        started = time.monotonic()
+        
         for attempt in range(self.max_polls):
+            if max_wait_sec is not None and time.monotonic() - started > max_wait_sec:
+                # Kie.ai does not report queue position: the whole wait counts against the limit
+                raise VideoQueueTimeout(f"Kie.ai Veo task {task_id} not ready after {max_wait_sec:.0f}s",
+                                        retryable=False)
+            
             logger.info(f"Polling Kie.ai Veo task (attempt {attempt + 1}/{self.max_polls})...")
             
             try:
                 response = requests.get(url, headers=headers, params={"taskId": task_id}, timeout=30)
-            except requests.RequestException as e:
-                logger.warning(f"Network error during poll: {e}. Retrying in {self.poll_interval}s...")
-                time.sleep(self.poll_interval)
+                if response.status_code != 200:
+                    raise VideoGenerationError(f"Poll returned {response.status_code}: {response.text}", status_code=response.status_code)
+                data = response.json()
+                if data.get("code") != 200:
+                    raise VideoGenerationError(f"Poll error: {data.get('msg')}", status_code=data.get("code"))
+            except (requests.RequestException, VideoGenerationError) as e:
+                # Transient errors back off (and consume retry budget), permanent ones raise
+                time.sleep(next_retry_delay(e, poll_errors, self.retry_policy, "kie.veo.poll"))
+                poll_errors += 1
                 continue
             
-            if response.status_code != 200:
-                logger.warning(f"Poll returned {response.status_code}: {response.text}")
-                time.sleep(self.poll_interval)
-                continue
-            
-            data = response.json()
-            
-            if data.get("code") != 200:
-                logger.warning(f"Poll error: {data.get('msg')}")
-                time.sleep(self.poll_interval)
-                continue
+            poll_errors = 0
             
             task_data = data.get("data", {})
             success_flag = task_data.get("successFlag")
@@ -215,8 +177,12 @@ class KieVeoClient:
                 raise VideoGenerationError(f"No resultUrls in response: {task_data}")
             
             elif success_flag in [2, 3]:
-                error_msg = task_data.get("msg", "Unknown error")
-                raise VideoGenerationError(f"Kie.ai Veo task failed: {error_msg}")
+                error_code = task_data.get("errorCode")
+                error_msg = task_data.get("errorMessage") or task_data.get("msg", "Unknown error")
+                failure = KieFailure(source="video", fail_code=str(error_code) if error_code is not None else None,
+                                     fail_msg=error_msg, category=classify_failure(error_code, error_msg))
+                raise VideoGenerationError(f"Kie.ai Veo task failed ({failure.category.value}): {error_msg}",
+                                           failure=failure)
             
             # Still generating (success_flag == 0)
             logger.info(f"Task generating (successFlag={success_flag})...")
@@ -224,23 +190,6 @@ class KieVeoClient:
         
         raise VideoGenerationError(f"Kie.ai Veo task timed out after {self.max_polls * self.poll_interval} seconds")
 
-    def _download_video(self, video_url: str) -> str:
-        """Download video from URL and return as data URI."""
-        logger.info(f"Downloading video from: {video_url[:50]}...")
-        
-        response = requests.get(video_url, timeout=300, allow_redirects=True)
-        
-        if response.status_code != 200:
-            raise VideoGenerationError(f"Failed to download video: {response.status_code}")
-        
-        # Return as data URI
-        video_bytes = response.content
-        video_b64 = base64.b64encode(video_bytes).decode("utf-8")
-        
-        logger.info(f"Video downloaded: {len(video_bytes)} bytes")
-        
-        return f"data:video/mp4;base64,{video_b64}"
-
 
 # Alias for backward compatibility
 VeoClient = KieVeoClient
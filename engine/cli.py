@@ -0,0 +1,157 @@
+"""
+Command line entry point for storyboard batches.
+
+    python cli.py process storyboard.json [--dry-run] [--force] [--tier DRAFT|FINAL]
+    python cli.py preflight storyboard.json
+    python cli.py assemble VIDEO_ID [--tier DRAFT|FINAL] [--transition fade] [--transition-sec 0.5]
+
+The storyboard file is a JSON list of shots, or an object with a "shots" list
+(the same body as POST /videos/{video_id}/process). The result is printed as JSON.
+`assemble` joins the shot videos already generated for a video (POST /videos/{video_id}/assemble).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+from adapters.asset_dependency_index import AssetDependencyIndex
+from adapters.assets_repository import AssetsRepository
+from adapters.frame_cache import LastFrameCache
+from adapters.fs_adapter import FSAdapter
+from adapters.gemini_client import GeminiImageClient
+from adapters.latency_store import LatencyStore
+from adapters.local_motion_renderer import LocalMotionRenderer
+from adapters.media_verifier import MediaVerifier
+from adapters.duration_conformer import DurationConformer
+from adapters.video_qc import VideoQC
+from adapters.logger import Logger
+from adapters.reference_host import ReferenceHost
+from adapters.variant_cache import VariantCache
+from adapters.veo_client import VeoClient
+from domain.entities import QualityTier, Shot
+from infra.config import Config
+from usecases.assemble_video import AssembleVideo
+from usecases.asset_matcher import AssetMatcher
+from usecases.fingerprint import ShotFingerprinter
+from usecases.image_candidates import ImageCandidates
+from usecases.plan_storyboard import PlanStoryboard
+from usecases.preflight import Preflight
+from usecases.process_shot import ProcessShot
+from usecases.process_storyboard import ProcessStoryboard
+from usecases.utils_prompt import PromptService
+
+
+def load_storyboard(path: str) -> List[Shot]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if isinstance(data, dict):
+        data = data.get("shots", [])
+    return [Shot.model_validate(item) for item in data]
+
+
+def build_process_shot(assets_repository, fs_adapter, prompt_service, variant_cache, fingerprinter,
+                       latency_store, image_candidates, media_verifier, logger) -> ProcessShot:
+    """Full pipeline (same wiring as main.py), only built for real runs."""
+    reference_host = ReferenceHost()
+    return ProcessShot(
+        fs_adapter,
+        prompt_service,
+        GeminiImageClient(),
+        VeoClient(reference_host),
+        logger,
+        assets_repository,
+        reference_host=reference_host,
+        asset_matcher=AssetMatcher(assets_repository),
+        variant_cache=variant_cache,
+        dependency_index=AssetDependencyIndex(),
+        fingerprinter=fingerprinter,
+        latency_store=latency_store,
+        motion_renderer=LocalMotionRenderer(),
+        image_candidates=image_candidates,
+        media_verifier=media_verifier,
+        video_qc=VideoQC() if Config.QC_ENABLED else None,
+        duration_conformer=DurationConformer() if Config.CONFORM_ENABLED else None,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Hintsly Video Factory storyboard batches")
+    sub = parser.add_subparsers(dest="command", required=True)
+    process = sub.add_parser("process", help="Process a storyboard (skips unchanged shots)")
+    process.add_argument("storyboard")
+    process.add_argument("--dry-run", action="store_true", help="Plan only: count calls and estimate wall time")
+    process.add_argument("--force", action="store_true", help="Reprocess unchanged shots too")
+    process.add_argument("--tier", choices=[t.value for t in QualityTier], help="Quality tier for every shot")
+    preflight = sub.add_parser("preflight", help="Validate a storyboard without generating anything")
+    preflight.add_argument("storyboard")
+    assemble = sub.add_parser("assemble", help="Join the generated shot videos of a video into one mp4")
+    assemble.add_argument("video_id")
+    assemble.add_argument("--tier", choices=[t.value for t in QualityTier], default=QualityTier.FINAL.value)
+    assemble.add_argument("--transition", help="none or an xfade transition at every cut (fade, dissolve...)")
+    assemble.add_argument("--transition-sec", type=float, help="Length of each transition")
+    args = parser.parse_args(argv)
+
+    if args.command == "assemble":
+        assembler = AssembleVideo(FSAdapter())
+        tier = QualityTier(args.tier)
+        shots, missing = assembler.load_shots(args.video_id, tier)
+        if not shots:
+            print(f"No completed shot videos for video {args.video_id}", file=sys.stderr)
+            return 2
+        result = assembler.execute(args.video_id, shots, missing, tier, args.transition, args.transition_sec)
+        print(result.model_dump_json(indent=2))
+        return 0
+
+    shots = load_storyboard(args.storyboard)
+    if not shots:
+        print("Storyboard has no shots", file=sys.stderr)
+        return 2
+    video_id = shots[0].video_id
+    if getattr(args, "tier", None):
+        shots = [shot.model_copy(update={"quality_tier": QualityTier(args.tier)}) for shot in shots]
+
+    logger = Logger()
+    prompt_service = PromptService()
+    fs_adapter = FSAdapter()
+    assets_repository = AssetsRepository(
+        Config.ASSETS_CATALOG_PATH,
+        Config.ASSETS_FILES_DIR,
+        index_path=Config.CATALOG_INDEX_PATH if Config.CATALOG_INDEX_ENABLED else None
+    )
+
+    if args.command == "preflight":
+        report = Preflight(assets_repository, prompt_service).execute(video_id, shots)
+        print(report.model_dump_json(indent=2))
+        return 0 if report.ok else 1
+
+    fingerprinter = ShotFingerprinter(assets_repository)
+    latency_store = LatencyStore()
+    variant_cache = VariantCache() if Config.VARIANT_CACHE_ENABLED else None
+    image_candidates = ImageCandidates()
+    media_verifier = MediaVerifier() if Config.MEDIA_VERIFY_ENABLED and not args.dry_run else None
+    process_shot = None
+    if not args.dry_run:
+        process_shot = build_process_shot(assets_repository, fs_adapter, prompt_service, variant_cache,
+                                          fingerprinter, latency_store, image_candidates, media_verifier, logger)
+    storyboard = ProcessStoryboard(process_shot, fs_adapter, fingerprinter, logger, frame_cache=LastFrameCache(),
+                                   media_verifier=media_verifier)
+
+    if args.dry_run:
+        plan = PlanStoryboard(storyboard, assets_repository, prompt_service, latency_store, variant_cache,
+                              image_candidates)
+        print(plan.execute(video_id, shots, force=args.force).model_dump_json(indent=2))
+        return 0
+
+    try:
+        result = storyboard.execute(video_id, shots, force=args.force)
+    finally:
+        if variant_cache is not None:
+            variant_cache.shutdown()
+        if media_verifier is not None:
+            media_verifier.shutdown()
+    print(result.model_dump_json(indent=2))
+    return 0 if result.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
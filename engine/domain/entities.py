@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from typing import Dict, List, Optional, Literal
 from enum import Enum
 
 class AssetMode(str, Enum):
@@ -8,6 +8,17 @@ class AssetMode(str, Enum):
     IMAGE_1F_VIDEO = "IMAGE_1F_VIDEO"
     IMAGE_2F_VIDEO = "IMAGE_2F_VIDEO"
 
+class QualityTier(str, Enum):
+    """Render quality: quick previews while iterating, final quality for approved shots"""
+    DRAFT = "DRAFT"
+    FINAL = "FINAL"
+
+class VideoEngine(str, Enum):
+    """Who renders the shot's video"""
+    VEO = "VEO"  # Kie.ai Veo task
+    LOCAL = "LOCAL"  # camera move over the still, rendered locally with ffmpeg (no API cost)
+    AUTO = "AUTO"  # Veo, falling back to LOCAL when the task takes longer than VEO_QUEUE_TIMEOUT_SEC
+
 class ShotEstado(str, Enum):
     """Shot processing state"""
     PENDIENTE = "PENDIENTE"
@@ -40,11 +51,21 @@ class Shot(BaseModel):
     mv_context: str
     asset_id: Optional[str] = None
     asset_mode: AssetMode = AssetMode.IMAGE_1F_VIDEO  # Default to standard video
+    quality_tier: QualityTier = QualityTier.FINAL  # DRAFT renders go to a separate draft/ subfolder
+    video_engine: VideoEngine = VideoEngine.VEO  # LOCAL also renders a clip for STILL_ONLY shots
+    continuity: bool = False  # start from the last frame of the previous shot in the block (no image task)
     
     # Asset Resolution Metadata (New)
     asset_resolved_file_name: Optional[str] = None
     asset_resolved_path: Optional[str] = None
     asset_mv_context_mismatch: bool = False
+    asset_content_hash: Optional[str] = None  # sha256 of the asset file used
+    asset_descripcion_hash: Optional[str] = None  # hash of its descripcion_visual at generation time
+    
+    # Automatic asset matching (when asset_id is missing)
+    asset_match_suggestion: Optional[str] = None
+    asset_match_score: Optional[float] = None
+    asset_auto_matched: bool = False
     
     # Camera & timing
     camera_move: Optional[str] = "Static"
@@ -58,10 +79,26 @@ class Shot(BaseModel):
     # Generated fields (populated by the pipeline)
     prompt_imagen: Optional[str] = None
     prompt_video: Optional[str] = None
+    prompt_imagen_last: Optional[str] = None  # IMAGE_2F_VIDEO: last keyframe
     image_path: Optional[str] = None
+    image_last_path: Optional[str] = None  # IMAGE_2F_VIDEO: last keyframe
+    continuity_from: Optional[str] = None  # shot_id whose last frame was used as the first keyframe
+    keyframe_from: Optional[str] = None  # shot_id whose keyframe this shot reuses (identical image inputs)
+    image_candidates: Optional[int] = None  # Nano Banana candidates generated for the keyframe (core shots)
+    image_score: Optional[float] = None  # quality score of the picked candidate
     video_path: Optional[str] = None
+    video_source_url: Optional[str] = None  # Kie.ai result URL the video was downloaded from
+    video_duration_sec: Optional[float] = None  # measured when the video was verified
+    video_conformed_path: Optional[str] = None  # video trimmed / looped to duracion_seg, next to video_path
+    video_conformed_sec: Optional[float] = None
+    media_warnings: Optional[List[str]] = None  # verification findings that did not fail the shot
+    qc_passed: Optional[bool] = None  # content QC of the Veo video (None: not checked)
+    qc_reasons: Optional[List[str]] = None  # why it failed (black frames, frozen motion, flicker)
+    qc_stats: Optional[Dict[str, float]] = None  # sampled-frame statistics behind the verdict
+    video_rendered_by: Optional[VideoEngine] = None  # VEO or LOCAL (AUTO resolves to one of them)
     
     # State management
     estado: ShotEstado = ShotEstado.PENDIENTE
     error_message: Optional[str] = None
+    input_fingerprint: Optional[str] = None  # hash of the inputs of the last run (usecases/fingerprint.py)
 
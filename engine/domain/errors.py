@@ -1,4 +1,25 @@
-class PromptError(Exception): pass
-class ImageGenerationError(Exception): pass
-class VideoGenerationError(Exception): pass
-class NetworkError(Exception): pass
+from typing import Optional
+
+
+class EngineError(Exception):
+    """
+    Base class for engine errors.
+    `status_code` and `retryable` feed the retry classifier (infra.retry).
+    `failure` carries the classified Kie.ai task failure (domain.failures.KieFailure), if any.
+    """
+    def __init__(self, message: str = "", status_code: Optional[int] = None, retryable: Optional[bool] = None,
+                 failure=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+        self.failure = failure
+
+class PromptError(EngineError): pass
+class ImageGenerationError(EngineError): pass
+class ImageGenerationCancelled(ImageGenerationError): pass  # caller no longer needs the image (speculative candidates)
+class VideoGenerationError(EngineError): pass
+class VideoQueueTimeout(VideoGenerationError): pass  # Veo task not finished within the caller's max wait
+class MediaProcessingError(EngineError): pass  # local ffmpeg / image processing failures
+class MediaVerificationError(MediaProcessingError): pass  # downloaded/rendered media still invalid after re-downloads
+class NetworkError(EngineError): pass
+class RetryBudgetExceeded(EngineError): pass
@@ -0,0 +1,80 @@
+from enum import Enum
+from typing import Dict, Optional
+from pydantic import BaseModel
+
+
+class FailureCategory(str, Enum):
+    """Category of a failed Kie.ai task (Nano Banana `failCode` / Veo `successFlag` 2-3)"""
+    CONTENT_POLICY = "CONTENT_POLICY"
+    BAD_REFERENCE = "BAD_REFERENCE"
+    CAPACITY = "CAPACITY"
+    INTERNAL = "INTERNAL"
+    UNKNOWN = "UNKNOWN"
+
+
+class RemediationAction(str, Enum):
+    """Automatic action taken for a failure category"""
+    SANITIZE_PROMPT = "SANITIZE_PROMPT"
+    REHOST_REFERENCE = "REHOST_REFERENCE"
+    BACKOFF = "BACKOFF"
+    GIVE_UP = "GIVE_UP"
+
+
+REMEDIATIONS: Dict[FailureCategory, RemediationAction] = {
+    FailureCategory.CONTENT_POLICY: RemediationAction.SANITIZE_PROMPT,
+    FailureCategory.BAD_REFERENCE: RemediationAction.REHOST_REFERENCE,
+    FailureCategory.CAPACITY: RemediationAction.BACKOFF,
+    FailureCategory.INTERNAL: RemediationAction.GIVE_UP,
+    FailureCategory.UNKNOWN: RemediationAction.GIVE_UP,
+}
+
+
+class KieFailure(BaseModel):
+    """A classified Kie.ai task failure"""
+    source: str  # "image" | "video"
+    fail_code: Optional[str] = None
+    fail_msg: str = ""
+    category: FailureCategory = FailureCategory.UNKNOWN
+
+    @property
+    def action(self) -> RemediationAction:
+        return REMEDIATIONS[self.category]
+
+
+# failCode values seen in Kie.ai responses (see docs/kie_nano_banana_pro_guia.md)
+_CODE_CATEGORIES = {
+    "422": FailureCategory.BAD_REFERENCE,  # "Your media file is unavailable, please replace it."
+    "429": FailureCategory.CAPACITY,
+    "503": FailureCategory.CAPACITY,
+    "500": FailureCategory.INTERNAL,
+    "501": FailureCategory.INTERNAL,
+    "502": FailureCategory.INTERNAL,
+}
+
+# Message keywords, checked when the code is missing or unknown
+_MESSAGE_KEYWORDS = [
+    (FailureCategory.CONTENT_POLICY, ("policy", "sensitive", "safety", "nsfw", "prohibited", "flagged", "inappropriate", "violat")),
+    (FailureCategory.BAD_REFERENCE, ("media file", "unavailable", "image url", "download", "fetch", "replace it")),
+    (FailureCategory.CAPACITY, ("busy", "capacity", "overload", "rate limit", "too many", "try again later")),
+    (FailureCategory.INTERNAL, ("internal", "server error")),
+]
+
+
+def classify_failure(fail_code: Optional[str], fail_msg: Optional[str]) -> FailureCategory:
+    """Maps a Kie.ai failCode / failMsg pair to a FailureCategory."""
+    code = str(fail_code).strip() if fail_code not in (None, "") else ""
+    msg = (fail_msg or "").lower()
+
+    # Content policy messages sometimes come with generic codes (400/500), so check them first
+    for keyword in _MESSAGE_KEYWORDS[0][1]:
+        if keyword in msg:
+            return FailureCategory.CONTENT_POLICY
+
+    if code in _CODE_CATEGORIES:
+        return _CODE_CATEGORIES[code]
+
+    for category, keywords in _MESSAGE_KEYWORDS[1:]:
+        if any(keyword in msg for keyword in keywords):
+            return category
+
+    return FailureCategory.UNKNOWN
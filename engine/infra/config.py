@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from infra.paths import ASSETS_DIR
 
 # Load environment variables from .env file
 load_dotenv()
@@ -10,6 +11,13 @@ class Config:
     KIE_API_BASE = os.getenv("KIE_API_BASE", "https://api.kie.ai")
     KIE_NANO_BANANA_MODEL = os.getenv("KIE_NANO_BANANA_MODEL", "nano-banana-pro")
     KIE_VEO_MODEL = os.getenv("KIE_VEO_MODEL", "veo3_fast")  # Correct model name: veo3_fast
+    KIE_IMAGE_RESOLUTION = os.getenv("KIE_IMAGE_RESOLUTION", "1K")  # Nano Banana output: 1K | 2K | 4K
+    KIE_IMAGE_ASPECT_RATIO = os.getenv("KIE_IMAGE_ASPECT_RATIO", "16:9")
+    
+    # DRAFT quality tier: fastest models/settings for previews (usecases/quality_tiers.py)
+    KIE_DRAFT_NANO_BANANA_MODEL = os.getenv("KIE_DRAFT_NANO_BANANA_MODEL", "google/nano-banana")
+    KIE_DRAFT_IMAGE_RESOLUTION = os.getenv("KIE_DRAFT_IMAGE_RESOLUTION", "1K")
+    KIE_DRAFT_VEO_MODEL = os.getenv("KIE_DRAFT_VEO_MODEL", "veo3_fast")
     
     # Public URL configuration (for serving assets)
     PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "https://engine.srv954959.hstgr.cloud")
@@ -18,6 +26,119 @@ class Config:
     # Default to the known location in context folder for catalog, and assets/catalog_files for images
     ASSETS_CATALOG_PATH = os.getenv("ASSETS_CATALOG_PATH", "/home/roiky/Espacio/hintsly-video-factory/assets/catalog_files/assets.json")
     ASSETS_FILES_DIR = os.getenv("ASSETS_FILES_DIR", "/home/roiky/Espacio/hintsly-video-factory/assets/catalog_files")
+    ASSET_AUTO_MATCH = os.getenv("ASSET_AUTO_MATCH", "suggest").lower()  # off | suggest | assign
+    ASSET_MATCH_THRESHOLD = float(os.getenv("ASSET_MATCH_THRESHOLD", "0.35"))  # min cosine score to auto-assign
+    ASSET_MATCH_MAX_FEATURES = int(os.getenv("ASSET_MATCH_MAX_FEATURES", "4096"))
+    ASSETS_CATALOG_CHECK_SEC = float(os.getenv("ASSETS_CATALOG_CHECK_SEC", "5"))  # assets.json change detection
+    ASSETS_INDEX_CHECK_SEC = float(os.getenv("ASSETS_INDEX_CHECK_SEC", "5"))  # dir mtime check interval
+    ASSETS_INDEX_RESCAN_SEC = float(os.getenv("ASSETS_INDEX_RESCAN_SEC", "300"))  # full rescan (in-place overwrites)
+    
+    # Storyboard batches (usecases/process_storyboard.py)
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))  # shots processed in parallel
+    # Shots with identical image inputs (only camera_move/duration differ) reuse one keyframe
+    SHARED_KEYFRAMES_ENABLED = os.getenv("SHARED_KEYFRAMES_ENABLED", "true").lower() == "true"
+    PREFLIGHT_URL_TIMEOUT_SEC = float(os.getenv("PREFLIGHT_URL_TIMEOUT_SEC", "2"))
+    PREFLIGHT_URL_CHECK_TTL_SEC = float(os.getenv("PREFLIGHT_URL_CHECK_TTL_SEC", "60"))  # reuse reachability result
+    
+    # Retry policy (infra/retry.py)
+    RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "4"))
+    RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "2"))  # seconds
+    RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "60"))  # seconds
+    RETRY_SHOT_BUDGET = int(os.getenv("RETRY_SHOT_BUDGET", "10"))  # retries per shot
+    RETRY_GLOBAL_BUDGET = int(os.getenv("RETRY_GLOBAL_BUDGET", "60"))  # retries per window, all shots
+    RETRY_GLOBAL_WINDOW_SEC = float(os.getenv("RETRY_GLOBAL_WINDOW_SEC", "60"))
+    
+    # Automatic remediation of failed Kie.ai tasks (usecases/remediation.py)
+    KIE_MAX_REMEDIATIONS = int(os.getenv("KIE_MAX_REMEDIATIONS", "2"))  # resubmissions per stage
+    REMEDIATION_BACKOFF_SEC = float(os.getenv("REMEDIATION_BACKOFF_SEC", "20"))  # base delay for CAPACITY failures
+    
+    # Local caches (hosted references, signing key, derived files, indexes). Must persist across restarts:
+    # defaults under the ASSETS_DIR volume, as a dot-directory that /assets never serves (infra/static_files.py)
+    CACHE_DIR = os.getenv("CACHE_DIR", str(ASSETS_DIR / ".cache"))
+    
+    # Binary catalog index memory-mapped by all workers (adapters/catalog_index.py)
+    CATALOG_INDEX_ENABLED = os.getenv("CATALOG_INDEX_ENABLED", "true").lower() == "true"
+    CATALOG_INDEX_PATH = os.getenv("CATALOG_INDEX_PATH", os.path.join(CACHE_DIR, "catalog.idx"))
+    
+    # Reverse index asset -> shots that used it (adapters/asset_dependency_index.py)
+    ASSET_DEPENDENCY_INDEX_PATH = os.getenv("ASSET_DEPENDENCY_INDEX_PATH", os.path.join(CACHE_DIR, "asset_dependencies.json"))
+    
+    # Recorded stage latencies for dry-run estimates (adapters/latency_store.py)
+    LATENCY_STORE_PATH = os.getenv("LATENCY_STORE_PATH", os.path.join(CACHE_DIR, "latency.json"))  # per-stage timings
+    LATENCY_MAX_SAMPLES = int(os.getenv("LATENCY_MAX_SAMPLES", "500"))  # kept per stage
+    # Assumed stage latencies (seconds) until real ones are recorded
+    LATENCY_PRIOR_IMAGE_SEC = float(os.getenv("LATENCY_PRIOR_IMAGE_SEC", "60"))
+    LATENCY_PRIOR_VIDEO_SEC = float(os.getenv("LATENCY_PRIOR_VIDEO_SEC", "180"))
+    LATENCY_PRIOR_VIDEO_LOCAL_SEC = float(os.getenv("LATENCY_PRIOR_VIDEO_LOCAL_SEC", "15"))
+    
+    # Reference assets downscaled to the output resolution (adapters/variant_cache.py)
+    VARIANT_CACHE_ENABLED = os.getenv("VARIANT_CACHE_ENABLED", "true").lower() == "true"
+    VARIANT_CACHE_DIR = os.getenv("VARIANT_CACHE_DIR", os.path.join(CACHE_DIR, "variants"))
+    VARIANT_WORKERS = int(os.getenv("VARIANT_WORKERS", "2"))  # processes
+    VARIANT_JPEG_QUALITY = int(os.getenv("VARIANT_JPEG_QUALITY", "88"))
+    
+    # Local media processing (ffmpeg must be on PATH or configured here)
+    FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+    FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+    
+    # Verification of downloaded / rendered media (adapters/media_verifier.py)
+    MEDIA_VERIFY_ENABLED = os.getenv("MEDIA_VERIFY_ENABLED", "true").lower() == "true"
+    MEDIA_VERIFY_WORKERS = int(os.getenv("MEDIA_VERIFY_WORKERS", "4"))  # checks (ffprobe processes) at once
+    MEDIA_VIDEO_CODECS = os.getenv("MEDIA_VIDEO_CODECS", "h264,hevc")  # accepted codecs (empty = any)
+    MEDIA_MIN_VIDEO_SIDE = int(os.getenv("MEDIA_MIN_VIDEO_SIDE", "360"))  # px, shortest side
+    MEDIA_MIN_IMAGE_SIDE = int(os.getenv("MEDIA_MIN_IMAGE_SIDE", "256"))  # px, shortest side
+    MEDIA_DURATION_TOLERANCE_SEC = float(os.getenv("MEDIA_DURATION_TOLERANCE_SEC", "0.5"))  # vs duracion_seg
+    MEDIA_REDOWNLOAD_ATTEMPTS = int(os.getenv("MEDIA_REDOWNLOAD_ATTEMPTS", "2"))  # before failing the shot
+    
+    # Content QC of Veo videos on sampled frames (adapters/video_qc.py)
+    QC_ENABLED = os.getenv("QC_ENABLED", "true").lower() == "true"
+    QC_ACTION = os.getenv("QC_ACTION", "flag")  # flag (record the reasons) | requeue (generate the video again)
+    QC_MAX_REQUEUES = int(os.getenv("QC_MAX_REQUEUES", "1"))  # new Veo tasks per shot with QC_ACTION=requeue
+    QC_SAMPLE_FPS = float(os.getenv("QC_SAMPLE_FPS", "4"))  # frames decoded per second of video
+    QC_BLACK_LUMA = float(os.getenv("QC_BLACK_LUMA", "16"))  # frame mean (0-255) below which a frame is black
+    QC_MAX_BLACK_FRACTION = float(os.getenv("QC_MAX_BLACK_FRACTION", "0.25"))
+    QC_MIN_MOTION = float(os.getenv("QC_MIN_MOTION", "0.3"))  # median frame difference (0-255) below = frozen
+    QC_MAX_FLICKER = float(os.getenv("QC_MAX_FLICKER", "8"))  # mean brightness second difference (0-255)
+    
+    # Shot videos trimmed / looped to duracion_seg by stream copy (adapters/duration_conformer.py)
+    CONFORM_ENABLED = os.getenv("CONFORM_ENABLED", "true").lower() == "true"
+    CONFORM_TOLERANCE_SEC = float(os.getenv("CONFORM_TOLERANCE_SEC", "0.1"))  # closer than this: used as is
+    
+    # Final assembly of a video from its shot videos (usecases/assemble_video.py)
+    ASSEMBLY_WORKERS = int(os.getenv("ASSEMBLY_WORKERS", "4"))  # clips normalized at once (ffmpeg processes)
+    ASSEMBLY_CRF = int(os.getenv("ASSEMBLY_CRF", "18"))  # for the clips that have to be re-encoded
+    ASSEMBLY_PRESET = os.getenv("ASSEMBLY_PRESET", "veryfast")
+    ASSEMBLY_AUDIO_BITRATE = os.getenv("ASSEMBLY_AUDIO_BITRATE", "192k")
+    ASSEMBLY_TRANSITION = os.getenv("ASSEMBLY_TRANSITION", "none")  # none | xfade name (fade, dissolve, wipeleft...)
+    ASSEMBLY_TRANSITION_SEC = float(os.getenv("ASSEMBLY_TRANSITION_SEC", "0.5"))  # crossfade length at each cut
+    
+    # Local camera-move renderer used instead of Veo (adapters/local_motion_renderer.py)
+    LOCAL_MOTION_WIDTH = int(os.getenv("LOCAL_MOTION_WIDTH", "1280"))
+    LOCAL_MOTION_HEIGHT = int(os.getenv("LOCAL_MOTION_HEIGHT", "720"))
+    LOCAL_MOTION_FPS = int(os.getenv("LOCAL_MOTION_FPS", "24"))
+    LOCAL_MOTION_CRF = int(os.getenv("LOCAL_MOTION_CRF", "20"))  # libx264 quality (lower = better)
+    LOCAL_MOTION_PRESET = os.getenv("LOCAL_MOTION_PRESET", "veryfast")
+    # video_engine=AUTO: give up waiting for Veo after this long and render the move locally
+    VEO_QUEUE_TIMEOUT_SEC = float(os.getenv("VEO_QUEUE_TIMEOUT_SEC", "240"))
+    
+    # Last frames of shot videos, reused as the next shot's keyframe (adapters/frame_cache.py)
+    LAST_FRAME_CACHE_DIR = os.getenv("LAST_FRAME_CACHE_DIR", os.path.join(CACHE_DIR, "frames"))
+    
+    # Speculative keyframes for core_flag shots (usecases/image_candidates.py, adapters/image_scorer.py)
+    IMAGE_CANDIDATES = int(os.getenv("IMAGE_CANDIDATES", "1"))  # Nano Banana tasks per core shot (1 = off)
+    IMAGE_CANDIDATES_QUORUM = int(os.getenv("IMAGE_CANDIDATES_QUORUM", "1"))  # good candidates to wait for
+    IMAGE_MIN_SHARPNESS = float(os.getenv("IMAGE_MIN_SHARPNESS", "20"))  # Laplacian variance at 512 px
+    IMAGE_MAX_CLIPPED = float(os.getenv("IMAGE_MAX_CLIPPED", "0.2"))  # fraction of pure black/white pixels
+    IMAGE_MAX_REFERENCE_SIMILARITY = float(os.getenv("IMAGE_MAX_REFERENCE_SIMILARITY", "0.98"))  # reference echoed back
+    
+    # Reference hosting for Kie.ai (adapters/reference_host.py), served under /refs
+    REFERENCE_HOST_DIR = os.getenv("REFERENCE_HOST_DIR", os.path.join(CACHE_DIR, "refs"))
+    # HMAC key of the signed URLs; when unset, a random one is generated once and kept in REFERENCE_SIGNING_KEY_PATH
+    REFERENCE_SIGNING_KEY = os.getenv("REFERENCE_SIGNING_KEY")
+    REFERENCE_SIGNING_KEY_PATH = os.getenv("REFERENCE_SIGNING_KEY_PATH", os.path.join(CACHE_DIR, "reference_signing.key"))
+    REFERENCE_URL_TTL_SEC = int(os.getenv("REFERENCE_URL_TTL_SEC", "86400"))
+    REFERENCE_URL_MIN_REMAINING_SEC = int(os.getenv("REFERENCE_URL_MIN_REMAINING_SEC", "3600"))  # Veo may queue for a while
+    REFERENCE_VERIFY_REACHABLE = os.getenv("REFERENCE_VERIFY_REACHABLE", "false").lower() == "true"  # HEAD before reuse
     
     # Google API settings (legacy/fallback)
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -0,0 +1,69 @@
+import threading
+from typing import Dict, List
+
+
+def _key(name: str, labels: Dict[str, str]) -> str:
+    """Build a flat metric key like `retry.attempts{kind=transient,op=veo}`."""
+    if not labels:
+        return name
+    parts = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{parts}}}"
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry (counters + bounded histograms).
+    Thread-safe; exposed as JSON through the /metrics endpoint.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._histograms: Dict[str, List[float]] = {}
+        self.max_samples = max_samples
+
+    def incr(self, name: str, value: float = 1, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            samples = self._histograms.setdefault(key, [])
+            samples.append(value)
+            # Keep the most recent samples only
+            if len(samples) > self.max_samples:
+                del samples[: len(samples) - self.max_samples]
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def snapshot(self) -> dict:
+        """Returns counters and histogram summaries (count, mean, p50, p90, max)."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: list(v) for k, v in self._histograms.items()}
+
+        summaries = {}
+        for key, samples in histograms.items():
+            ordered = sorted(samples)
+            n = len(ordered)
+            summaries[key] = {
+                "count": n,
+                "mean": sum(ordered) / n if n else 0.0,
+                "p50": ordered[int(0.5 * (n - 1))] if n else 0.0,
+                "p90": ordered[int(0.9 * (n - 1))] if n else 0.0,
+                "max": ordered[-1] if n else 0.0,
+            }
+        return {"counters": counters, "histograms": summaries}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Process-wide registry
+metrics = Metrics()
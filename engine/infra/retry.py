@@ -1,21 +1,203 @@
+import asyncio
+import random
+import threading
 import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
 from functools import wraps
+from typing import Dict, Optional
 import logging
 
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from domain.errors import NetworkError, RetryBudgetExceeded
+from infra.config import Config
+from infra.metrics import metrics
+
 logger = logging.getLogger("hintsly")
 
-def retry(attempts=3, delay=2):
+
+class ErrorKind(str, Enum):
+    """Retry classification of an exception"""
+    TRANSIENT = "transient"
+    PERMANENT = "permanent"
+
+
+def request_not_sent(exc: BaseException) -> bool:
+    """True if the request never reached the server (connect timeout, connection refused, DNS failure)."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.ConnectionError) and not isinstance(exc, requests.Timeout):
+        reason = getattr(exc.args[0], "reason", None) if exc.args else None
+        return isinstance(reason, NewConnectionError)
+    return isinstance(exc, ConnectionRefusedError)
+
+
+def classify_error(exc: BaseException, idempotent: bool = True) -> ErrorKind:
+    """
+    Sorts an exception into transient (worth retrying) or permanent.
+    - An explicit `retryable` attribute (see domain.errors.EngineError) wins.
+    - Timeouts / connection errors are transient. For non-idempotent calls (task submissions)
+      only those raised before the request was sent are: after a read timeout the server may
+      have created the task, and sending it again would pay for a second one.
+    - HTTP 429 and 5xx are transient, any other HTTP status (4xx) is permanent.
+    - Everything else (Kie `fail` states, validation, programming errors) is permanent.
+    """
+    retryable = getattr(exc, "retryable", None)
+    if retryable is not None:
+        return ErrorKind.TRANSIENT if retryable else ErrorKind.PERMANENT
+
+    if isinstance(exc, (requests.Timeout, requests.ConnectionError, NetworkError, TimeoutError, ConnectionError)):
+        return ErrorKind.TRANSIENT if idempotent or request_not_sent(exc) else ErrorKind.PERMANENT
+
+    status = getattr(exc, "status_code", None)
+    if status is None and isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+    if status is not None:
+        return ErrorKind.TRANSIENT if status == 429 or status >= 500 else ErrorKind.PERMANENT
+
+    return ErrorKind.PERMANENT
+
+
+class RetryPolicy:
+    """Capped exponential backoff with (equal) jitter."""
+
+    def __init__(self, attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, jitter: bool = True):
+        self.attempts = attempts if attempts is not None else Config.RETRY_MAX_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else Config.RETRY_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else Config.RETRY_MAX_DELAY
+        self.jitter = jitter
+
+    def compute_delay(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (0-based)."""
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        if not self.jitter:
+            return cap
+        return cap / 2 + random.uniform(0, cap / 2)
+
+
+class RetryBudget:
+    """
+    Limits retries globally (sliding window) and per scope (usually a shot),
+    so a failing upstream cannot trigger a retry storm.
+    """
+
+    def __init__(self, global_limit: Optional[int] = None, window_sec: Optional[float] = None,
+                 scope_limit: Optional[int] = None):
+        self.global_limit = global_limit if global_limit is not None else Config.RETRY_GLOBAL_BUDGET
+        self.window_sec = window_sec if window_sec is not None else Config.RETRY_GLOBAL_WINDOW_SEC
+        self.scope_limit = scope_limit if scope_limit is not None else Config.RETRY_SHOT_BUDGET
+        self._lock = threading.Lock()
+        self._events = deque()
+        self._scopes: Dict[str, int] = {}
+
+    def try_acquire(self, scope: Optional[str] = None) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._events and now - self._events[0] > self.window_sec:
+                self._events.popleft()
+            if len(self._events) >= self.global_limit:
+                metrics.incr("retry.budget_exhausted", budget="global")
+                return False
+            if scope is not None and self._scopes.get(scope, 0) >= self.scope_limit:
+                metrics.incr("retry.budget_exhausted", budget="shot")
+                return False
+            self._events.append(now)
+            if scope is not None:
+                self._scopes[scope] = self._scopes.get(scope, 0) + 1
+            return True
+
+    def release_scope(self, scope: str) -> None:
+        with self._lock:
+            self._scopes.pop(scope, None)
+
+
+# Process-wide budget shared by every retrying call
+retry_budget = RetryBudget()
+
+_current_scope: ContextVar[Optional[str]] = ContextVar("retry_scope", default=None)
+
+
+@contextmanager
+def retry_scope(key: str):
+    """Charges retries made inside the block to `key` (e.g. a shot id)."""
+    token = _current_scope.set(key)
+    try:
+        yield
+    finally:
+        _current_scope.reset(token)
+        retry_budget.release_scope(key)
+
+
+def charge_retry_budget() -> bool:
+    """Charges one retry to the current scope / global budget. False when exhausted."""
+    return retry_budget.try_acquire(_current_scope.get())
+
+
+def next_retry_delay(exc: BaseException, attempt: int, policy: RetryPolicy, op: str,
+                     idempotent: bool = True) -> float:
+    """
+    Decides whether `exc` may be retried (attempt is the 0-based count of retries so far).
+    Returns the delay to wait, or raises the original error / RetryBudgetExceeded.
+    """
+    kind = classify_error(exc, idempotent)
+    if kind == ErrorKind.PERMANENT:
+        metrics.incr("retry.giveup", op=op, reason="permanent")
+        raise exc
+
+    if attempt + 1 >= policy.attempts:
+        metrics.incr("retry.giveup", op=op, reason="exhausted")
+        logger.error(f"{op} failed after {policy.attempts} attempts: {exc}")
+        raise exc
+
+    if not charge_retry_budget():
+        metrics.incr("retry.giveup", op=op, reason="budget")
+        raise RetryBudgetExceeded(f"Retry budget exhausted for {op}: {exc}", retryable=False) from exc
+
+    delay = policy.compute_delay(attempt)
+    metrics.incr("retry.attempts", op=op, kind=kind.value)
+    logger.warning(f"{op} attempt {attempt + 1} failed ({kind.value}): {exc}. Retrying in {delay:.1f}s...")
+    return delay
+
+
+def retry(attempts: Optional[int] = None, delay: Optional[float] = None, max_delay: Optional[float] = None,
+          name: Optional[str] = None, policy: Optional[RetryPolicy] = None, idempotent: bool = True):
+    """
+    Retry decorator for sync and async callables.
+    Only transient errors are retried, with capped exponential backoff + jitter,
+    and every retry is charged to the retry budget. Calls that create something remotely
+    (idempotent=False) are not retried once the request may have reached the server.
+    """
     def decorator(func):
+        op = name or func.__qualname__
+        pol = policy or RetryPolicy(attempts=attempts, base_delay=delay, max_delay=max_delay)
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                attempt = 0
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        wait = next_retry_delay(e, attempt, pol, op, idempotent)
+                    attempt += 1
+                    await asyncio.sleep(wait)
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            for i in range(attempts):
+            attempt = 0
+            while True:
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
-                    if i == attempts - 1:
-                        logger.error(f"Failed after {attempts} attempts: {e}")
-                        raise e
-                    logger.warning(f"Attempt {i+1} failed: {e}. Retrying in {delay}s...")
-                    time.sleep(delay)
+                    wait = next_retry_delay(e, attempt, pol, op, idempotent)
+                attempt += 1
+                time.sleep(wait)
         return wrapper
     return decorator
@@ -0,0 +1,18 @@
+from pathlib import PurePosixPath
+
+from fastapi import HTTPException
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import Response
+from starlette.types import Scope
+
+
+class PublicStaticFiles(StaticFiles):
+    """
+    StaticFiles that never serves hidden paths (any segment starting with "."): caches, indexes and
+    signed references kept under a dot-directory must not be fetchable without their own checks.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if any(part.startswith(".") for part in PurePosixPath(path.replace("\\", "/")).parts):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
@@ -0,0 +1,22 @@
+import re
+import unicodedata
+from typing import List, Optional
+
+# Small ES/EN stopword list; catalog descriptions are Spanish, storyboards mostly English
+STOPWORDS = {
+    "a", "al", "con", "de", "del", "el", "en", "es", "la", "las", "lo", "los", "o", "para", "por", "que",
+    "se", "sin", "su", "sus", "un", "una", "uno", "y",
+    "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it", "its", "of",
+    "on", "or", "the", "this", "to", "with",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase, accent-free alphanumeric tokens without stopwords."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [t for t in _TOKEN_RE.findall(text) if len(t) > 1 and t not in STOPWORDS]
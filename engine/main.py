@@ -1,22 +1,42 @@
-from fastapi import FastAPI, HTTPException, status
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Header, Query, Response, status
+from fastapi.responses import JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, ValidationError
-from typing import Optional
+from typing import List, Optional, Union
 import traceback
 
-from domain.entities import Shot, ShotEstado
+from domain.entities import Asset, QualityTier, Shot, ShotEstado
 from usecases.process_shot import ProcessShot
 from usecases.regenerate_shot import RegenerateShot
 from usecases.utils_prompt import PromptService
+from usecases.asset_matcher import AssetMatcher
+from usecases.fingerprint import ShotFingerprinter
+from usecases.process_storyboard import ProcessStoryboard, StoryboardResult
+from usecases.preflight import Preflight, PreflightReport
+from usecases.plan_storyboard import PlanStoryboard, StoryboardPlan
+from usecases.promote_shots import PromoteShots, ShotRef
+from usecases.image_candidates import ImageCandidates
+from usecases.assemble_video import AssembleVideo, AssemblyResult
 from adapters.fs_adapter import FSAdapter
 from adapters.gemini_client import GeminiImageClient
 from adapters.veo_client import VeoClient
 from adapters.logger import Logger
 from infra.paths import ASSETS_DIR
 from adapters.assets_repository import AssetsRepository
+from adapters.reference_host import ReferenceHost
+from adapters.asset_dependency_index import AssetDependencyIndex, AssetUsage
+from adapters.latency_store import LatencyStore
+from adapters.local_motion_renderer import LocalMotionRenderer
+from adapters.media_verifier import MediaVerifier
+from adapters.duration_conformer import DurationConformer
+from adapters.video_qc import VideoQC
+from adapters.frame_cache import LastFrameCache
+from adapters.variant_cache import VariantCache
 from infra.config import Config
+from infra.static_files import PublicStaticFiles
+from domain.errors import MediaProcessingError
+from infra.metrics import metrics
+from usecases.remediation import failure_stats
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -34,28 +54,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files to serve images publicly
-# This allows Kie.ai Veo to access images via URL
-app.mount("/assets", StaticFiles(directory=str(ASSETS_DIR)), name="assets")
-
 # Instantiate adapters
 fs_adapter = FSAdapter()
 prompt_service = PromptService()
+reference_host = ReferenceHost()
 gemini_client = GeminiImageClient()
-veo_client = VeoClient()
+veo_client = VeoClient(reference_host)
 logger = Logger()
-assets_repository = AssetsRepository(Config.ASSETS_CATALOG_PATH, Config.ASSETS_FILES_DIR)
+assets_repository = AssetsRepository(
+    Config.ASSETS_CATALOG_PATH,
+    Config.ASSETS_FILES_DIR,
+    index_path=Config.CATALOG_INDEX_PATH if Config.CATALOG_INDEX_ENABLED else None
+)
+asset_matcher = AssetMatcher(assets_repository)
+variant_cache = VariantCache() if Config.VARIANT_CACHE_ENABLED else None
+latency_store = LatencyStore()
+motion_renderer = LocalMotionRenderer()
+image_candidates = ImageCandidates()
+media_verifier = MediaVerifier() if Config.MEDIA_VERIFY_ENABLED else None
+video_qc = VideoQC() if Config.QC_ENABLED else None
+duration_conformer = DurationConformer() if Config.CONFORM_ENABLED else None
+dependency_index = AssetDependencyIndex()
+if not dependency_index.path.exists():
+    # First start with the index: link the shots already on disk
+    dependency_index.rebuild(ASSETS_DIR / "videos")
 
 # Instantiate use cases
+shot_fingerprinter = ShotFingerprinter(assets_repository)
 process_shot_usecase = ProcessShot(
     fs_adapter, 
     prompt_service, 
     gemini_client, 
     veo_client, 
     logger,
-    assets_repository
+    assets_repository,
+    reference_host=reference_host,
+    asset_matcher=asset_matcher,
+    variant_cache=variant_cache,
+    dependency_index=dependency_index,
+    fingerprinter=shot_fingerprinter,
+    latency_store=latency_store,
+    motion_renderer=motion_renderer,
+    image_candidates=image_candidates,
+    media_verifier=media_verifier,
+    video_qc=video_qc,
+    duration_conformer=duration_conformer
 )
 regenerate_shot_usecase = RegenerateShot(process_shot_usecase)
+process_storyboard_usecase = ProcessStoryboard(process_shot_usecase, fs_adapter, shot_fingerprinter, logger,
+                                               frame_cache=LastFrameCache(), media_verifier=media_verifier)
+preflight_usecase = Preflight(assets_repository, prompt_service)
+promote_shots_usecase = PromoteShots(process_storyboard_usecase, fs_adapter)
+plan_storyboard_usecase = PlanStoryboard(process_storyboard_usecase, assets_repository, prompt_service,
+                                         latency_store, variant_cache, image_candidates)
+assemble_video_usecase = AssembleVideo(fs_adapter)
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    """Stops the variant rendering processes and the media verification workers"""
+    if variant_cache is not None:
+        variant_cache.shutdown()
+    if media_verifier is not None:
+        media_verifier.shutdown()
 
 
 # Response Models
@@ -65,6 +126,39 @@ class ShotProcessResponse(BaseModel):
     shot: Shot
     message: str
     
+class CatalogAssetsResponse(BaseModel):
+    """Page of catalog assets"""
+    items: List[Asset]
+    total: int
+    next_cursor: Optional[str] = None
+
+
+class StoryboardRequest(BaseModel):
+    """Shots of a storyboard to process"""
+    shots: List[Shot]
+    force: bool = False  # reprocess every shot, even unchanged ones
+    quality_tier: Optional[QualityTier] = None  # overrides every shot's quality_tier (e.g. DRAFT while iterating)
+
+
+class PromoteRequest(BaseModel):
+    """Approved draft shots to render at final quality"""
+    shots: List[ShotRef]
+
+
+class AssetShotsResponse(BaseModel):
+    """Shots generated from a catalog asset"""
+    asset_id: str
+    content_hash: Optional[str] = None
+    shots: List[AssetUsage]
+
+
+class AssetRegenerationResponse(BaseModel):
+    """Shots queued for regeneration after an asset change"""
+    asset_id: str
+    queued: List[AssetUsage]
+    missing: List[AssetUsage]
+
+
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str
@@ -86,6 +180,122 @@ def health_check():
     )
 
 
+@app.get("/catalog/assets", response_model=CatalogAssetsResponse)
+def list_catalog_assets(
+    response: Response,
+    mv_context_default: Optional[str] = None,
+    tipo_asset: Optional[str] = None,
+    q: Optional[str] = Query(None, description="Keywords (all must match)"),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Lists / filters the asset catalog (indexed by mv_context_default and tipo_asset, keyword search).
+    Supports cursor pagination and conditional requests (ETag / If-None-Match -> 304).
+    """
+    try:
+        page = assets_repository.query_assets(mv_context_default, tipo_asset, q, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    if if_none_match and _etag_matches(if_none_match, page.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": page.etag})
+
+    response.headers["ETag"] = page.etag
+    return CatalogAssetsResponse(items=page.items, total=page.total, next_cursor=page.next_cursor)
+
+
+@app.post("/assets/catalog/reload")
+def reload_assets_catalog():
+    """
+    Re-reads assets.json (and rescans the asset files) now instead of waiting for change detection.
+    The new catalog is swapped in atomically; requests in flight keep using the previous one.
+    """
+    result = assets_repository.reload(force=True)
+    assets_repository.refresh_file_index(force=True)
+    return result
+
+
+@app.api_route("/refs/{name}", methods=["GET", "HEAD"])
+def get_reference(name: str, exp: int, sig: str):
+    """
+    Serves a hosted reference image (see adapters/reference_host.py) if the signature is valid and not expired.
+    """
+    path = reference_host.resolve(name, exp, sig)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired reference URL")
+    return FileResponse(path)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match is "*" or a comma-separated list of entity tags, compared weakly (W/ prefix ignored)."""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
+
+
+def _asset_usages(asset_id: str) -> AssetShotsResponse:
+    asset = assets_repository.get_asset(asset_id)
+    entry = assets_repository.get_file_entry(asset.file_name) if asset else None
+    content_hash = entry.content_hash if entry else None
+    return AssetShotsResponse(asset_id=asset_id, content_hash=content_hash,
+                              shots=dependency_index.usages(asset_id, asset, content_hash))
+
+
+@app.get("/catalog/assets/{asset_id}/shots", response_model=AssetShotsResponse)
+def list_asset_shots(asset_id: str, stale_only: bool = False):
+    """
+    Shots generated with a catalog asset. Each one is flagged `stale` (with reasons) when the
+    asset image or its descripcion_visual changed since the shot was generated.
+    """
+    result = _asset_usages(asset_id)
+    if stale_only:
+        result.shots = [usage for usage in result.shots if usage.stale]
+    return result
+
+
+@app.post("/catalog/assets/{asset_id}/shots/regenerate", response_model=AssetRegenerationResponse)
+def regenerate_asset_shots(asset_id: str, background_tasks: BackgroundTasks, stale_only: bool = True):
+    """
+    Queues for regeneration exactly the shots that used the asset (only the stale ones by default).
+    Shots are rebuilt from their metadata.json in the background; poll the shots endpoint for progress.
+    """
+    usages = [u for u in _asset_usages(asset_id).shots if u.stale or not stale_only]
+    queued, missing, shots = [], [], []
+    for usage in usages:
+        shot = fs_adapter.load_metadata(usage.video_id, usage.block_id, usage.shot_id)
+        if shot is None:
+            missing.append(usage)
+            continue
+        queued.append(usage)
+        shots.append(shot)
+
+    def regenerate_all():
+        for shot in shots:
+            logger.info(f"🔄 Regenerating {shot.video_id}/{shot.block_id}/{shot.shot_id} after change of asset {asset_id}")
+            regenerate_shot_usecase.execute(shot)
+
+    if shots:
+        background_tasks.add_task(regenerate_all)
+    return AssetRegenerationResponse(asset_id=asset_id, queued=queued, missing=missing)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    In-process metrics (retry counts, stage timings...) as JSON.
+    """
+    return metrics.snapshot()
+
+
+@app.get("/failures/stats")
+def get_failure_stats():
+    """
+    Kie.ai failure taxonomy (category -> automatic action) and counts per category / failCode.
+    """
+    return failure_stats.snapshot()
+
+
 @app.post("/shots/process", response_model=ShotProcessResponse)
 def process_shot(shot: Shot):
     """
@@ -121,6 +331,8 @@ def process_shot(shot: Shot):
                 result.image_path = fs_adapter.get_public_url(result.image_path)
             if result.video_path:
                 result.video_path = fs_adapter.get_public_url(result.video_path)
+            if result.video_conformed_path:
+                result.video_conformed_path = fs_adapter.get_public_url(result.video_conformed_path)
             
             return ShotProcessResponse(
                 success=True,
@@ -150,6 +362,99 @@ def process_shot(shot: Shot):
         )
 
 
+@app.post("/videos/{video_id}/preflight", response_model=PreflightReport)
+def preflight_storyboard(video_id: str, request: StoryboardRequest):
+    """
+    Checks every shot of a storyboard without calling Kie.ai and returns all problems at once:
+    unknown/missing assets and files, unknown camera_move, prompts that cannot be rendered
+    and whether PUBLIC_BASE_URL (used by Kie.ai to fetch references) is reachable.
+    `ok` is false if any shot would fail.
+    """
+    return preflight_usecase.execute(video_id, request.shots)
+
+
+@app.post("/videos/{video_id}/process", response_model=Union[StoryboardResult, StoryboardPlan])
+def process_storyboard(video_id: str, request: StoryboardRequest, dry_run: bool = False):
+    """
+    Process all shots of a storyboard (BATCH_CONCURRENCY at a time).
+    Shots whose inputs did not change since their last successful run, and whose image/video
+    are still valid on disk, are skipped and returned as they were (`skipped: true`).
+    Set `force` to reprocess everything.
+    
+    With `dry_run=true` nothing is generated: returns the plan (Kie.ai calls, cache hits,
+    rendered prompts) and the projected wall time from recorded stage latencies.
+    """
+    foreign = [s.shot_id for s in request.shots if s.video_id != video_id]
+    if foreign:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Shots {foreign} do not belong to video {video_id}")
+
+    shots = request.shots
+    if request.quality_tier is not None:
+        shots = [shot.model_copy(update={"quality_tier": request.quality_tier}) for shot in shots]
+
+    if dry_run:
+        return plan_storyboard_usecase.execute(video_id, shots, force=request.force)
+
+    logger.info(f"🎬 Processing storyboard {video_id}: {len(shots)} shots")
+    return _with_public_urls(process_storyboard_usecase.execute(video_id, shots, force=request.force))
+
+
+@app.post("/videos/{video_id}/promote", response_model=StoryboardResult)
+def promote_shots(video_id: str, request: PromoteRequest):
+    """
+    Re-renders approved DRAFT shots at FINAL quality (final models/settings, final folder).
+    Every listed shot must have a completed draft. Shots already rendered at FINAL from the same
+    inputs are skipped.
+    """
+    drafts, missing = promote_shots_usecase.load_drafts(video_id, request.shots)
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"No completed draft for shots {[f'{r.block_id}/{r.shot_id}' for r in missing]}")
+
+    logger.info(f"⬆️ Promoting {len(drafts)} draft shots of {video_id} to FINAL")
+    return _with_public_urls(promote_shots_usecase.execute(video_id, drafts))
+
+
+@app.post("/videos/{video_id}/assemble", response_model=AssemblyResult)
+def assemble_video(video_id: str, quality_tier: QualityTier = QualityTier.FINAL,
+                   transition: Optional[str] = Query(None, description="none or an xfade transition (fade, dissolve...)"),
+                   transition_sec: Optional[float] = Query(None, gt=0)):
+    """
+    Joins the completed shot videos (ordered by block and shot id) into one mp4 by stream copy.
+    Only clips in a different format are re-encoded / remuxed, and blocks whose shots did not change
+    since the last assembly are reused, so after regenerating a shot only its block is joined again.
+    With a `transition`, only the few seconds around each cut are re-encoded.
+    Shots without a completed video are left out and listed in `missing`.
+    """
+    shots, missing = assemble_video_usecase.load_shots(video_id, quality_tier)
+    if not shots:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"No completed shot videos for video {video_id}")
+    try:
+        result = assemble_video_usecase.execute(video_id, shots, missing, quality_tier, transition, transition_sec)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except MediaProcessingError as e:
+        logger.error(f"Assembly of {video_id} failed: {e}")
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    result.video_path = fs_adapter.get_public_url(result.video_path)
+    return result
+
+
+def _with_public_urls(result: StoryboardResult) -> StoryboardResult:
+    """Same as /shots/process: public URLs in the response, local paths on disk"""
+    for outcome in result.shots:
+        if outcome.shot.estado == ShotEstado.COMPLETADO:
+            if outcome.shot.image_path:
+                outcome.shot.image_path = fs_adapter.get_public_url(outcome.shot.image_path)
+            if outcome.shot.video_path:
+                outcome.shot.video_path = fs_adapter.get_public_url(outcome.shot.video_path)
+            if outcome.shot.video_conformed_path:
+                outcome.shot.video_conformed_path = fs_adapter.get_public_url(outcome.shot.video_conformed_path)
+    return result
+
+
 @app.post("/shots/regenerate", response_model=ShotProcessResponse)
 def regenerate_shot(shot: Shot):
     """
@@ -174,6 +479,8 @@ def regenerate_shot(shot: Shot):
                 result.image_path = fs_adapter.get_public_url(result.image_path)
             if result.video_path:
                 result.video_path = fs_adapter.get_public_url(result.video_path)
+            if result.video_conformed_path:
+                result.video_conformed_path = fs_adapter.get_public_url(result.video_conformed_path)
                 
             return ShotProcessResponse(
                 success=True,
@@ -195,3 +502,10 @@ def regenerate_shot(shot: Shot):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal server error: {str(e)}"
         )
+
+
+# Mount static files to serve images publicly
+# This allows Kie.ai Veo to access images via URL
+# Hidden paths (/assets/.cache/...) are never served
+# NOTE: keep this mount last, otherwise it shadows the /assets/... API routes above
+app.mount("/assets", PublicStaticFiles(directory=str(ASSETS_DIR)), name="assets")
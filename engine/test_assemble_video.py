@@ -0,0 +1,117 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters import fs_adapter as fs_module
+from adapters.ffmpeg_adapter import FFmpegAdapter
+from adapters.fs_adapter import FSAdapter
+from adapters.local_motion_renderer import LocalMotionRenderer
+from adapters.media_verifier import Mp4Scanner
+from domain.entities import Shot, ShotEstado
+from infra.config import Config
+from usecases.assemble_video import AssembleVideo
+
+
+@unittest.skipUnless(shutil.which(Config.FFMPEG_BIN), "ffmpeg not installed")
+class TestAssembleVideo(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(fs_module, "ASSETS_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.image = Path(self.tmp.name) / "still.png"
+        Image.radial_gradient("L").convert("RGB").resize((640, 360)).save(self.image)
+        self.fs = FSAdapter()
+        self.assembler = AssembleVideo(self.fs, workers=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add_shot(self, block_id, shot_id, size=(320, 180), move="zoom_in", audio=False, estado=ShotEstado.COMPLETADO,
+                 seconds=1.0):
+        shot = Shot(video_id="VID1", block_id=block_id, shot_id=shot_id, mv_context="LAB_WIDE",
+                    descripcion_visual="Lab", estado=estado)
+        if estado == ShotEstado.COMPLETADO:
+            path = self.fs.video_output_path(shot)
+            LocalMotionRenderer(width=size[0], height=size[1], fps=12).render(str(self.image), move, seconds, path)
+            if audio:
+                FFmpegAdapter().normalize(path, path, audio=("aac", 44100, 2), audio_action="silence")
+            shot.video_path = path
+        self.fs.save_metadata(shot)
+
+    def assemble(self, **kwargs):
+        shots, missing = self.assembler.load_shots("VID1")
+        return self.assembler.execute("VID1", shots, missing, **kwargs)
+
+    def test_clips_are_ordered_and_only_the_odd_one_is_reencoded(self):
+        for block_id, shot_id in [("2", "2"), ("1", "10"), ("1", "2"), ("1", "1")]:
+            self.add_shot(block_id, shot_id)
+        self.add_shot("2", "1", size=(256, 144))
+        self.add_shot("2", "3", estado=ShotEstado.ERROR)
+
+        shots, missing = self.assembler.load_shots("VID1")
+        self.assertEqual([f"{s.block_id}/{s.shot_id}" for s in shots], ["1/1", "1/2", "1/10", "2/1", "2/2"])
+        self.assertEqual([(r.block_id, r.shot_id) for r in missing], [("2", "3")])
+
+        result = self.assembler.execute("VID1", shots, missing)
+        self.assertEqual(result.normalized, {"2/1": "video re-encoded to h264 320x180@12"})
+        self.assertEqual(result.blocks_rebuilt, ["1", "2"])
+        problems, info = Mp4Scanner().scan(result.video_path)
+        self.assertEqual(problems, [])
+        self.assertEqual((info.width, info.height, info.fps), (320, 180, 12.0))
+        self.assertAlmostEqual(info.duration_sec, 5.0, delta=0.2)
+
+    def test_clips_without_sound_get_a_silent_track(self):
+        self.add_shot("1", "1")
+        self.add_shot("1", "2", audio=True)
+        result = self.assemble()
+        self.assertEqual(result.normalized, {"1/1": "silent audio added"})
+        problems, info = Mp4Scanner().scan(result.video_path)
+        self.assertEqual(problems, [])
+        self.assertEqual(info.audio, "aac/44100/2")
+
+    def test_regenerated_shot_only_rejoins_its_block(self):
+        for block_id in ("1", "2"):
+            for shot_id in ("1", "2"):
+                self.add_shot(block_id, shot_id)
+        self.add_shot("2", "3", size=(256, 144))
+        self.assemble()
+
+        with mock.patch.object(FFmpegAdapter, "normalize", side_effect=AssertionError("re-encoded again")):
+            unchanged = self.assemble()
+        self.assertEqual((unchanged.blocks_rebuilt, unchanged.blocks_reused), ([], ["1", "2"]))
+
+        self.add_shot("1", "2", move="pan_left")
+        result = self.assemble()
+        self.assertEqual((result.blocks_rebuilt, result.blocks_reused), (["1"], ["2"]))
+        self.assertAlmostEqual(result.duration_sec, 5.0, delta=0.2)
+
+    def test_transitions_reencode_only_the_windows_around_cuts(self):
+        # 5 s clips with a keyframe every 2 s: each cut re-encodes 1 s of the outgoing clip and 2 s of the next
+        for block_id, shot_id in [("1", "1"), ("1", "2"), ("1", "3"), ("2", "1")]:
+            self.add_shot(block_id, shot_id, seconds=5.0, audio=True)
+        result = self.assemble(transition="fade", transition_sec=0.5)
+        self.assertEqual(result.windows_encoded, 3)  # two cuts in block 1, one between the blocks
+        self.assertAlmostEqual(result.duration_sec, 18.5, delta=0.1)
+        frames = FFmpegAdapter().sample_gray_frames(result.video_path, 12, 16, 9)
+        self.assertEqual(len(frames) // (16 * 9), 222)  # 18.5 s at 12 fps: no frame lost or repeated at the joins
+
+        self.add_shot("1", "1", seconds=5.0, audio=True, move="pan_left")
+        result = self.assemble(transition="fade", transition_sec=0.5)
+        self.assertEqual((result.blocks_rebuilt, result.blocks_reused), (["1"], ["2"]))
+        self.assertEqual(result.windows_encoded, 2)  # its cut in block 1 and the block boundary
+
+        with self.assertRaises(ValueError):
+            self.assemble(transition="spin")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters.asset_dependency_index import AssetDependencyIndex, descripcion_hash
+from domain.entities import Asset, Shot, ShotEstado
+
+
+def make_asset(**overrides):
+    data = dict(asset_id="LAB_ISOMETRIC_MAIN", file_name="HL_Core_Lab_Isometric_Main_v01",
+                tipo_asset="MV_BACKGROUND", mv_context_default="LAB_WIDE",
+                descripcion_visual="Vista isométrica amplia del Hintsly Lab", uso_sugerido="Plano maestro")
+    data.update(overrides)
+    return Asset(**data)
+
+
+def make_shot(shot_id, asset, content_hash="a" * 64):
+    return Shot(video_id="VID1", block_id="1", shot_id=shot_id, mv_context="LAB_WIDE",
+                descripcion_visual="Laboratorio", asset_id=asset.asset_id, asset_content_hash=content_hash,
+                asset_descripcion_hash=descripcion_hash(asset), estado=ShotEstado.COMPLETADO)
+
+
+class TestAssetDependencyIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "cache" / "asset_dependencies.json"
+        self.index = AssetDependencyIndex(str(self.path))
+        self.asset = make_asset()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_usages_are_flagged_stale_after_asset_changes(self):
+        self.index.record(make_shot("1", self.asset))
+        self.index.record(make_shot("2", self.asset, content_hash="b" * 64))
+
+        usages = self.index.usages("LAB_ISOMETRIC_MAIN", self.asset, "a" * 64)
+        self.assertEqual([(u.shot_id, u.stale) for u in usages], [("1", False), ("2", True)])
+        self.assertEqual(usages[1].stale_reasons, ["image_changed"])
+
+        edited = make_asset(descripcion_visual="Vista nocturna del laboratorio")
+        self.assertTrue(all(u.stale for u in self.index.usages("LAB_ISOMETRIC_MAIN", edited, "a" * 64)))
+        self.assertEqual(self.index.usages("LAB_ISOMETRIC_MAIN", None)[0].stale_reasons, ["asset_removed"])
+
+    def test_reprocessed_shot_moves_to_its_new_asset(self):
+        self.index.record(make_shot("1", self.asset))
+        other = make_asset(asset_id="LAB_WALL_HUD")
+        self.index.record(make_shot("1", other))
+        self.assertEqual(self.index.usages("LAB_ISOMETRIC_MAIN"), [])
+        self.assertEqual(len(self.index.usages("LAB_WALL_HUD")), 1)
+
+    def test_index_is_shared_through_the_file(self):
+        self.index.record(make_shot("1", self.asset))
+        other_worker = AssetDependencyIndex(str(self.path))
+        other_worker.record(make_shot("2", self.asset))
+        self.assertEqual([u.shot_id for u in self.index.usages("LAB_ISOMETRIC_MAIN")], ["1", "2"])
+
+    def test_rebuild_from_metadata(self):
+        videos = Path(self.tmp.name) / "videos"
+        shot_dir = videos / "VID1" / "block_1" / "shot_3"
+        shot_dir.mkdir(parents=True)
+        (shot_dir / "metadata.json").write_text(json.dumps(make_shot("3", self.asset).model_dump(mode="json")))
+        self.assertEqual(self.index.rebuild(videos), 1)
+        self.assertEqual([u.shot_id for u in AssetDependencyIndex(str(self.path)).usages("LAB_ISOMETRIC_MAIN")], ["3"])
+
+
+if __name__ == '__main__':
+    unittest.main()
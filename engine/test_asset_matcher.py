@@ -0,0 +1,90 @@
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import numpy as np
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from domain.entities import Asset, Shot
+from usecases.asset_matcher import AssetMatcher, tokenize
+
+
+def make_asset(asset_id, tipo, context, descripcion, uso):
+    return Asset(asset_id=asset_id, file_name=f"HL_{asset_id}_v01", tipo_asset=tipo,
+                 mv_context_default=context, descripcion_visual=descripcion, uso_sugerido=uso)
+
+
+class TestAssetMatcher(unittest.TestCase):
+    def setUp(self):
+        self.repo = MagicMock()
+        self.repo.catalog_version.return_value = "v1"
+        self.repo.list_assets.return_value = [
+            make_asset("LAB_ISOMETRIC_MAIN", "MV_BACKGROUND", "LAB_WIDE",
+                       "Vista isométrica amplia del Hintsly Lab con mesa central y racks de servidores.",
+                       "Plano maestro del laboratorio, establishing shots."),
+            make_asset("LAB_TABLE_HOLO", "MV_BACKGROUND", "LAB_TABLE",
+                       "Mesa holográfica central con proyección de datos de crédito.",
+                       "Primeros planos de la mesa de comando."),
+            make_asset("ICON_CREDIT_SCORE", "ICON", "DATA_PANEL",
+                       "Icono de credit score con medidor semicircular.",
+                       "Paneles de datos y HUDs de puntaje de crédito."),
+        ]
+        self.matcher = AssetMatcher(self.repo)
+
+    def shot(self, mv_context, descripcion):
+        return Shot(video_id="v", block_id="B01", shot_id="P01", mv_context=mv_context, descripcion_visual=descripcion)
+
+    def test_tokenize_strips_accents_and_stopwords(self):
+        self.assertEqual(tokenize("Vista isométrica del Lab"), ["vista", "isometrica", "lab"])
+
+    def test_best_match_uses_context_and_description(self):
+        match = self.matcher.best_match(self.shot("DATA_PANEL", "A credit score gauge on a HUD"))
+        self.assertEqual(match.asset_id, "ICON_CREDIT_SCORE")
+
+        match = self.matcher.best_match(self.shot("LAB_WIDE", "Wide establishing shot of the Hintsly lab"))
+        self.assertEqual(match.asset_id, "LAB_ISOMETRIC_MAIN")
+        self.assertGreater(match.score, 0)
+
+    def test_index_is_rebuilt_only_when_catalog_changes(self):
+        self.matcher.match(self.shot("LAB_WIDE", "lab"))
+        self.matcher.match(self.shot("LAB_WIDE", "lab"))
+        self.assertEqual(self.repo.list_assets.call_count, 1)
+
+        self.repo.catalog_version.return_value = "v2"
+        self.matcher.match(self.shot("LAB_WIDE", "lab"))
+        self.assertEqual(self.repo.list_assets.call_count, 2)
+
+
+    def test_sparse_scores_equal_dense_cosine(self):
+        words = ["lab", "mesa", "holograma", "servidor", "credito", "panel", "icono", "grafico", "noche", "cliente"]
+        rng = np.random.default_rng(0)
+        assets = [make_asset(f"A{i}", "MV_BACKGROUND", f"CTX_{i % 4}", " ".join(rng.choice(words, 6)),
+                             " ".join(rng.choice(words, 3))) for i in range(200)]
+        self.repo.list_assets.return_value = assets
+        self.repo.catalog_version.return_value = "v3"
+        shot = self.shot("CTX_1", "mesa holograma en el lab de noche")
+
+        matches = self.matcher.match(shot, top_k=5)
+        index = self.matcher._index
+        dense = np.zeros((len(assets), len(index.vocab)), dtype=np.float32)
+        for col in range(len(index.vocab)):
+            start, end = index.indptr[col], index.indptr[col + 1]
+            dense[index.rows[start:end], col] = index.data[start:end]
+        np.testing.assert_allclose(np.linalg.norm(dense, axis=1), 1.0, rtol=1e-5)
+
+        query = np.zeros(len(index.vocab), dtype=np.float32)
+        fields = {"descripcion_visual": (tokenize(shot.descripcion_visual), 1.0), "mv_context": (["ctx_ctx_1"], 1.0)}
+        for col, weight in self.matcher._vectorize(index, fields).items():
+            query[col] = weight
+        expected = dense @ query
+        self.assertEqual(len(matches), 5)
+        for match in matches:
+            self.assertAlmostEqual(match.score, float(expected[int(match.asset_id[1:])]), places=3)
+        self.assertAlmostEqual(matches[0].score, float(expected.max()), places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters.assets_repository import AssetsRepository
+from infra.config import Config
+
+
+class VanishedEntry:
+    """A directory entry whose file was deleted between the listing and the stat."""
+
+    def __init__(self, entry):
+        self.name, self.path = entry.name, entry.path
+
+    def is_file(self):
+        return True
+
+    def stat(self):
+        raise FileNotFoundError(self.path)
+
+
+class TestAssetsRepository(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.files_dir = root / "catalog_files"
+        self.files_dir.mkdir()
+        self.catalog_path = root / "assets.json"
+        self.catalog_path.write_text(json.dumps({"assets": [{
+            "asset_id": "LAB_ISOMETRIC_MAIN",
+            "file_name": "HL_Core_Lab_Isometric_Main_v01",
+            "tipo_asset": "MV_BACKGROUND",
+            "mv_context_default": "LAB_WIDE",
+            "descripcion_visual": "Vista isométrica amplia del Hintsly Lab",
+            "uso_sugerido": "Plano maestro del laboratorio",
+        }]}), encoding="utf-8")
+        (self.files_dir / "HL_Core_Lab_Isometric_Main_v01.png").write_bytes(b"png")
+        (self.files_dir / "HL_Core_Lab_Isometric_Main_v01.jpeg").write_bytes(b"jpeg")
+        self.repo = AssetsRepository(str(self.catalog_path), str(self.files_dir))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resolution_follows_extension_priority(self):
+        path = self.repo.resolve_file_path("HL_Core_Lab_Isometric_Main_v01")
+        self.assertEqual(path.name, "HL_Core_Lab_Isometric_Main_v01.jpeg")
+        self.assertIsNone(self.repo.resolve_file_path("missing"))
+
+    def test_new_files_are_picked_up_from_dir_mtime(self):
+        self.assertIsNone(self.repo.resolve_file_path("HL_Icon_Credit_v01"))
+        (self.files_dir / "HL_Icon_Credit_v01.png").write_bytes(b"icon")
+        # Make sure the directory mtime moves even on coarse-grained filesystems
+        stat = self.files_dir.stat()
+        os.utime(self.files_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.repo._files_checked_at -= Config.ASSETS_INDEX_CHECK_SEC
+        self.assertIsNotNone(self.repo.resolve_file_path("HL_Icon_Credit_v01"))
+
+    def test_content_hash_is_memoized(self):
+        entry = self.repo.get_file_entry("HL_Core_Lab_Isometric_Main_v01")
+        self.assertEqual(len(entry.content_hash), 64)
+        self.repo.refresh_file_index(force=True)
+        self.assertEqual(self.repo._files["HL_Core_Lab_Isometric_Main_v01"].content_hash, entry.content_hash)
+
+    def test_files_vanishing_mid_scan_are_skipped(self):
+        (self.files_dir / "HL_Icon_Credit_v01.png").write_bytes(b"icon")
+        real_scandir = os.scandir
+
+        @contextmanager
+        def scandir(path):
+            with real_scandir(path) as it:
+                yield [VanishedEntry(e) if e.name.endswith(".jpeg") else e for e in it]
+
+        with mock.patch("adapters.assets_repository.os.scandir", scandir):
+            self.repo.refresh_file_index(force=True)
+        self.assertEqual(self.repo.resolve_file_path("HL_Core_Lab_Isometric_Main_v01").suffix, ".png")
+        self.assertIsNotNone(self.repo.resolve_file_path("HL_Icon_Credit_v01"))
+
+    def test_failed_scan_keeps_previous_index(self):
+        self.repo.refresh_file_index(force=True)
+        with mock.patch("adapters.assets_repository.os.scandir", side_effect=PermissionError("denied")):
+            self.repo.refresh_file_index(force=True)
+        self.assertIsNotNone(self.repo.resolve_file_path("HL_Core_Lab_Isometric_Main_v01"))
+
+    def test_concurrent_rescan_keeps_current_index(self):
+        self.repo.refresh_file_index(force=True)
+        before = self.repo._files
+        with self.repo._rescan_lock, \
+                mock.patch("adapters.assets_repository.os.scandir", side_effect=AssertionError("rescanned")):
+            self.repo.refresh_file_index(force=True)
+        self.assertIs(self.repo._files, before)
+
+    def test_catalog_edits_are_hot_reloaded(self):
+        self.assertIsNotNone(self.repo.get_asset("LAB_ISOMETRIC_MAIN"))
+        self.assertIsNone(self.repo.get_asset("LAB_WALL_HUD"))
+
+        data = json.loads(self.catalog_path.read_text(encoding="utf-8"))
+        data["assets"].append(dict(data["assets"][0], asset_id="LAB_WALL_HUD", file_name="HL_Lab_Wall_HUD_v01"))
+        self.catalog_path.write_text(json.dumps(data), encoding="utf-8")
+
+        # Change detection reloads in the background; the explicit reload is what the endpoint calls
+        result = self.repo.reload()
+        self.assertTrue(result["reloaded"])
+        self.assertEqual(result["assets"], 2)
+        self.assertIsNotNone(self.repo.get_asset("LAB_WALL_HUD"))
+
+    def test_broken_catalog_keeps_previous_version(self):
+        self.assertIsNotNone(self.repo.get_asset("LAB_ISOMETRIC_MAIN"))
+        self.catalog_path.write_text("{ not json", encoding="utf-8")
+        result = self.repo.reload(force=True)
+        self.assertFalse(result["reloaded"])
+        self.assertIsNotNone(self.repo.get_asset("LAB_ISOMETRIC_MAIN"))
+
+    def test_query_by_secondary_indexes_with_pagination(self):
+        data = json.loads(self.catalog_path.read_text(encoding="utf-8"))
+        base = data["assets"][0]
+        data["assets"] += [
+            dict(base, asset_id="LAB_WALL_HUD", file_name="HL_Lab_Wall_HUD_v01", tipo_asset="HUD",
+                 descripcion_visual="Pared con HUD de crédito"),
+            dict(base, asset_id="ICON_CREDIT", file_name="HL_Icon_Credit_v01", tipo_asset="ICON",
+                 mv_context_default="DATA_PANEL", descripcion_visual="Icono de crédito"),
+        ]
+        self.catalog_path.write_text(json.dumps(data), encoding="utf-8")
+
+        page = self.repo.query_assets(mv_context="LAB_WIDE", limit=1)
+        self.assertEqual(page.total, 2)
+        self.assertEqual([a.asset_id for a in page.items], ["LAB_ISOMETRIC_MAIN"])
+        second = self.repo.query_assets(mv_context="LAB_WIDE", cursor=page.next_cursor, limit=1)
+        self.assertEqual([a.asset_id for a in second.items], ["LAB_WALL_HUD"])
+        self.assertIsNone(second.next_cursor)
+        self.assertNotEqual(page.etag, second.etag)
+
+        self.assertEqual([a.asset_id for a in self.repo.query_assets(tipo_asset="ICON").items], ["ICON_CREDIT"])
+        self.assertEqual([a.asset_id for a in self.repo.query_assets(q="credito", mv_context="LAB_WIDE").items],
+                         ["LAB_WALL_HUD"])
+
+    def test_binary_index_is_shared_between_workers(self):
+        index_path = Path(self.tmp.name) / "cache" / "catalog.idx"
+        first = AssetsRepository(str(self.catalog_path), str(self.files_dir), index_path=str(index_path))
+        self.assertEqual(first.reload()["source"], "index")
+        self.assertTrue(index_path.exists())
+
+        # A second worker maps the index and never parses assets.json
+        second = AssetsRepository(str(self.catalog_path), str(self.files_dir), index_path=str(index_path))
+        second._parse_catalog = lambda raw: self.fail("catalog was parsed again")
+        asset = second.get_asset("LAB_ISOMETRIC_MAIN")
+        self.assertEqual(asset.descripcion_visual, "Vista isométrica amplia del Hintsly Lab")
+        self.assertIsNone(asset.notas)
+        self.assertIsNone(second.get_asset("LAB_WALL_HUD"))
+        self.assertEqual(second.query_assets(q="laboratorio").total, 1)
+
+        data = json.loads(self.catalog_path.read_text(encoding="utf-8"))
+        data["assets"].append(dict(data["assets"][0], asset_id="LAB_WALL_HUD", file_name="HL_Lab_Wall_HUD_v01"))
+        self.catalog_path.write_text(json.dumps(data), encoding="utf-8")
+        self.assertEqual(first.reload()["assets"], 2)
+        self.assertEqual(second.reload()["assets"], 2)
+        self.assertIsNotNone(second.get_asset("LAB_WALL_HUD"))
+
+
+    def test_reload_closes_the_replaced_index_after_its_readers(self):
+        index_path = Path(self.tmp.name) / "cache" / "catalog.idx"
+        repo = AssetsRepository(str(self.catalog_path), str(self.files_dir), index_path=str(index_path))
+        repo.reload()
+        first = repo._snapshot.assets
+
+        # Touched, not edited: the new version keeps using the same mapping
+        stat = self.catalog_path.stat()
+        os.utime(self.catalog_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        repo.reload()
+        self.assertIs(repo._snapshot.assets, first)
+        self.assertFalse(first.closed)
+
+        data = json.loads(self.catalog_path.read_text(encoding="utf-8"))
+        data["assets"].append(dict(data["assets"][0], asset_id="LAB_WALL_HUD", file_name="HL_Lab_Wall_HUD_v01"))
+        self.catalog_path.write_text(json.dumps(data), encoding="utf-8")
+        with repo._reading() as pinned:
+            repo.reload()
+            if repo._reload_thread:
+                repo._reload_thread.join()  # change detection may have started the reload first
+            self.assertIsNot(repo._snapshot.assets, first)
+            self.assertFalse(first.closed)  # still in use by this reader
+            self.assertIsNotNone(pinned.assets.get("LAB_ISOMETRIC_MAIN"))
+        self.assertTrue(first.closed)
+        self.assertIsNotNone(repo.get_asset("LAB_WALL_HUD"))
+
+        second = repo._snapshot.assets
+        repo.reload(force=True)
+        self.assertTrue(second.closed)
+        self.assertFalse(repo._snapshot.assets.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
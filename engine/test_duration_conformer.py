@@ -0,0 +1,154 @@
+import logging
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters import fs_adapter as fs_module
+from adapters.duration_conformer import ConformResult, DurationConformer
+from adapters.ffmpeg_adapter import FFmpegAdapter
+from adapters.fs_adapter import FSAdapter
+from adapters.local_motion_renderer import LocalMotionRenderer
+from adapters.media_verifier import Mp4Scanner
+from domain.entities import Shot, ShotEstado
+from domain.errors import MediaProcessingError
+from infra.config import Config
+from test_process_storyboard import FakeImageClient, FakeVideoClient, NoAssets
+from usecases.assemble_video import AssembleVideo
+from usecases.process_shot import ProcessShot
+from usecases.utils_prompt import PromptService
+
+
+@unittest.skipUnless(shutil.which(Config.FFMPEG_BIN), "ffmpeg not installed")
+class TestDurationConformer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        image = self.dir / "still.png"
+        Image.radial_gradient("L").convert("RGB").resize((640, 360)).save(image)
+        # 5 s at 12 fps
+        self.clip = LocalMotionRenderer(width=320, height=180, fps=12).render(str(image), "zoom_in", 5.0,
+                                                                               str(self.dir / "clip.mp4"))
+        FFmpegAdapter().normalize(self.clip, self.clip, audio=("aac", 44100, 2), audio_action="silence")
+        self.keyframes = FFmpegAdapter().keyframe_times(self.clip)
+        self.output = str(self.dir / "conformed.mp4")
+        self.conformer = DurationConformer()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def frames(self, path):
+        """Frames stored in the file (no resampling to a frame rate)."""
+        proc = subprocess.run([Config.FFMPEG_BIN, "-hide_banner", "-i", path, "-map", "0:v:0", "-vf", "showinfo",
+                               "-f", "null", "-"], capture_output=True, text=True, check=True)
+        return proc.stderr.count("pts_time:")
+
+    def test_trim_reencodes_only_the_partial_gop(self):
+        result = self.conformer.conform(self.clip, 3.0, self.output)
+        self.assertEqual(result.action, "trimmed")
+        last_key = max(k for k in self.keyframes if k <= 3.0)
+        self.assertGreater(last_key, 0.0)  # the GOPs before it were copied
+        self.assertAlmostEqual(result.reencoded_sec, 3.0 - last_key, delta=0.01)
+        self.assertAlmostEqual(result.duration_sec, 3.0, delta=0.05)
+        self.assertEqual(self.frames(self.output), 36)
+        problems, info = Mp4Scanner().scan(self.output)
+        self.assertEqual(problems, [])
+        self.assertEqual((info.width, info.height, info.fps, info.audio), (320, 180, 12.0, "aac/44100/2"))
+
+    def test_trim_on_a_keyframe_is_pure_stream_copy(self):
+        with mock.patch.object(FFmpegAdapter, "encode_span", side_effect=AssertionError("re-encoded")):
+            result = self.conformer.conform(self.clip, self.keyframes[1], self.output)
+        self.assertEqual(result.reencoded_sec, 0.0)
+        self.assertEqual(self.frames(self.output), round(self.keyframes[1] * 12))
+
+    def test_short_clip_is_looped(self):
+        result = self.conformer.conform(self.clip, 8.0, self.output)
+        self.assertEqual(result.action, "looped")
+        # the whole clip, then its first 3 s cut as in the trim
+        self.assertAlmostEqual(result.reencoded_sec, 3.0 - max(k for k in self.keyframes if k <= 3.0), delta=0.01)
+        self.assertAlmostEqual(result.duration_sec, 8.0, delta=0.05)
+        self.assertEqual(self.frames(self.output), 96)
+
+    def test_clip_within_tolerance_is_left_alone(self):
+        Path(self.output).write_bytes(b"outdated")
+        self.assertIsNone(self.conformer.conform(self.clip, 5.05, self.output))
+        self.assertFalse(Path(self.output).exists())
+
+        with self.assertRaises(MediaProcessingError):
+            self.conformer.conform(str(self.dir / "still.png"), 3.0, self.output)
+
+
+class FakeConformer:
+    def __init__(self):
+        self.calls = []
+
+    def conform(self, video_path, target_sec, output_path):
+        self.calls.append((video_path, target_sec, output_path))
+        Path(output_path).write_bytes(b"conformed")
+        return ConformResult(output_path, target_sec, "trimmed", 0.5)
+
+
+class TestProcessShotConform(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(fs_module, "ASSETS_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.conformer = FakeConformer()
+        self.process_shot = ProcessShot(FSAdapter(), PromptService(), FakeImageClient(), FakeVideoClient(),
+                                        logging.getLogger("hintsly_test"), NoAssets(),
+                                        duration_conformer=self.conformer)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_conformed_clip_is_recorded_next_to_the_original(self):
+        shot = Shot(video_id="VID1", block_id="1", shot_id="1", mv_context="LAB_WIDE", descripcion_visual="Lab",
+                    duracion_seg=3.0)
+        shot = self.process_shot.execute(shot)
+        self.assertEqual(len(self.conformer.calls), 1)
+        self.assertEqual(self.conformer.calls[0][:2], (shot.video_path, 3.0))
+        self.assertEqual(Path(shot.video_conformed_path), Path(shot.video_path).parent / "video_conformed.mp4")
+        self.assertEqual(shot.video_conformed_sec, 3.0)
+
+
+@unittest.skipUnless(shutil.which(Config.FFMPEG_BIN), "ffmpeg not installed")
+class TestAssembleConformed(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(fs_module, "ASSETS_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.image = Path(self.tmp.name) / "still.png"
+        Image.radial_gradient("L").convert("RGB").resize((640, 360)).save(self.image)
+        self.fs = FSAdapter()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_assembly_uses_the_conformed_clips(self):
+        for shot_id in ("1", "2"):
+            shot = Shot(video_id="VID1", block_id="1", shot_id=shot_id, mv_context="LAB_WIDE",
+                        descripcion_visual="Lab", duracion_seg=3.0, estado=ShotEstado.COMPLETADO)
+            shot.video_path = LocalMotionRenderer(width=320, height=180, fps=12).render(
+                str(self.image), "zoom_in", 5.0, self.fs.video_output_path(shot))
+            result = DurationConformer().conform(shot.video_path, shot.duracion_seg, self.fs.conformed_video_path(shot))
+            shot.video_conformed_path = result.path
+            self.fs.save_metadata(shot)
+
+        assembler = AssembleVideo(self.fs, workers=2)
+        shots, missing = assembler.load_shots("VID1")
+        result = assembler.execute("VID1", shots, missing)
+        self.assertAlmostEqual(result.duration_sec, 6.0, delta=0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
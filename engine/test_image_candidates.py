@@ -0,0 +1,186 @@
+import base64
+import io
+import logging
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import requests
+from PIL import Image, ImageFilter
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters import fs_adapter as fs_module
+from adapters import gemini_client
+from adapters.fs_adapter import FSAdapter
+from adapters.gemini_client import KieNanoBananaClient
+from adapters.image_scorer import ImageScorer
+from domain.entities import Shot, ShotEstado
+from domain.errors import ImageGenerationCancelled, ImageGenerationError
+from infra import retry as retry_module
+from test_process_storyboard import FakeVideoClient, NoAssets
+from usecases.image_candidates import ImageCandidates
+from usecases.process_shot import ProcessShot
+from usecases.utils_prompt import PromptService
+
+
+def data_uri(img: Image.Image) -> str:
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+def detailed(seed=0) -> Image.Image:
+    """Random large-scale layout plus fine texture, like a photo."""
+    rng = np.random.default_rng(seed)
+    layout = Image.fromarray(rng.integers(60, 196, (9, 16, 3), dtype=np.uint8)).resize((512, 288), Image.BICUBIC)
+    texture = rng.integers(-40, 40, (288, 512, 3))
+    return Image.fromarray(np.clip(np.asarray(layout, dtype=int) + texture, 0, 255).astype(np.uint8))
+
+
+SHARP = data_uri(detailed())
+BLURRY = data_uri(detailed().filter(ImageFilter.GaussianBlur(8)))
+WHITE = data_uri(Image.new("RGB", (512, 288), "white"))
+
+
+class TestImageScorer(unittest.TestCase):
+    def setUp(self):
+        self.scorer = ImageScorer(min_sharpness=20, max_clipped=0.2, max_reference_similarity=0.98)
+
+    def test_sharp_image_passes(self):
+        score = self.scorer.score(SHARP)
+        self.assertTrue(score.ok, score.problems)
+        self.assertAlmostEqual(score.exposure, 0.5, delta=0.05)
+
+    def test_blurry_and_blown_out_images_are_rejected(self):
+        blurry = self.scorer.score(BLURRY)
+        self.assertIn("blurry", blurry.problems[0])
+        white = self.scorer.score(WHITE)
+        self.assertTrue(any("clipped" in p for p in white.problems))
+        self.assertGreater(self.scorer.score(SHARP).value, blurry.value)
+
+    def test_copy_of_the_reference_is_rejected(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            reference = Path(tmp) / "ref.jpg"
+            detailed().resize((1024, 576)).save(reference, quality=90)
+            self.assertIn("copy of the reference", self.scorer.score(SHARP, str(reference)).problems[0])
+            self.assertTrue(self.scorer.score(data_uri(detailed(seed=1)), str(reference)).ok)
+
+    def test_undecodable_data_is_rejected(self):
+        self.assertFalse(self.scorer.score("data:image/png;base64,AAAA").ok)
+
+
+class TestImageCandidates(unittest.TestCase):
+    def test_first_good_candidate_wins_and_stragglers_are_cancelled(self):
+        results = iter([BLURRY, SHARP, None])
+        lock = threading.Lock()
+        cancelled = threading.Event()
+
+        def attempt(cancel):
+            with lock:
+                image = next(results)
+            if image is None:  # straggler: still running on Kie.ai
+                if cancel.wait(timeout=5):
+                    cancelled.set()
+                raise ImageGenerationCancelled("no longer needed")
+            return image, "prompt"
+
+        candidate = ImageCandidates(count=3, quorum=1).generate(attempt)
+        self.assertEqual(candidate.image, SHARP)
+        self.assertEqual(candidate.submitted, 3)
+        self.assertTrue(cancelled.wait(timeout=5))
+
+    def test_best_effort_without_good_candidates(self):
+        results = iter([WHITE, BLURRY])
+        lock = threading.Lock()
+
+        def attempt(cancel):
+            with lock:
+                return next(results), "prompt"
+
+        candidate = ImageCandidates(count=2).generate(attempt)
+        self.assertFalse(candidate.score.ok)
+        self.assertEqual(candidate.image, BLURRY)  # sharper than the white frame
+
+    def test_all_failures_raise(self):
+        def attempt(cancel):
+            raise ImageGenerationError("Nano Banana task failed")
+
+        with self.assertRaises(ImageGenerationError):
+            ImageCandidates(count=2).generate(attempt)
+
+
+class TestCancelledSubmission(unittest.TestCase):
+    def test_cancelled_straggler_submits_no_task(self):
+        client = KieNanoBananaClient()
+        client.api_key = "key"
+        cancel = threading.Event()
+
+        def post(*args, **kwargs):
+            cancel.set()  # quorum reached while this submission was backing off
+            raise requests.ConnectTimeout()
+
+        with mock.patch.object(gemini_client.requests, "post", side_effect=post) as sent, \
+                mock.patch.object(retry_module.time, "sleep"):
+            with self.assertRaises(ImageGenerationCancelled):
+                client.generate("A lab", cancel_event=cancel)
+        self.assertEqual(sent.call_count, 1)  # the retry after the backoff was not sent
+
+        with mock.patch.object(gemini_client.requests, "post") as sent:
+            with self.assertRaises(ImageGenerationCancelled):
+                client.generate("A lab", cancel_event=cancel)
+        sent.assert_not_called()
+
+
+class CandidateImageClient:
+    def __init__(self):
+        self.cancel_events = []
+        self.lock = threading.Lock()
+
+    def generate(self, prompt, ref_image_url=None, model=None, resolution=None, cancel_event=None):
+        with self.lock:
+            self.cancel_events.append(cancel_event)
+        return SHARP
+
+
+class TestProcessShotCandidates(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(fs_module, "ASSETS_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.images = CandidateImageClient()
+        self.process_shot = ProcessShot(FSAdapter(), PromptService(), self.images, FakeVideoClient(),
+                                        logging.getLogger("hintsly_test"), NoAssets(),
+                                        image_candidates=ImageCandidates(count=3, quorum=2))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_shot(self, **overrides):
+        data = dict(video_id="VID1", block_id="1", shot_id="1", mv_context="LAB_WIDE",
+                    descripcion_visual="Laboratorio")
+        data.update(overrides)
+        return Shot(**data)
+
+    def test_core_shots_generate_candidates(self):
+        shot = self.process_shot.execute(self.make_shot(core_flag=True))
+        self.assertEqual(shot.estado, ShotEstado.COMPLETADO, shot.error_message)
+        self.assertEqual(shot.image_candidates, 3)
+        self.assertIsNotNone(shot.image_score)
+        self.assertTrue(all(event is not None for event in self.images.cancel_events))
+
+    def test_other_shots_generate_one_image(self):
+        shot = self.process_shot.execute(self.make_shot())
+        self.assertEqual(shot.estado, ShotEstado.COMPLETADO, shot.error_message)
+        self.assertIsNone(shot.image_candidates)
+        self.assertEqual(self.images.cancel_events, [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import logging
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters import fs_adapter as fs_module
+from adapters.frame_cache import LastFrameCache
+from adapters.fs_adapter import FSAdapter
+from adapters.local_motion_renderer import MOVES, LocalMotionRenderer, crop_boxes
+from domain.entities import AssetMode, Shot, ShotEstado, VideoEngine
+from domain.errors import VideoQueueTimeout
+from infra.config import Config
+from test_process_storyboard import MP4, FakeImageClient, NoAssets
+from usecases.process_shot import ProcessShot
+from usecases.utils_prompt import CAMERA_MOVES, PromptService
+
+
+class FakeRenderer:
+    def __init__(self):
+        self.moves = []
+
+    def render(self, image_path, camera_move, duration_sec, output_path):
+        self.moves.append(camera_move)
+        Path(output_path).write_bytes(b"\x00\x00\x00\x18ftypisom" + b"\x00" * 32)
+        return output_path
+
+
+class SlowVideoClient:
+    def __init__(self):
+        self.max_waits = []
+
+    def generate(self, image_path, prompt, rehost=False, model=None, max_wait_sec=None):
+        self.max_waits.append(max_wait_sec)
+        if max_wait_sec is not None:
+            raise VideoQueueTimeout("Kie.ai Veo task not ready", retryable=False)
+        return MP4
+
+
+class TestCropBoxes(unittest.TestCase):
+    def test_every_camera_move_has_a_trajectory(self):
+        self.assertEqual(set(MOVES), set(CAMERA_MOVES))
+
+    def test_boxes_keep_the_aspect_and_stay_inside_the_image(self):
+        for name, move in MOVES.items():
+            boxes = crop_boxes(move, 48, 1600, 1200, 16 / 9)
+            widths, heights = boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]
+            self.assertTrue((abs(widths / heights - 16 / 9) < 1e-6).all(), name)
+            self.assertGreaterEqual(boxes[:, 0].min(), -1e-6, name)
+            self.assertGreaterEqual(boxes[:, 1].min(), -1e-6, name)
+            self.assertLessEqual(boxes[:, 2].max(), 1600 + 1e-6, name)
+            self.assertLessEqual(boxes[:, 3].max(), 1200 + 1e-6, name)
+
+    def test_moves_go_the_right_way(self):
+        zoom_in = crop_boxes(MOVES["zoom_in"], 24, 1920, 1080, 16 / 9)
+        self.assertLess(zoom_in[-1, 2] - zoom_in[-1, 0], zoom_in[0, 2] - zoom_in[0, 0])
+        pan_left = crop_boxes(MOVES["pan_left"], 24, 1920, 1080, 16 / 9)
+        self.assertLess(pan_left[-1, 0], pan_left[0, 0])
+        tilt_up = crop_boxes(MOVES["tilt_up"], 24, 1920, 1080, 16 / 9)
+        self.assertLess(tilt_up[-1, 1], tilt_up[0, 1])
+        static = crop_boxes(MOVES["static"], 24, 1920, 1080, 16 / 9)
+        self.assertTrue((static == static[0]).all())
+
+
+@unittest.skipUnless(shutil.which(Config.FFMPEG_BIN), "ffmpeg not installed")
+class TestLocalMotionRenderer(unittest.TestCase):
+    def test_renders_an_mp4_in_place(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            image = Path(tmp) / "image.png"
+            Image.radial_gradient("L").convert("RGB").resize((640, 360)).save(image)
+            output = Path(tmp) / "shot" / "video.mp4"
+
+            renderer = LocalMotionRenderer(width=320, height=180, fps=12)
+            renderer.render(str(image), "Zoom_In", 1.0, str(output))
+
+            head = output.read_bytes()[:16]
+            self.assertEqual(head[4:8], b"ftyp")
+            self.assertEqual([p.name for p in output.parent.iterdir()], ["video.mp4"])
+
+    def test_last_frame_is_extracted_once_per_video(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            image = Path(tmp) / "image.png"
+            Image.radial_gradient("L").convert("RGB").resize((640, 360)).save(image)
+            video = Path(tmp) / "video.mp4"
+            LocalMotionRenderer(width=320, height=180, fps=12).render(str(image), "zoom_in", 1.0, str(video))
+
+            cache = LastFrameCache(str(Path(tmp) / "frames"))
+            frame = cache.last_frame(str(video))
+            with Image.open(frame) as img:
+                self.assertEqual(img.size, (320, 180))
+            with mock.patch.object(cache.ffmpeg, "extract_last_frame") as extract:
+                self.assertEqual(cache.last_frame(str(video)), frame)
+            extract.assert_not_called()
+
+
+class TestProcessShotVideoEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(fs_module, "ASSETS_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.renderer = FakeRenderer()
+        self.videos = SlowVideoClient()
+        self.process_shot = ProcessShot(FSAdapter(), PromptService(), FakeImageClient(), self.videos,
+                                        logging.getLogger("hintsly_test"), NoAssets(),
+                                        motion_renderer=self.renderer)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_shot(self, **overrides):
+        data = dict(video_id="VID1", block_id="1", shot_id="1", mv_context="LAB_WIDE",
+                    descripcion_visual="Laboratorio", camera_move="pan_left")
+        data.update(overrides)
+        return Shot(**data)
+
+    def test_local_engine_skips_veo(self):
+        shot = self.process_shot.execute(self.make_shot(video_engine=VideoEngine.LOCAL,
+                                                        asset_mode=AssetMode.STILL_ONLY))
+        self.assertEqual(shot.estado, ShotEstado.COMPLETADO, shot.error_message)
+        self.assertEqual(shot.video_rendered_by, VideoEngine.LOCAL)
+        self.assertEqual(self.renderer.moves, ["pan_left"])
+        self.assertEqual(self.videos.max_waits, [])
+        self.assertTrue(shot.video_path.endswith("video.mp4"))
+
+    def test_auto_falls_back_when_veo_takes_too_long(self):
+        shot = self.process_shot.execute(self.make_shot(video_engine=VideoEngine.AUTO))
+        self.assertEqual(shot.estado, ShotEstado.COMPLETADO, shot.error_message)
+        self.assertEqual(shot.video_rendered_by, VideoEngine.LOCAL)
+        self.assertEqual(self.videos.max_waits, [Config.VEO_QUEUE_TIMEOUT_SEC])
+
+    def test_veo_engine_waits_without_limit(self):
+        shot = self.process_shot.execute(self.make_shot())
+        self.assertEqual(shot.video_rendered_by, VideoEngine.VEO)
+        self.assertEqual(self.videos.max_waits, [None])
+        self.assertEqual(self.renderer.moves, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
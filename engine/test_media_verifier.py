@@ -0,0 +1,139 @@
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters.fs_adapter import FSAdapter
+from adapters.local_motion_renderer import LocalMotionRenderer
+from adapters.media_verifier import MediaVerifier, Mp4Scanner
+from domain.errors import NetworkError
+from infra.config import Config
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, content_length: int):
+        self.body = body
+        self.headers = {"Content-Length": str(content_length)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+
+class TestImageVerification(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.verifier = MediaVerifier(workers=1)
+
+    def tearDown(self):
+        self.verifier.shutdown()
+        self.tmp.cleanup()
+
+    def test_images_must_decode_and_be_large_enough(self):
+        good = Path(self.tmp.name) / "good.png"
+        Image.radial_gradient("L").resize((512, 288)).save(good)
+        self.assertTrue(self.verifier.verify_image(str(good)).ok)
+
+        cut = Path(self.tmp.name) / "cut.png"
+        cut.write_bytes(good.read_bytes()[:len(good.read_bytes()) // 2])
+        self.assertIn("undecodable", self.verifier.verify_image(str(cut)).problems[0])
+
+        tiny = Path(self.tmp.name) / "tiny.png"
+        Image.new("RGB", (64, 64)).save(tiny)
+        self.assertFalse(self.verifier.verify_image(str(tiny)).ok)
+        self.assertFalse(self.verifier.verify_image(str(Path(self.tmp.name) / "missing.png")).ok)
+
+
+@unittest.skipUnless(shutil.which(Config.FFMPEG_BIN), "ffmpeg not installed")
+class TestVideoVerification(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        image = Path(cls.tmp.name) / "image.png"
+        Image.radial_gradient("L").convert("RGB").resize((640, 360)).save(image)
+        cls.video = Path(cls.tmp.name) / "video.mp4"
+        LocalMotionRenderer(width=320, height=180, fps=12).render(str(image), "zoom_in", 1.0, str(cls.video))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        patcher = mock.patch.multiple(Config, MEDIA_MIN_VIDEO_SIDE=120, MEDIA_REDOWNLOAD_ATTEMPTS=2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.verifier = MediaVerifier(ffprobe_bin="no-ffprobe-here", workers=1)
+        self.addCleanup(self.verifier.shutdown)
+
+    def truncated_copy(self, name: str) -> Path:
+        data = self.video.read_bytes()
+        path = Path(self.tmp.name) / name
+        path.write_bytes(data[:int(len(data) * 0.7)])
+        return path
+
+    def test_mp4_headers_give_codec_size_and_duration(self):
+        problems, info = Mp4Scanner().scan(str(self.video))
+        self.assertEqual(problems, [])
+        self.assertEqual((info.codec, info.width, info.height), ("h264", 320, 180))
+        self.assertAlmostEqual(info.duration_sec, 1.0, delta=0.1)
+
+    def test_truncated_video_is_rejected(self):
+        report = self.verifier.verify_video(str(self.truncated_copy("cut.mp4")), 1.0)
+        self.assertFalse(report.ok)
+        self.assertIn("truncated", report.problems[0])
+
+    def test_duration_mismatch_is_a_warning(self):
+        report = self.verifier.verify_video(str(self.video), 8.0)
+        self.assertTrue(report.ok, report.problems)
+        self.assertIn("shot expects 8.00s", report.warnings[0])
+        with mock.patch.object(Config, "MEDIA_MIN_VIDEO_SIDE", 360):
+            self.assertIn("resolution 320x180", self.verifier.verify_video(str(self.video)).problems[0])
+
+    def test_corrupt_video_is_downloaded_again(self):
+        cut = self.truncated_copy("redownload.mp4")
+        downloads = []
+
+        def download(url, path):
+            downloads.append(url)
+            shutil.copyfile(self.video, path)
+
+        report = self.verifier.verify_video(str(cut), 1.0, "https://kie.example/result.mp4", download)
+        self.assertTrue(report.ok, report.problems)
+        self.assertEqual(downloads, ["https://kie.example/result.mp4"])
+
+
+class TestDownload(unittest.TestCase):
+    def test_incomplete_download_keeps_the_previous_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / "video.mp4"
+            target.write_bytes(b"previous")
+            download = FSAdapter.download.__wrapped__  # without the retries
+            with mock.patch("adapters.fs_adapter.requests.get", return_value=FakeResponse(b"x" * 10, 20)):
+                with self.assertRaises(NetworkError):
+                    download(FSAdapter(), "https://kie.example/v.mp4", target)
+            self.assertEqual(target.read_bytes(), b"previous")
+            self.assertEqual([p.name for p in Path(tmp).iterdir()], ["video.mp4"])
+
+            with mock.patch("adapters.fs_adapter.requests.get", return_value=FakeResponse(b"x" * 20, 20)):
+                download(FSAdapter(), "https://kie.example/v.mp4", target)
+            self.assertEqual(target.read_bytes(), b"x" * 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import logging
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters import fs_adapter as fs_module
+from adapters.fs_adapter import FSAdapter
+from adapters.latency_store import LatencyStore
+from domain.entities import AssetMode, Shot
+from infra.config import Config
+from usecases.fingerprint import ShotFingerprinter
+from usecases.image_candidates import ImageCandidates
+from usecases.plan_storyboard import PlanStoryboard
+from usecases.process_storyboard import ProcessStoryboard
+from usecases.utils_prompt import PromptService
+
+
+class NoAssets:
+    def get_asset(self, asset_id):
+        return None
+
+
+def make_shot(shot_id, **overrides):
+    data = dict(video_id="VID1", block_id="1", shot_id=shot_id, mv_context="LAB_WIDE",
+                descripcion_visual=f"Laboratorio {shot_id}")
+    data.update(overrides)
+    return Shot(**data)
+
+
+class TestPlanStoryboard(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(fs_module, "ASSETS_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.latency = LatencyStore(str(Path(self.tmp.name) / "latency.json"))
+        storyboard = ProcessStoryboard(None, FSAdapter(), ShotFingerprinter(NoAssets()),
+                                       logging.getLogger("hintsly_test"), concurrency=2)
+        self.planner = PlanStoryboard(storyboard, NoAssets(), PromptService(), self.latency)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_counts_calls_and_projects_wall_time(self):
+        for seconds in (10, 20, 30):
+            self.latency.record("image", seconds)
+        self.latency.record("video", 100)
+
+        shots = [
+            make_shot("1"),
+            make_shot("2", asset_mode=AssetMode.STILL_ONLY),
+            make_shot("3", asset_mode=AssetMode.IMAGE_2F_VIDEO),
+            make_shot("4", asset_id="UNKNOWN"),
+        ]
+        plan = self.planner.execute("VID1", shots)
+
+        self.assertEqual((plan.to_process, plan.would_fail, plan.skipped), (3, 1, 0))
+        self.assertEqual((plan.image_calls, plan.video_calls), (4, 2))
+        # The two keyframes of shot 3 are generated concurrently: same estimate as a 1F shot
+        self.assertEqual([p.estimated_sec_p50 for p in plan.plan], [120, 20, 120, 0])
+        self.assertIn("Laboratorio 1", plan.plan[0].prompt_imagen)
+        # Two workers, longest shots first: 1 and 3 start together, shot 2 follows -> 120 + 20
+        self.assertEqual(plan.wall_time_sec_p50, 140)
+        self.assertEqual(plan.latencies[0].samples, 3)
+
+    def test_continuity_shots_skip_the_image_and_run_after_their_source(self):
+        self.latency.record("image", 20)
+        self.latency.record("video", 100)
+        shots = [make_shot("1"), make_shot("2", continuity=True), make_shot("3", block_id="2")]
+        plan = self.planner.execute("VID1", shots)
+
+        self.assertEqual(plan.plan[1].continuity_from, "1")
+        self.assertEqual((plan.image_calls, plan.video_calls), (2, 3))
+        self.assertEqual([p.estimated_sec_p50 for p in plan.plan], [120, 100, 120])
+        # Shot 2 waits for shot 1 (120 + 100); shot 3 runs alongside on the other worker
+        self.assertEqual(plan.wall_time_sec_p50, 220)
+
+    def test_shots_sharing_a_keyframe_start_when_its_image_is_ready(self):
+        self.latency.record("image", 20)
+        self.latency.record("video", 100)
+        shots = [make_shot("1", descripcion_visual="Laboratorio", camera_move="zoom_in"),
+                 make_shot("2", descripcion_visual="Laboratorio", camera_move="pan_left")]
+        plan = self.planner.execute("VID1", shots)
+
+        self.assertEqual(plan.plan[1].keyframe_from, "1")
+        self.assertEqual((plan.image_calls, plan.video_calls), (1, 2))
+        # Shot 2 starts once shot 1's image is ready (20 + 100), not after its video (120 + 100)
+        self.assertEqual(plan.wall_time_sec_p50, 120)
+
+    def test_core_shots_count_every_image_candidate(self):
+        self.planner.image_candidates = ImageCandidates(count=3)
+        plan = self.planner.execute("VID1", [make_shot("1", core_flag=True), make_shot("2")])
+        self.assertEqual([p.image_calls for p in plan.plan], [3, 1])
+
+    def test_priors_are_used_without_samples(self):
+        plan = self.planner.execute("VID1", [make_shot("1")])
+        self.assertEqual(plan.wall_time_sec_p50, Config.LATENCY_PRIOR_IMAGE_SEC + Config.LATENCY_PRIOR_VIDEO_SEC)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters.assets_repository import AssetsRepository
+from domain.entities import AssetMode, Shot
+from infra.config import Config
+from usecases.preflight import Preflight
+from usecases.utils_prompt import PromptService
+
+
+def make_shot(shot_id, **overrides):
+    data = dict(video_id="VID1", block_id="1", shot_id=shot_id, mv_context="LAB_WIDE",
+                descripcion_visual="Vista del laboratorio", asset_id="LAB_ISOMETRIC_MAIN")
+    data.update(overrides)
+    return Shot(**data)
+
+
+class TestPreflight(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        catalog = root / "assets.json"
+        catalog.write_text(json.dumps({"assets": [
+            {"asset_id": "LAB_ISOMETRIC_MAIN", "file_name": "HL_Core_Lab_Isometric_Main_v01",
+             "tipo_asset": "MV_BACKGROUND", "mv_context_default": "LAB_WIDE",
+             "descripcion_visual": "Vista isométrica", "uso_sugerido": "Plano maestro"},
+            {"asset_id": "LAB_WALL_HUD", "file_name": "HL_Lab_Wall_HUD_v01",
+             "tipo_asset": "HUD", "mv_context_default": "LAB_WIDE",
+             "descripcion_visual": "Pared con HUD", "uso_sugerido": "Fondo"},
+        ]}), encoding="utf-8")
+        (root / "HL_Core_Lab_Isometric_Main_v01.png").write_bytes(b"png")
+        self.preflight = Preflight(AssetsRepository(str(catalog), str(root)), PromptService())
+        self.preflight._check_public_url = lambda: None
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reports_every_problem_at_once(self):
+        shots = [
+            make_shot("1"),
+            make_shot("2", asset_id="UNKNOWN"),
+            make_shot("3", asset_id="LAB_WALL_HUD", camera_move="barrel_roll"),
+            make_shot("4", asset_id=None, asset_mode=AssetMode.STILL_ONLY, camera_move="barrel_roll"),
+            make_shot("4", prompt_imagen="A bloody knife"),
+        ]
+        with mock.patch.object(Config, "KIE_API_KEY", "key"):
+            report = self.preflight.execute("VID1", shots)
+
+        codes = sorted((p.shot_id, p.code, p.severity) for p in report.problems)
+        self.assertEqual(codes, [
+            ("2", "unknown_asset", "error"),
+            ("3", "missing_asset_file", "error"),
+            ("3", "unknown_camera_move", "error"),
+            ("4", "content_policy_terms", "warning"),
+            ("4", "duplicate_shot", "error"),
+            ("4", "missing_asset_id", "warning"),
+        ])
+        self.assertFalse(report.ok)
+        self.assertEqual((report.errors, report.warnings), (4, 2))
+
+    def test_clean_storyboard_passes(self):
+        with mock.patch.object(Config, "KIE_API_KEY", "key"):
+            report = self.preflight.execute("VID1", [make_shot("1"), make_shot("2", camera_move="Zoom_In")])
+        self.assertTrue(report.ok)
+        self.assertEqual(report.problems, [])
+
+    def test_unreachable_public_url_is_a_storyboard_error(self):
+        self.preflight._check_public_url = lambda: "ConnectionError"
+        with mock.patch.object(Config, "KIE_API_KEY", "key"):
+            report = self.preflight.execute("VID1", [make_shot("1")])
+        self.assertEqual([(p.shot_id, p.code) for p in report.problems], [(None, "public_url_unreachable")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,339 @@
+import base64
+import logging
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters import fs_adapter as fs_module
+from adapters.duration_conformer import ConformResult
+from adapters.fs_adapter import FSAdapter
+from domain.entities import AssetMode, QualityTier, Shot, ShotEstado
+from domain.errors import ImageGenerationCancelled
+from infra.config import Config
+from usecases.fingerprint import ShotFingerprinter
+from usecases.process_shot import ProcessShot
+from usecases.process_storyboard import ProcessStoryboard
+from usecases.promote_shots import PromoteShots, ShotRef
+from usecases.shot_graph import ShotGraph
+from usecases.utils_prompt import PromptService
+
+PNG = "data:image/png;base64," + base64.b64encode(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32).decode()
+MP4 = "data:video/mp4;base64," + base64.b64encode(b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 32).decode()
+
+
+class FakeImageClient:
+    def __init__(self):
+        self.calls = 0
+        self.models = []
+
+    def generate(self, prompt, ref_image_url=None, model=None, resolution=None, cancel_event=None):
+        self.calls += 1
+        self.models.append(model)
+        return PNG
+
+
+class FakeVideoClient:
+    def __init__(self):
+        self.last_images = []
+
+    def generate(self, image_path, prompt, rehost=False, model=None, last_image_path=None):
+        self.last_images.append(last_image_path)
+        return MP4
+
+
+class ConcurrentImageClient(FakeImageClient):
+    """Only returns once two images are being generated at the same time."""
+    def __init__(self):
+        super().__init__()
+        self.barrier = threading.Barrier(2, timeout=5)
+        self.prompts = []
+
+    def generate(self, prompt, ref_image_url=None, model=None, resolution=None, cancel_event=None):
+        self.prompts.append(prompt)
+        self.barrier.wait()
+        return super().generate(prompt, ref_image_url, model, resolution)
+
+
+class FirstKeyframeFailsClient(FakeImageClient):
+    """The first keyframe fails; the last one polls until it is cancelled."""
+    def __init__(self):
+        super().__init__()
+        self.last_started = threading.Event()
+        self.cancelled = threading.Event()
+
+    def generate(self, prompt, ref_image_url=None, model=None, resolution=None, cancel_event=None):
+        if cancel_event is None:
+            self.last_started.wait(timeout=5)
+            raise RuntimeError("Nano Banana task failed")
+        self.last_started.set()
+        if cancel_event.wait(timeout=30):
+            self.cancelled.set()
+            raise ImageGenerationCancelled("no longer needed", retryable=False)
+        return super().generate(prompt, ref_image_url, model, resolution)
+
+
+class FakeFrameCache:
+    def __init__(self, frame_path):
+        self.frame_path = frame_path
+        self.videos = []
+
+    def last_frame(self, video_path):
+        self.videos.append(video_path)
+        return self.frame_path
+
+
+class TrimmingConformer:
+    """Writes a stand-in for the clip trimmed to duracion_seg."""
+    def conform(self, video_path, target_sec, output_path):
+        Path(output_path).write_bytes(Path(video_path).read_bytes())
+        return ConformResult(output_path, target_sec, "trimmed", 0.0)
+
+
+class FailingImageClient(FakeImageClient):
+    def __init__(self, failing_text):
+        super().__init__()
+        self.failing_text = failing_text
+
+    def generate(self, prompt, ref_image_url=None, model=None, resolution=None, cancel_event=None):
+        if self.failing_text in prompt:
+            raise RuntimeError("Nano Banana task failed")
+        return super().generate(prompt, ref_image_url, model, resolution)
+
+
+class OverlappingVideoClient(FakeVideoClient):
+    """The first video only returns once a second one has started."""
+    def __init__(self):
+        super().__init__()
+        self.second_started = threading.Event()
+
+    def generate(self, image_path, prompt, rehost=False, model=None, last_image_path=None):
+        first = not self.last_images
+        result = super().generate(image_path, prompt, rehost, model, last_image_path)
+        if first:
+            if not self.second_started.wait(timeout=5):
+                raise RuntimeError("Second video never started")
+        else:
+            self.second_started.set()
+        return result
+
+
+class NoAssets:
+    def get_asset(self, asset_id):
+        return None
+
+
+def make_shot(shot_id, **overrides):
+    data = dict(video_id="VID1", block_id="1", shot_id=shot_id, mv_context="LAB_WIDE",
+                descripcion_visual=f"Laboratorio {shot_id}", asset_mode=AssetMode.IMAGE_1F_VIDEO)
+    data.update(overrides)
+    return Shot(**data)
+
+
+class TestProcessStoryboard(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(fs_module, "ASSETS_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        logger = logging.getLogger("hintsly_test")
+        self.fs = FSAdapter()
+        self.images = FakeImageClient()
+        self.videos = FakeVideoClient()
+        fingerprinter = ShotFingerprinter(NoAssets())
+        process_shot = ProcessShot(self.fs, PromptService(), self.images, self.videos, logger, NoAssets(),
+                                   fingerprinter=fingerprinter)
+        self.storyboard = ProcessStoryboard(process_shot, self.fs, fingerprinter, logger, concurrency=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_unchanged_shots_are_skipped(self):
+        first = self.storyboard.execute("VID1", [make_shot("1"), make_shot("2")])
+        self.assertEqual((first.processed, first.skipped), (2, 0))
+        self.assertEqual(self.images.calls, 2)
+
+        second = self.storyboard.execute("VID1", [make_shot("1"), make_shot("2", camera_move="zoom_in")])
+        self.assertEqual((second.processed, second.skipped), (1, 1))
+        self.assertTrue(second.shots[0].skipped)
+        self.assertEqual(second.shots[0].shot.estado, ShotEstado.COMPLETADO)
+        self.assertEqual(self.images.calls, 3)
+
+        forced = self.storyboard.execute("VID1", [make_shot("1")], force=True)
+        self.assertEqual(forced.processed, 1)
+
+    def test_shots_with_broken_artifacts_are_reprocessed(self):
+        result = self.storyboard.execute("VID1", [make_shot("1")])
+        Path(result.shots[0].shot.video_path).write_text("Failed to download video")
+
+        again = self.storyboard.execute("VID1", [make_shot("1")])
+        self.assertEqual((again.processed, again.skipped), (1, 0))
+        self.assertTrue(self.fs.has_valid_artifacts(again.shots[0].shot))
+
+    def test_drafts_are_promoted_to_final(self):
+        draft = self.storyboard.execute("VID1", [make_shot("1", quality_tier=QualityTier.DRAFT)])
+        draft_shot = draft.shots[0].shot
+        self.assertEqual(Path(draft_shot.image_path).parent.name, "draft")
+        self.assertEqual(self.images.models, [Config.KIE_DRAFT_NANO_BANANA_MODEL])
+
+        promote = PromoteShots(self.storyboard, self.fs)
+        drafts, missing = promote.load_drafts("VID1", [ShotRef(block_id="1", shot_id="1"),
+                                                       ShotRef(block_id="1", shot_id="9")])
+        self.assertEqual([ref.shot_id for ref in missing], ["9"])
+        final = promote.execute("VID1", drafts).shots[0].shot
+        self.assertEqual(final.quality_tier, QualityTier.FINAL)
+        self.assertEqual(Path(final.image_path).parent.name, "shot_1")
+        self.assertEqual(self.images.models[-1], Config.KIE_NANO_BANANA_MODEL)
+
+        # The final render is what a FINAL storyboard run would produce: nothing left to do
+        rerun = self.storyboard.execute("VID1", [make_shot("1")])
+        self.assertEqual(rerun.skipped, 1)
+        self.assertTrue(Path(draft_shot.image_path).exists())
+
+    def test_two_frame_shots_generate_both_keyframes_concurrently(self):
+        images = ConcurrentImageClient()
+        process_shot = ProcessShot(self.fs, PromptService(), images, self.videos, logging.getLogger("hintsly_test"),
+                                   NoAssets())
+        shot = process_shot.execute(make_shot("1", asset_mode=AssetMode.IMAGE_2F_VIDEO, camera_move="zoom_in"))
+
+        self.assertEqual(shot.estado, ShotEstado.COMPLETADO, shot.error_message)
+        self.assertEqual(images.calls, 2)
+        self.assertTrue(shot.prompt_imagen_last.startswith(shot.prompt_imagen))
+        self.assertEqual(sorted(images.prompts), sorted([shot.prompt_imagen, shot.prompt_imagen_last]))
+        self.assertEqual(Path(shot.image_last_path).stem, "image_last")
+        self.assertEqual(self.videos.last_images, [shot.image_last_path])
+        self.assertTrue(self.fs.has_valid_artifacts(shot))
+
+        # A 2F result without its last keyframe (e.g. rendered before the mode existed) is not reusable
+        self.assertFalse(self.fs.has_valid_artifacts(shot.model_copy(update={"image_last_path": None})))
+
+    def test_failed_first_keyframe_cancels_the_last_one(self):
+        images = FirstKeyframeFailsClient()
+        process_shot = ProcessShot(self.fs, PromptService(), images, self.videos, logging.getLogger("hintsly_test"),
+                                   NoAssets())
+        started = time.monotonic()
+        shot = process_shot.execute(make_shot("1", asset_mode=AssetMode.IMAGE_2F_VIDEO, camera_move="zoom_in"))
+
+        self.assertEqual(shot.estado, ShotEstado.ERROR)
+        self.assertIn("Nano Banana task failed", shot.error_message)
+        self.assertLess(time.monotonic() - started, 5)  # not blocked on the last keyframe's poll
+        self.assertTrue(images.cancelled.wait(timeout=5))
+
+    def test_continuity_shots_start_from_the_previous_last_frame(self):
+        frame = Path(self.tmp.name) / "frame.png"
+        frame.write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+        self.storyboard.frame_cache = FakeFrameCache(str(frame))
+        shots = lambda first_desc: [make_shot("1", descripcion_visual=first_desc),
+                                    make_shot("2", continuity=True), make_shot("3", continuity=True),
+                                    make_shot("4", block_id="2", continuity=True)]
+
+        result = self.storyboard.execute("VID1", shots("Laboratorio"))
+        self.assertEqual(result.processed, 4)
+        by_id = {o.shot.block_id + "/" + o.shot.shot_id: o.shot for o in result.shots}
+        self.assertEqual([by_id["1/2"].continuity_from, by_id["1/3"].continuity_from], ["1", "2"])
+        self.assertIsNone(by_id["2/4"].continuity_from)  # first of its block: own keyframe
+        self.assertEqual(self.images.calls, 2)
+        self.assertEqual(self.storyboard.frame_cache.videos, [by_id["1/1"].video_path, by_id["1/2"].video_path])
+
+        # Editing the first shot regenerates the shots that continue it, not the other block
+        again = self.storyboard.execute("VID1", shots("Laboratorio nocturno"))
+        self.assertEqual([o.skipped for o in again.shots], [False, False, False, True])
+
+    def test_continuity_starts_from_the_trimmed_clip(self):
+        frame = Path(self.tmp.name) / "frame.png"
+        frame.write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+        self.storyboard.frame_cache = FakeFrameCache(str(frame))
+        self.storyboard.process_shot.duration_conformer = TrimmingConformer()
+
+        result = self.storyboard.execute("VID1", [make_shot("1", duracion_seg=3.0), make_shot("2", continuity=True)])
+        first = result.shots[0].shot
+        self.assertTrue(first.video_conformed_path)
+        # The frame the cut actually ends on, not the last frame of the untrimmed video
+        self.assertEqual(self.storyboard.frame_cache.videos, [first.video_conformed_path])
+        self.assertEqual(result.shots[1].shot.continuity_from, "1")
+
+    def test_a_failed_shot_only_cancels_its_dependents(self):
+        self.storyboard.frame_cache = FakeFrameCache(None)
+        self.storyboard.process_shot.image_client = FailingImageClient("Roto")
+        shots = [make_shot("1", descripcion_visual="Roto"), make_shot("2", continuity=True),
+                 make_shot("3", continuity=True), make_shot("4", block_id="2"), make_shot("5")]
+
+        result = self.storyboard.execute("VID1", shots)
+        self.assertEqual([o.shot.estado for o in result.shots],
+                         [ShotEstado.ERROR, ShotEstado.ERROR, ShotEstado.ERROR, ShotEstado.COMPLETADO,
+                          ShotEstado.COMPLETADO])
+        self.assertIn("Depends on shot 1", result.shots[2].shot.error_message)
+        self.assertEqual((result.processed, result.failed), (2, 3))
+
+    def test_shots_with_the_same_image_inputs_share_one_keyframe(self):
+        self.storyboard.process_shot.video_client = OverlappingVideoClient()
+        shots = [make_shot("1", descripcion_visual="Laboratorio", camera_move="zoom_in"),
+                 make_shot("2", descripcion_visual="Laboratorio", camera_move="pan_left")]
+
+        result = self.storyboard.execute("VID1", shots)
+        self.assertEqual(result.processed, 2)
+        leader, follower = result.shots[0].shot, result.shots[1].shot
+        self.assertEqual(self.images.calls, 1)
+        self.assertEqual(follower.keyframe_from, "1")
+        self.assertTrue(Path(follower.image_path).samefile(leader.image_path))
+        # The videos overlapped: shot 2 did not wait for shot 1's video (else the first call fails)
+        self.assertEqual(leader.estado, ShotEstado.COMPLETADO, leader.error_message)
+
+        # Regenerating the shared image replaces the leader's file without touching the follower's
+        before = Path(follower.image_path).read_bytes()
+        self.fs.save_image(leader, "data:image/png;base64," + base64.b64encode(b"new").decode())
+        self.assertEqual(Path(leader.image_path).read_bytes(), b"new")
+        self.assertEqual(Path(follower.image_path).read_bytes(), before)
+
+    def test_template_version_is_part_of_the_fingerprint(self):
+        fingerprinter = ShotFingerprinter(NoAssets())
+        before = fingerprinter.fingerprint(make_shot("1"))
+        with mock.patch.object(PromptService, "TEMPLATE_VERSION", "test"):
+            self.assertNotEqual(fingerprinter.fingerprint(make_shot("1")), before)
+        self.assertEqual(fingerprinter.fingerprint(make_shot("1", estado=ShotEstado.ERROR)), before)
+
+
+class TestShotGraph(unittest.TestCase):
+    def test_continuity_edges_follow_block_order(self):
+        shots = [make_shot("1"), make_shot("2", block_id="2"), make_shot("3", continuity=True),
+                 make_shot("4", block_id="2", continuity=True)]
+        graph = ShotGraph.from_storyboard(shots)
+        self.assertEqual(graph.continues, {2: 0, 3: 1})
+        self.assertEqual(graph.descendants(0), {2})
+
+    def test_longest_chain_starts_first(self):
+        # Shots 0 and 1 are independent; 2 -> 3 is the critical path
+        graph = ShotGraph(4)
+        graph.add_edge(2, 3)
+        durations = [10, 10, 10, 10]
+        self.assertEqual(graph.critical_path(durations), [10, 10, 20, 10])
+        # Storyboard order would run 0 and 1 first and finish at 30; starting 2 first finishes at 20
+        self.assertEqual(graph.makespan(durations, 2), 20)
+        self.assertEqual(graph.makespan(durations, 1), 40)
+
+    def test_image_edges_release_children_at_the_image(self):
+        shots = [make_shot("1", descripcion_visual="Lab"), make_shot("2", descripcion_visual="Lab"),
+                 make_shot("3", descripcion_visual="Lab", asset_mode=AssetMode.IMAGE_2F_VIDEO)]
+        graph = ShotGraph.from_storyboard(shots, share_keyframes=True)
+        self.assertEqual(graph.shares_keyframe, {1: 0})  # 2F shots need a keyframe pair of their own
+        self.assertEqual(graph.image_edges, {(0, 1)})
+        self.assertEqual(ShotGraph.from_storyboard(shots).shares_keyframe, {})
+        self.assertEqual(graph.makespan([30, 20, 30], 3, image_durations=[10, 0, 10]), 30)
+
+    def test_cycles_are_rejected(self):
+        graph = ShotGraph(2)
+        graph.add_edge(0, 1)
+        graph.add_edge(1, 0)
+        with self.assertRaises(ValueError):
+            graph.topological_order()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from starlette.applications import Starlette
+
+from adapters.reference_host import ReferenceHost, load_signing_key
+from infra.config import Config
+from infra.metrics import metrics
+from infra.paths import ASSETS_DIR
+from infra.static_files import PublicStaticFiles
+
+
+def parse_ref_url(url):
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    return parsed.path.rsplit("/", 1)[-1], int(query["exp"][0]), query["sig"][0]
+
+
+class TestReferenceHost(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.image = root / "keyframe.png"
+        self.image.write_bytes(b"fake png bytes")
+        self.host = ReferenceHost(hosted_dir=str(root / "refs"), public_base_url="https://engine.test",
+                                  secret="secret", ttl_sec=3600, min_remaining_sec=60, verify_reachable=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_same_content_reuses_url(self):
+        first = self.host.url_for(str(self.image))
+        copy = Path(self.tmp.name) / "copy.png"
+        copy.write_bytes(self.image.read_bytes())
+        self.assertEqual(self.host.url_for(str(copy)), first)
+        self.assertTrue(first.startswith("https://engine.test/refs/"))
+
+    def test_signed_url_resolves_to_hosted_file(self):
+        name, exp, sig = parse_ref_url(self.host.url_for(str(self.image)))
+        hosted = self.host.resolve(name, exp, sig)
+        self.assertIsNotNone(hosted)
+        self.assertEqual(hosted.read_bytes(), b"fake png bytes")
+
+        self.assertIsNone(self.host.resolve(name, exp, "0" * 32))
+        self.assertIsNone(self.host.resolve(name, int(time.time()) - 1, sig))
+
+    def test_expiring_url_is_not_reused(self):
+        host = ReferenceHost(hosted_dir=self.host.hosted_dir, public_base_url="https://engine.test",
+                             secret="secret", ttl_sec=30, min_remaining_sec=60, verify_reachable=False)
+        metrics.reset()
+        host.url_for(str(self.image))
+        host.url_for(str(self.image))
+        self.assertEqual(metrics.counter("refs.url_cache", result="miss"), 2)
+
+
+class TestSigningKey(unittest.TestCase):
+    def test_random_key_is_generated_once_and_kept(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cache" / "reference_signing.key"
+            key = load_signing_key(str(path))
+            self.assertEqual(len(key), 64)
+            self.assertEqual(path.stat().st_mode & 0o777, 0o600)
+            self.assertEqual(load_signing_key(str(path)), key)
+            self.assertNotEqual(load_signing_key(str(Path(tmp) / "other.key")), key)
+
+    def test_kie_api_key_is_never_the_signing_key(self):
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.multiple(Config, KIE_API_KEY="kie-secret", REFERENCE_SIGNING_KEY=None,
+                                    REFERENCE_SIGNING_KEY_PATH=str(Path(tmp) / "reference_signing.key")):
+            host = ReferenceHost(hosted_dir=tmp, public_base_url="https://engine.test")
+            self.assertNotEqual(host.secret, b"kie-secret")
+            self.assertEqual(host.secret, load_signing_key(Config.REFERENCE_SIGNING_KEY_PATH).encode("utf-8"))
+
+
+def get_status(app, path):
+    """Status code of a GET through the ASGI app."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    # spec 2.4: the file is sent without waiting for a client disconnect
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+             "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": b"", "headers": [], "server": ("engine.test", 80), "client": ("127.0.0.1", 1234)}
+    asyncio.run(app(scope, receive, send))
+    return next(m["status"] for m in messages if m["type"] == "http.response.start")
+
+
+class TestPublicAssets(unittest.TestCase):
+    def test_hidden_paths_are_not_served(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / ".cache" / "refs").mkdir(parents=True)
+            (root / ".cache" / "refs" / "abc.png").write_bytes(b"hosted reference")
+            (root / ".cache" / "catalog.idx").write_bytes(b"index")
+            (root / "videos").mkdir()
+            (root / "videos" / "image.png").write_bytes(b"keyframe")
+            app = Starlette()
+            app.mount("/assets", PublicStaticFiles(directory=tmp), name="assets")
+
+            self.assertEqual(get_status(app, "/assets/videos/image.png"), 200)
+            self.assertEqual(get_status(app, "/assets/.cache/refs/abc.png"), 404)
+            self.assertEqual(get_status(app, "/assets/.cache/catalog.idx"), 404)
+            self.assertEqual(get_status(app, "/assets/videos/../.cache/catalog.idx"), 404)
+
+    def test_default_cache_is_hidden_from_the_served_directory(self):
+        cache = Path(Config.CACHE_DIR).resolve()
+        if ASSETS_DIR.resolve() in cache.parents:
+            # Persisted with the assets volume, under a path /assets refuses to serve
+            self.assertTrue(any(p.startswith(".") for p in cache.relative_to(ASSETS_DIR.resolve()).parts))
+
+
+if __name__ == '__main__':
+    unittest.main()
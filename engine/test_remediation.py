@@ -0,0 +1,83 @@
+import logging
+import sys
+import unittest
+from pathlib import Path
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from domain.errors import ImageGenerationError
+from domain.failures import FailureCategory, KieFailure, classify_failure
+from infra import retry as retry_module
+from infra.retry import RetryBudget, RetryPolicy
+from usecases.remediation import FailureRemediator, FailureStats
+from usecases.utils_prompt import PromptService
+
+
+def kie_failure(code, msg):
+    failure = KieFailure(source="image", fail_code=code, fail_msg=msg, category=classify_failure(code, msg))
+    return ImageGenerationError(f"Kie.ai task failed [{code}]: {msg}", failure=failure)
+
+
+class TestRemediation(unittest.TestCase):
+    def setUp(self):
+        retry_module.retry_budget = RetryBudget(global_limit=100, window_sec=60, scope_limit=100)
+        self.stats = FailureStats()
+        self.remediator = FailureRemediator(
+            PromptService(),
+            logging.getLogger("hintsly_test"),
+            max_rounds=2,
+            policy=RetryPolicy(base_delay=0, max_delay=0),
+            stats=self.stats,
+        )
+
+    def test_classify_failure(self):
+        self.assertEqual(classify_failure("422", "Your media file is unavailable, please replace it."),
+                         FailureCategory.BAD_REFERENCE)
+        self.assertEqual(classify_failure("400", "Prompt flagged by safety policy"), FailureCategory.CONTENT_POLICY)
+        self.assertEqual(classify_failure("", "Server busy, try again later"), FailureCategory.CAPACITY)
+        self.assertEqual(classify_failure("500", "Internal server error"), FailureCategory.INTERNAL)
+        self.assertEqual(classify_failure(None, "???"), FailureCategory.UNKNOWN)
+
+    def test_content_policy_sanitizes_and_resubmits(self):
+        prompts = []
+
+        def attempt(prompt, rehost):
+            prompts.append(prompt)
+            if len(prompts) == 1:
+                raise kie_failure("400", "Content policy violation")
+            return "data:image/png;base64,AAA"
+
+        result, final_prompt = self.remediator.run("image", attempt, "A bloody knife on a dining table")
+        self.assertEqual(result, "data:image/png;base64,AAA")
+        self.assertNotIn("bloody", final_prompt)
+        self.assertNotIn("knife", final_prompt)
+        self.assertEqual(self.stats.snapshot()["categories"]["CONTENT_POLICY"]["recovered"], 1)
+
+    def test_bad_reference_is_rehosted(self):
+        rehost_flags = []
+
+        def attempt(prompt, rehost):
+            rehost_flags.append(rehost)
+            if not rehost:
+                raise kie_failure("422", "Your media file is unavailable, please replace it.")
+            return "ok"
+
+        self.remediator.run("image", attempt, "A wide shot of the lab")
+        self.assertEqual(rehost_flags, [False, True])
+
+    def test_internal_errors_give_up_immediately(self):
+        calls = []
+
+        def attempt(prompt, rehost):
+            calls.append(1)
+            raise kie_failure("500", "Internal server error")
+
+        with self.assertRaises(ImageGenerationError):
+            self.remediator.run("image", attempt, "A wide shot of the lab")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.stats.snapshot()["categories"]["INTERNAL"]["gave_up"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import requests
+from urllib3.exceptions import NewConnectionError
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters import gemini_client, veo_client
+from domain.errors import ImageGenerationError, RetryBudgetExceeded
+from infra.metrics import metrics
+from infra import retry as retry_module
+from infra.retry import ErrorKind, RetryBudget, RetryPolicy, classify_error, retry, retry_scope
+
+
+class TestRetry(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.policy = RetryPolicy(attempts=3, base_delay=0, max_delay=0)
+        # Fresh, generous budget for every test
+        retry_module.retry_budget = RetryBudget(global_limit=100, window_sec=60, scope_limit=100)
+
+    def test_classify_error(self):
+        self.assertEqual(classify_error(requests.Timeout()), ErrorKind.TRANSIENT)
+        self.assertEqual(classify_error(ImageGenerationError("busy", status_code=429)), ErrorKind.TRANSIENT)
+        self.assertEqual(classify_error(ImageGenerationError("boom", status_code=503)), ErrorKind.TRANSIENT)
+        self.assertEqual(classify_error(ImageGenerationError("bad", status_code=400)), ErrorKind.PERMANENT)
+        self.assertEqual(classify_error(ImageGenerationError("task failed")), ErrorKind.PERMANENT)
+        self.assertEqual(classify_error(ValueError("invalid")), ErrorKind.PERMANENT)
+
+    def test_submissions_are_only_retried_if_not_sent(self):
+        refused = requests.ConnectionError(mock.Mock(reason=NewConnectionError(None, "Connection refused")))
+        self.assertEqual(classify_error(requests.ConnectTimeout(), idempotent=False), ErrorKind.TRANSIENT)
+        self.assertEqual(classify_error(refused, idempotent=False), ErrorKind.TRANSIENT)
+        self.assertEqual(classify_error(requests.ReadTimeout(), idempotent=False), ErrorKind.PERMANENT)
+        self.assertEqual(classify_error(requests.ConnectionError("reset"), idempotent=False), ErrorKind.PERMANENT)
+        self.assertEqual(classify_error(ImageGenerationError("busy", status_code=429), idempotent=False),
+                         ErrorKind.TRANSIENT)
+        self.assertEqual(classify_error(requests.ReadTimeout()), ErrorKind.TRANSIENT)
+
+    def test_read_timeout_on_submit_is_not_retried(self):
+        image = gemini_client.KieNanoBananaClient()
+        veo = veo_client.VeoClient(reference_host=mock.Mock())
+        submissions = [
+            (gemini_client, lambda: image._create_task("A lab", None, "nano-banana-pro", "1K")),
+            (veo_client, lambda: veo._submit_job(["https://engine.test/refs/a.png"], "A lab", "veo3_fast")),
+        ]
+        timeout = requests.ReadTimeout("read timed out")
+        for module, submit in submissions:
+            with mock.patch.object(module.requests, "post", side_effect=timeout) as post, \
+                    mock.patch.object(retry_module.time, "sleep"):
+                with self.assertRaises(requests.ReadTimeout):
+                    submit()
+            self.assertEqual(post.call_count, 1)  # the task may exist already: never sent twice
+
+        ok = mock.Mock(status_code=200, json=lambda: {"code": 200, "data": {"taskId": "task-1"}})
+        with mock.patch.object(gemini_client.requests, "post", side_effect=[requests.ConnectTimeout(), ok]) as post, \
+                mock.patch.object(retry_module.time, "sleep"):
+            self.assertEqual(image._create_task("A lab", None, "nano-banana-pro", "1K"), "task-1")
+        self.assertEqual(post.call_count, 2)
+
+    def test_transient_errors_are_retried(self):
+        calls = []
+
+        @retry(policy=self.policy, name="test.op")
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise requests.ConnectionError("reset")
+            return "ok"
+
+        self.assertEqual(flaky(), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(metrics.counter("retry.attempts", op="test.op", kind="transient"), 2)
+
+    def test_permanent_errors_are_not_retried(self):
+        calls = []
+
+        @retry(policy=self.policy, name="test.op")
+        def broken():
+            calls.append(1)
+            raise ImageGenerationError("Kie.ai task failed", status_code=400)
+
+        with self.assertRaises(ImageGenerationError):
+            broken()
+        self.assertEqual(len(calls), 1)
+
+    def test_shot_budget_stops_retries(self):
+        retry_module.retry_budget = RetryBudget(global_limit=100, window_sec=60, scope_limit=1)
+        policy = RetryPolicy(attempts=10, base_delay=0, max_delay=0)
+
+        @retry(policy=policy, name="test.op")
+        def always_down():
+            raise requests.Timeout("timeout")
+
+        with retry_scope("video/B01/P01"):
+            with self.assertRaises(RetryBudgetExceeded):
+                always_down()
+
+    def test_async_functions_are_supported(self):
+        calls = []
+
+        @retry(policy=self.policy, name="test.async")
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 2:
+                raise requests.Timeout("timeout")
+            return "ok"
+
+        self.assertEqual(asyncio.run(flaky()), "ok")
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from PIL import Image
+
+from adapters.variant_cache import VariantCache, target_box
+from infra.metrics import metrics
+
+
+class TestVariantCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.source = root / "HL_Core_Lab_Isometric_Main_v01.png"
+        # Noisy image so PNG compression cannot make the original small
+        Image.effect_noise((2400, 1600), 64).convert("RGB").save(self.source)
+        self.cache = VariantCache(cache_dir=str(root / "variants"), workers=1, quality=85)
+
+    def tearDown(self):
+        self.cache.shutdown()
+        self.tmp.cleanup()
+
+    def test_target_box(self):
+        self.assertEqual(target_box("1K", "16:9"), (1024, 576))
+        self.assertEqual(target_box("2K", "9:16"), (1152, 2048))
+
+    def test_variant_is_downscaled_and_cached(self):
+        metrics.reset()
+        variant = Path(self.cache.variant_for(str(self.source), "1K", "16:9"))
+        self.assertNotEqual(variant, self.source)
+        self.assertLess(variant.stat().st_size, self.source.stat().st_size)
+        with Image.open(variant) as img:
+            self.assertEqual(img.format, "JPEG")
+            self.assertEqual(img.size, (1024, 683))
+
+        self.assertEqual(self.cache.variant_for(str(self.source), "1K", "16:9"), str(variant))
+        self.assertEqual(metrics.counter("variants.cache", result="hit"), 1)
+
+    def test_edited_source_gets_new_variant(self):
+        first = self.cache.variant_for(str(self.source), "1K", "16:9")
+        Image.effect_noise((2000, 2000), 64).convert("RGB").save(self.source)
+        second = self.cache.variant_for(str(self.source), "1K", "16:9")
+        self.assertNotEqual(first, second)
+        with Image.open(second) as img:
+            self.assertEqual(img.size, (1024, 1024))
+
+    def test_small_source_is_used_as_is(self):
+        small = Path(self.tmp.name) / "icon.jpg"
+        Image.new("RGB", (64, 64), "white").save(small, quality=50)
+        self.assertEqual(self.cache.variant_for(str(small), "1K", "16:9"), str(small))
+        self.assertEqual(self.cache.variant_for(str(small), "1K", "16:9"), str(small))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import logging
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# Add engine to path
+sys.path.append(str(Path(__file__).parent))
+
+from adapters import fs_adapter as fs_module
+from adapters.ffmpeg_adapter import FFmpegAdapter
+from adapters.fs_adapter import FSAdapter
+from adapters.video_qc import QCReport, VideoQC, evaluate, frame_stats
+from domain.entities import Shot, ShotEstado
+from infra.config import Config
+from test_process_storyboard import FakeImageClient, FakeVideoClient, NoAssets
+from usecases.process_shot import ProcessShot
+from usecases.utils_prompt import PromptService
+
+
+def moving(frames=24, height=90, width=160, seed=0) -> np.ndarray:
+    """Textured frames drifting one pixel per frame."""
+    texture = np.random.default_rng(seed).integers(40, 216, (height, width + frames), dtype=np.uint8)
+    return np.stack([texture[:, i:i + width] for i in range(frames)])
+
+
+class TestFrameStats(unittest.TestCase):
+    def test_normal_motion_passes(self):
+        self.assertEqual(evaluate(frame_stats(moving())), ())
+
+    def test_black_frozen_and_flickering_clips_fail(self):
+        black = np.zeros((24, 90, 160), dtype=np.uint8)
+        self.assertTrue(any("black frames" in r for r in evaluate(frame_stats(black))))
+
+        frozen = np.repeat(moving()[:1], 24, axis=0)
+        stats = frame_stats(frozen)
+        self.assertEqual(stats["temporal_var"], 0.0)
+        self.assertEqual(evaluate(stats), ("frozen motion (median frame difference 0.00)",))
+
+        flicker = moving().astype(np.int16)
+        flicker[::2] += 30
+        reasons = evaluate(frame_stats(np.clip(flicker, 0, 255).astype(np.uint8)))
+        self.assertEqual(len(reasons), 1)
+        self.assertIn("flicker", reasons[0])
+
+
+@unittest.skipUnless(shutil.which(Config.FFMPEG_BIN), "ffmpeg not installed")
+class TestVideoQC(unittest.TestCase):
+    def encode(self, frames: np.ndarray, path: Path) -> str:
+        rgb = (np.repeat(f[:, :, None], 3, axis=2).tobytes() for f in frames)
+        return FFmpegAdapter().encode_rgb_frames(rgb, frames.shape[2], frames.shape[1], 12, str(path))
+
+    def test_sampled_frames_from_the_video(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            good = self.encode(moving(frames=36, height=180, width=320), Path(tmp) / "good.mp4")
+            report = VideoQC(sample_fps=4).check(good)
+            self.assertTrue(report.passed, report.reasons)
+            self.assertAlmostEqual(report.stats["frames"], 12, delta=1)
+
+            black = self.encode(np.full((36, 180, 320), 4, dtype=np.uint8), Path(tmp) / "black.mp4")
+            report = VideoQC(sample_fps=4).check(black)
+            self.assertFalse(report.passed)
+            self.assertIn("black frames (100% of samples)", report.reasons)
+
+
+class FailingOnceQC:
+    def __init__(self):
+        self.videos = []
+
+    def check(self, video_path):
+        self.videos.append(video_path)
+        if len(self.videos) == 1:
+            return QCReport(("frozen motion (median frame difference 0.00)",), {"motion": 0.0})
+        return QCReport((), {"motion": 3.0})
+
+
+class TestProcessShotQC(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(fs_module, "ASSETS_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.videos = FakeVideoClient()
+        self.qc = FailingOnceQC()
+        self.process_shot = ProcessShot(FSAdapter(), PromptService(), FakeImageClient(), self.videos,
+                                        logging.getLogger("hintsly_test"), NoAssets(), video_qc=self.qc)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_shot(self):
+        return Shot(video_id="VID1", block_id="1", shot_id="1", mv_context="LAB_WIDE", descripcion_visual="Lab")
+
+    def test_failing_video_is_flagged(self):
+        with mock.patch.object(Config, "QC_ACTION", "flag"):
+            shot = self.process_shot.execute(self.make_shot())
+        self.assertEqual(shot.estado, ShotEstado.COMPLETADO, shot.error_message)
+        self.assertFalse(shot.qc_passed)
+        self.assertEqual(shot.qc_reasons, ["frozen motion (median frame difference 0.00)"])
+        self.assertEqual(len(self.videos.last_images), 1)
+
+    def test_failing_video_is_generated_again(self):
+        with mock.patch.multiple(Config, QC_ACTION="requeue", QC_MAX_REQUEUES=1):
+            shot = self.process_shot.execute(self.make_shot())
+        self.assertTrue(shot.qc_passed)
+        self.assertIsNone(shot.qc_reasons)
+        self.assertEqual(len(self.videos.last_images), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,351 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from adapters.ffmpeg_adapter import TRANSITIONS, FFmpegAdapter, Span
+from adapters.logger import Logger
+from adapters.media_verifier import Mp4Scanner, VideoInfo, audio_format, video_format
+from domain.entities import QualityTier, Shot, ShotEstado
+from domain.errors import MediaProcessingError
+from infra.config import Config
+from infra.metrics import metrics
+from usecases.promote_shots import ShotRef
+
+logger = Logger()
+
+
+class AssemblyResult(BaseModel):
+    """Result of assembling the shot videos of a video into one file"""
+    video_id: str
+    quality_tier: QualityTier
+    video_path: str
+    duration_sec: float
+    shots: int
+    blocks_rebuilt: List[str] = []
+    blocks_reused: List[str] = []  # block intermediates unchanged since the last assembly
+    normalized: Dict[str, str] = {}  # "block/shot" -> what was rewritten so it could be stream-copied
+    missing: List[ShotRef] = []  # shots without a completed video, left out of the cut
+    transition: Optional[str] = None
+    windows_encoded: int = 0  # transition windows re-encoded by this run (the rest were cached)
+    elapsed_sec: float
+
+
+class Segment(NamedTuple):
+    shot: Shot
+    path: str  # the shot's video, or its normalized copy
+    info: VideoInfo
+
+
+def natural_key(value: str) -> tuple:
+    """Orders ids numerically when they are numbers ("2" before "10")."""
+    return (0, int(value), "") if value.isdigit() else (1, 0, value)
+
+
+def file_key(path: str) -> str:
+    """Cheap identity of a file's content: a regenerated video is a new file (new size / mtime)."""
+    st = os.stat(path)
+    return f"{path}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def clip_path(shot: Shot) -> Optional[str]:
+    """The shot's video conformed to duracion_seg when there is one, the video as generated otherwise."""
+    if shot.video_conformed_path and os.path.isfile(shot.video_conformed_path):
+        return shot.video_conformed_path
+    return shot.video_path
+
+
+class AssembleVideo:
+    """
+    Joins the completed shot videos of a video (conformed to duracion_seg when they were), ordered
+    by block and shot id, into one mp4 without re-encoding: the concat demuxer copies the streams.
+    This needs every clip in one format, so the most common video format (codec, size, frame rate)
+    and audio layout become the target and only the clips that differ are rewritten: re-encoded when
+    the picture differs, remuxed with a silent or converted audio track when only the sound does
+    (e.g. locally rendered moves next to Veo clips).
+
+    Each block is joined into an intermediate file, kept with the key of its inputs (size and mtime
+    of every clip), so after regenerating one shot only its block is joined again before the final
+    concatenation of the blocks.
+
+    With a `transition` (an xfade name, ASSEMBLY_TRANSITION by default) cuts are smart-rendered:
+    only the window around each cut, from the last keyframe before the fade in the outgoing clip to
+    the first keyframe after it in the incoming one, is re-encoded (windows in parallel, each cached
+    by its inputs); everything between two windows is cut at those keyframes and stream-copied. The
+    cost grows with the number of cuts, not with the length of the video.
+    """
+
+    def __init__(self, fs, ffmpeg: Optional[FFmpegAdapter] = None, workers: Optional[int] = None):
+        self.fs = fs
+        self.ffmpeg = ffmpeg or FFmpegAdapter()
+        self.scanner = Mp4Scanner()
+        self.workers = workers or Config.ASSEMBLY_WORKERS
+        self._locks: Dict[Tuple[str, QualityTier], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def load_shots(self, video_id: str,
+                   tier: QualityTier = QualityTier.FINAL) -> Tuple[List[Shot], List[ShotRef]]:
+        """Shots with a completed video in cut order, and the refs of the shots without one."""
+        shots, missing = [], []
+        for shot in self.fs.list_metadata(video_id, tier):
+            path = clip_path(shot)
+            if shot.estado == ShotEstado.COMPLETADO and path and os.path.isfile(path):
+                shots.append(shot)
+            else:
+                missing.append(ShotRef(block_id=shot.block_id, shot_id=shot.shot_id))
+        order = lambda ref: (natural_key(ref.block_id), natural_key(ref.shot_id))
+        return sorted(shots, key=order), sorted(missing, key=order)
+
+    def execute(self, video_id: str, shots: List[Shot], missing: Sequence[ShotRef] = (),
+                tier: QualityTier = QualityTier.FINAL, transition: Optional[str] = None,
+                transition_sec: Optional[float] = None) -> AssemblyResult:
+        transition = (transition or Config.ASSEMBLY_TRANSITION).strip().lower()
+        if transition == "none":
+            transition = None
+        elif transition not in TRANSITIONS:
+            raise ValueError(f"Unknown transition '{transition}', expected none or one of {', '.join(TRANSITIONS)}")
+        fade = transition_sec or Config.ASSEMBLY_TRANSITION_SEC
+        with self._lock(video_id, tier):
+            return self._assemble(video_id, shots, list(missing), tier, transition, fade)
+
+    def _lock(self, video_id: str, tier: QualityTier) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault((video_id, tier), threading.Lock())
+
+    def _assemble(self, video_id: str, shots: List[Shot], missing: List[ShotRef], tier: QualityTier,
+                  transition: Optional[str], fade: float) -> AssemblyResult:
+        started = time.monotonic()
+        work_dir = self.fs.assembly_dir(video_id, tier)
+        os.makedirs(work_dir / "segments", exist_ok=True)
+        manifest_path = work_dir / "manifest.json"
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            manifest = {}
+
+        segments = self._scan(shots)
+        video_target = Counter(video_format(s.info) for s in segments).most_common(1)[0][0]
+        audio_formats = Counter(audio_format(s.info) for s in segments if s.info.audio)
+        audio_target = audio_formats.most_common(1)[0][0] if audio_formats else None
+        segments, normalized = self._normalize(segments, video_target, audio_target, work_dir / "segments")
+        join = Join(work_dir, transition, fade, video_target, audio_target)
+
+        blocks: Dict[str, List[Segment]] = {}
+        for segment in segments:
+            blocks.setdefault(segment.shot.block_id, []).append(segment)
+        block_keys, files, rebuilt, reused = {}, {}, [], []
+        for block_id, block in blocks.items():
+            key = digest([[s.shot.shot_id, file_key(s.path)] for s in block] + join.settings)
+            block_path = work_dir / f"block_{block_id}.mp4"
+            if manifest.get("blocks", {}).get(block_id) == key and block_path.exists():
+                reused.append(block_id)
+                files[block_id] = manifest.get("files", {}).get(block_id, [])
+            else:
+                files[block_id] = self._join(join, [(s.path, s.info.duration_sec) for s in block], block_path)
+                rebuilt.append(block_id)
+            block_keys[block_id] = key
+        metrics.incr("assembly.blocks", len(rebuilt), result="rebuilt")
+        metrics.incr("assembly.blocks", len(reused), result="reused")
+
+        output_path = work_dir / "video.mp4"
+        video_key = digest(list(block_keys.items()) + join.settings)
+        if manifest.get("video") != video_key or not output_path.exists():
+            block_paths = [str(work_dir / f"block_{b}.mp4") for b in blocks]
+            files[""] = self._join(join, [(p, self._duration(p)) for p in block_paths], output_path)
+        else:
+            files[""] = manifest.get("files", {}).get("", [])
+        manifest_path.write_text(json.dumps({"blocks": block_keys, "video": video_key, "files": files}, indent=2),
+                                 encoding="utf-8")
+        self._remove_stale(work_dir, blocks, segments, files)
+
+        problems, info = self.scanner.scan(str(output_path))
+        if problems or info is None:
+            raise MediaProcessingError(f"Assembled video {output_path} is invalid: {'; '.join(problems)}")
+        elapsed = time.monotonic() - started
+        metrics.observe("assembly.seconds", elapsed)
+        logger.info(f"🎞️ Assembled {video_id} ({tier.value}): {len(segments)} shots, {info.duration_sec:.1f}s, "
+                    f"{len(rebuilt)} blocks joined, {len(normalized)} clips normalized, "
+                    f"{join.encoded} transition windows encoded in {elapsed:.1f}s")
+        return AssemblyResult(video_id=video_id, quality_tier=tier, video_path=str(output_path),
+                              duration_sec=round(info.duration_sec, 3), shots=len(segments),
+                              blocks_rebuilt=rebuilt, blocks_reused=reused, normalized=normalized,
+                              missing=missing, transition=transition, windows_encoded=join.encoded,
+                              elapsed_sec=round(elapsed, 3))
+
+    def _scan(self, shots: List[Shot]) -> List[Segment]:
+        segments, invalid = [], []
+        for shot in shots:
+            try:
+                problems, info = self.scanner.scan(clip_path(shot))
+            except OSError as e:
+                problems, info = [str(e)], None
+            if problems or info is None:
+                invalid.append(f"{shot.block_id}/{shot.shot_id} ({'; '.join(problems) or 'no video track'})")
+            else:
+                segments.append(Segment(shot, clip_path(shot), info))
+        if invalid:
+            # Leaving them out would silently shorten the cut: regenerate them first
+            raise MediaProcessingError(f"Invalid shot videos: {', '.join(invalid)}")
+        return segments
+
+    def _normalize(self, segments: List[Segment], video_target: Tuple[str, int, int, float],
+                   audio_target: Optional[Tuple[str, int, int]],
+                   segments_dir: Path) -> Tuple[List[Segment], Dict[str, str]]:
+        """Rewrites the clips that differ from the target format (in parallel, reusing earlier rewrites)."""
+        jobs, normalized = {}, {}
+        for i, segment in enumerate(segments):
+            video = video_target if video_format(segment.info) != video_target else None
+            audio = audio_format(segment.info)
+            if audio_target is None or audio == audio_target:
+                audio_action = "copy"
+            else:
+                audio_action = "silence" if audio is None else "encode"
+            if video is None and audio_action == "copy":
+                continue
+            key = digest([file_key(segment.path), video, audio_target, audio_action,
+                          Config.ASSEMBLY_CRF, Config.ASSEMBLY_PRESET])
+            path = segments_dir / f"{segment.shot.block_id}_{segment.shot.shot_id}.{key}.mp4"
+            changes = []
+            if video:
+                changes.append(f"video re-encoded to {video[0]} {video[1]}x{video[2]}@{video[3]:g}")
+            if audio_action != "copy":
+                changes.append("silent audio added" if audio_action == "silence" else
+                               f"audio converted to {'/'.join(map(str, audio_target))}")
+            normalized[f"{segment.shot.block_id}/{segment.shot.shot_id}"] = ", ".join(changes)
+            jobs[i] = (segment, str(path), video, audio_action)
+
+        def run(job):
+            segment, path, video, audio_action = job
+            if not os.path.exists(path):
+                self.ffmpeg.normalize(segment.path, path, video, audio_target, audio_action)
+                metrics.incr("assembly.normalized", reencoded=str(video is not None).lower())
+            return segment._replace(path=path)
+
+        done = dict(zip(jobs, self._parallel(run, list(jobs.values()))))
+        segments = [done.get(i, segment) for i, segment in enumerate(segments)]
+        return segments, normalized
+
+    def _join(self, join: "Join", clips: List[Tuple[str, float]], output_path: Path) -> List[str]:
+        """
+        Joins (path, duration) clips into output_path, with join.transition at every cut.
+        Returns the intermediate files used (split bodies, transition windows).
+        """
+        if not join.transition or len(clips) < 2:
+            self.ffmpeg.concat_copy([path for path, _ in clips], str(output_path))
+            return []
+        fade = min(join.fade, min(length for _, length in clips) / 2)
+        if fade < join.fade:
+            logger.warning(f"Transitions in {output_path.name} shortened to {fade:.2f}s (clips too short)")
+        keyframes = self._parallel(self.ffmpeg.keyframe_times, [path for path, _ in clips])
+
+        pieces: List[Callable[[], str]] = []  # each produces one file of the output, in order
+        window: List[Span] = []  # spans re-encoded together, crossfaded at each cut
+        for i, ((path, length), times) in enumerate(zip(clips, keyframes)):
+            first, last = i == 0, i == len(clips) - 1
+            # Spans start at the first frame: ffmpeg measures their duration (-t) from there
+            origin = times[0] if times else 0.0
+            # Copy from the first keyframe after the incoming fade to the last one before the outgoing fade
+            head = 0.0 if first else next((t for t in times if t >= origin + fade - 0.001), None)
+            tail = length if last else max((t for t in times if t <= length - fade + 0.001), default=None)
+            if head is None or tail is None or tail <= head:
+                window.append(Span(path, origin, length))  # no GOP to copy: the whole clip is part of the window
+                continue
+            if not first:
+                window.append(Span(path, origin, head))
+                pieces.append(join.window(self.ffmpeg, window, fade))
+            pieces.append(join.body(self.ffmpeg, path, head, tail, length, times))
+            window = [] if last else [Span(path, tail, length)]
+        if window:
+            pieces.append(join.window(self.ffmpeg, window, fade))
+
+        parts = self._parallel(lambda piece: piece(), pieces)
+        self.ffmpeg.concat_copy(parts, str(output_path))
+        return [part for part in parts if Path(part).parent.parent == join.work_dir]
+
+    def _parallel(self, fn, items: list) -> list:
+        """fn over items on up to `workers` threads (each runs an ffmpeg process), results in order."""
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(items)), thread_name_prefix="assemble") as pool:
+            return list(pool.map(fn, items))
+
+    def _duration(self, path: str) -> float:
+        problems, info = self.scanner.scan(path)
+        if problems or info is None:
+            raise MediaProcessingError(f"Intermediate {path} is invalid: {'; '.join(problems)}")
+        return info.duration_sec
+
+    @staticmethod
+    def _remove_stale(work_dir: Path, blocks: Dict[str, List[Segment]], segments: List[Segment],
+                      files: Dict[str, List[str]]) -> None:
+        """Drops intermediates of blocks / clip versions that are no longer part of the video."""
+        keep = {str(work_dir / f"block_{b}.mp4") for b in blocks} | {s.path for s in segments}
+        keep.update(path for used in files.values() for path in used)
+        stale = list(work_dir.glob("block_*.mp4"))
+        for subdir in ("segments", "parts", "windows"):
+            stale += (work_dir / subdir).glob("*.mp4")
+        for path in stale:
+            if str(path) not in keep:
+                path.unlink(missing_ok=True)
+
+
+class Join:
+    """Settings of one assembly's joins, and the cached transition pieces they are made of."""
+
+    def __init__(self, work_dir: Path, transition: Optional[str], fade: float,
+                 video_target: Tuple[str, int, int, float], audio_target: Optional[Tuple[str, int, int]]):
+        self.work_dir = work_dir
+        self.transition = transition
+        self.fade = fade
+        self.video_target = video_target
+        self.audio_target = audio_target
+        self.encoded = 0
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self) -> list:
+        """Part of every cache key: the same clips joined another way give another file."""
+        return [self.transition, self.fade] if self.transition else []
+
+    def body(self, ffmpeg: FFmpegAdapter, path: str, start: float, end: float, length: float,
+             keyframes: List[float]) -> Callable[[], str]:
+        """The keyframe-aligned part of a clip between two windows, stream-copied."""
+        if start == 0 and end == length:
+            return lambda: path
+        output = self.work_dir / "parts" / f"{digest([file_key(path), start, end])}.mp4"
+        cuts = [t for t in (start, end) if 0 < t < length]
+
+        def cut() -> str:
+            if not output.exists():
+                ffmpeg.split(path, cuts, keyframes, [str(output) if i == (1 if start > 0 else 0) else None
+                                          for i in range(len(cuts) + 1)])
+            return str(output)
+        return cut
+
+    def window(self, ffmpeg: FFmpegAdapter, spans: List[Span], fade: float) -> Callable[[], str]:
+        """The spans around one or more consecutive cuts, re-encoded with the transition."""
+        spans = list(spans)
+        output = self.work_dir / "windows" / "{}.mp4".format(digest(
+            [[file_key(s.path), s.start, s.end] for s in spans] + [self.transition, fade, self.video_target,
+                                                                  self.audio_target, Config.ASSEMBLY_CRF,
+                                                                  Config.ASSEMBLY_PRESET]))
+
+        def encode() -> str:
+            if not output.exists():
+                ffmpeg.crossfade(spans, str(output), self.transition, fade, self.video_target, self.audio_target)
+                with self._lock:
+                    self.encoded += 1
+                metrics.incr("assembly.transition_windows")
+            return str(output)
+        return encode
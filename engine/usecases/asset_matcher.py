@@ -0,0 +1,165 @@
+import math
+import threading
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from domain.entities import Asset, Shot
+from infra.config import Config
+from infra.text import tokenize
+
+# Relative weight of each catalog field in the asset vectors
+FIELD_WEIGHTS = {
+    "descripcion_visual": 1.0,
+    "uso_sugerido": 0.6,
+    "tipo_asset": 0.5,
+    "mv_context_default": 1.0,
+}
+
+
+def context_token(mv_context: Optional[str]) -> List[str]:
+    """mv_context as a single token, so LAB_WIDE only matches LAB_WIDE (not every 'lab')."""
+    return [f"ctx_{mv_context.lower()}"] if mv_context else []
+
+
+class AssetMatch(BaseModel):
+    """Catalog asset suggested for a shot"""
+    asset_id: str
+    score: float
+
+
+class _MatcherIndex(NamedTuple):
+    vocab: Dict[str, int]
+    idf: np.ndarray  # (terms,)
+    # (assets x terms) matrix, rows L2-normalized, stored by column (CSC): the postings of term t
+    # are rows[indptr[t]:indptr[t + 1]] with weights data[indptr[t]:indptr[t + 1]]
+    indptr: np.ndarray  # (terms + 1,)
+    rows: np.ndarray  # (nnz,)
+    data: np.ndarray  # (nnz,)
+    asset_ids: List[str]
+
+
+_EMPTY_INDEX = _MatcherIndex({}, np.zeros(0, dtype=np.float32), np.zeros(1, dtype=np.int64),
+                             np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32), [])
+
+
+class AssetMatcher:
+    """
+    TF-IDF matcher between shots and catalog assets.
+    Asset vectors are precomputed into one sparse L2-normalized float32 matrix (assets x terms)
+    stored by term, so a shot is scored by walking the postings of its few query terms only:
+    the cost depends on how many assets share its terms, not on the catalog or vocabulary size.
+    The matrix is rebuilt when the catalog version changes (hot reload).
+    """
+
+    def __init__(self, assets_repo, max_features: Optional[int] = None):
+        self.assets_repo = assets_repo
+        self.max_features = max_features or Config.ASSET_MATCH_MAX_FEATURES
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._index = _EMPTY_INDEX
+
+    def match(self, shot: Shot, top_k: int = 3) -> List[AssetMatch]:
+        """Best catalog assets for the shot, highest score first (cosine similarity, 0..1)."""
+        index = self._ensure_index()
+        ids = index.asset_ids
+        if not ids:
+            return []
+
+        query = self._vectorize(index, {
+            "descripcion_visual": (tokenize(shot.descripcion_visual), 1.0),
+            "funcion_narrativa": (tokenize(shot.funcion_narrativa), 0.3),
+            "mv_context": (context_token(shot.mv_context), 1.0),
+        })
+        if not query:
+            return []
+
+        # Cosine similarity of the assets sharing at least one term with the shot (all others score 0)
+        postings = [(index.rows[index.indptr[col]:index.indptr[col + 1]],
+                     index.data[index.indptr[col]:index.indptr[col + 1]] * weight) for col, weight in query.items()]
+        rows = np.concatenate([r for r, _ in postings])
+        if not len(rows):
+            return []
+        candidates, slot = np.unique(rows, return_inverse=True)
+        scores = np.bincount(slot, weights=np.concatenate([w for _, w in postings]))
+
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [AssetMatch(asset_id=ids[candidates[i]], score=round(float(scores[i]), 4))
+                for i in top if scores[i] > 0]
+
+    def best_match(self, shot: Shot) -> Optional[AssetMatch]:
+        matches = self.match(shot, top_k=1)
+        return matches[0] if matches else None
+
+    # --- Index building ------------------------------------------------------
+
+    def _ensure_index(self) -> _MatcherIndex:
+        version = self.assets_repo.catalog_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._index = self._build(self.assets_repo.list_assets())
+                    self._version = version
+        return self._index
+
+    def _build(self, assets: List[Asset]) -> _MatcherIndex:
+        docs = [self._asset_fields(asset) for asset in assets]
+
+        # Vocabulary: the max_features most frequent terms by document frequency
+        df = Counter()
+        for fields in docs:
+            df.update({t for tokens, _ in fields.values() for t in tokens})
+        terms = [t for t, _ in df.most_common(self.max_features)]
+        vocab = {t: i for i, t in enumerate(terms)}
+
+        n = len(docs)
+        idf = np.array([math.log((1 + n) / (1 + df[t])) + 1.0 for t in terms], dtype=np.float32)
+
+        rows, cols, vals = [], [], []
+        for row, fields in enumerate(docs):
+            weights = self._term_weights(fields, vocab)
+            row_cols = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+            row_vals = np.fromiter(weights.values(), dtype=np.float32, count=len(weights)) * idf[row_cols]
+            norm = np.linalg.norm(row_vals)
+            rows.append(np.full(len(row_cols), row, dtype=np.int32))
+            cols.append(row_cols)
+            vals.append(row_vals / norm if norm else row_vals)
+
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+        cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        vals = np.concatenate(vals).astype(np.float32) if vals else np.zeros(0, dtype=np.float32)
+        order = np.argsort(cols, kind="stable")
+        indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=len(terms)), out=indptr[1:])
+
+        return _MatcherIndex(vocab, idf, indptr, rows[order], vals[order], [a.asset_id for a in assets])
+
+    def _asset_fields(self, asset: Asset) -> Dict[str, tuple]:
+        return {
+            "descripcion_visual": (tokenize(asset.descripcion_visual), FIELD_WEIGHTS["descripcion_visual"]),
+            "uso_sugerido": (tokenize(asset.uso_sugerido), FIELD_WEIGHTS["uso_sugerido"]),
+            "tipo_asset": (tokenize(asset.tipo_asset), FIELD_WEIGHTS["tipo_asset"]),
+            "mv_context_default": (context_token(asset.mv_context_default), FIELD_WEIGHTS["mv_context_default"]),
+        }
+
+    @staticmethod
+    def _term_weights(fields: Dict[str, tuple], vocab: Dict[str, int]) -> Dict[int, float]:
+        """Sublinear (1 + log tf) term weights, scaled per field."""
+        weights: Dict[int, float] = {}
+        for tokens, field_weight in fields.values():
+            for term, tf in Counter(tokens).items():
+                col = vocab.get(term)
+                if col is not None:
+                    weights[col] = weights.get(col, 0.0) + field_weight * (1.0 + math.log(tf))
+        return weights
+
+    def _vectorize(self, index: _MatcherIndex, fields: Dict[str, tuple]) -> Dict[int, float]:
+        """Sparse L2-normalized TF-IDF query vector: column -> weight (empty if no known term)."""
+        vector = {col: weight * float(index.idf[col])
+                  for col, weight in self._term_weights(fields, index.vocab).items()}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {col: w / norm for col, w in vector.items()} if norm else {}
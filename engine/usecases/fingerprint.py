@@ -0,0 +1,53 @@
+import hashlib
+import json
+from typing import Optional, Tuple
+
+from adapters.asset_dependency_index import descripcion_hash
+from domain.entities import Shot
+from infra.config import Config
+from usecases.quality_tiers import tier_settings
+from usecases.utils_prompt import PromptService
+
+# Shot fields that change what gets generated. Identifiers, state and pipeline outputs are left out;
+# prompt_imagen / prompt_video count only as given in the input (None = generated by PromptService).
+FINGERPRINT_FIELDS = [
+    "mv_context", "asset_id", "asset_mode", "quality_tier", "camera_move", "duracion_seg",
+    "descripcion_visual", "funcion_narrativa", "prompt_imagen", "prompt_video",
+]
+# Fields added later: hashed only when they differ from their default, so results stored before
+# they existed keep their fingerprint
+OPTIONAL_FINGERPRINT_FIELDS = ["video_engine", "prompt_imagen_last", "continuity"]
+
+
+class ShotFingerprinter:
+    """
+    Hash of everything a shot's output depends on: its prompt-relevant fields, the resolved asset
+    (file content + catalog description), the quality tier and its Kie.ai models/settings and the prompt
+    template version.
+    Two runs with the same fingerprint would produce equivalent artifacts.
+    """
+
+    def __init__(self, assets_repo):
+        self.assets_repo = assets_repo
+
+    def fingerprint(self, shot: Shot) -> str:
+        content_hash, desc_hash = self._asset_version(shot.asset_id)
+        fields = shot.model_dump(mode="json", include=set(FINGERPRINT_FIELDS))
+        fields.update(shot.model_dump(mode="json", include=set(OPTIONAL_FINGERPRINT_FIELDS), exclude_defaults=True))
+        payload = {
+            "shot": fields,
+            "asset": [content_hash, desc_hash],
+            "models": [*tier_settings(shot.quality_tier), Config.KIE_IMAGE_ASPECT_RATIO],
+            "template": PromptService.TEMPLATE_VERSION,
+        }
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _asset_version(self, asset_id: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        if not asset_id:
+            return None, None
+        asset = self.assets_repo.get_asset(asset_id)
+        if asset is None:
+            return None, None
+        entry = self.assets_repo.get_file_entry(asset.file_name)
+        return (entry.content_hash if entry else None), descripcion_hash(asset)
@@ -0,0 +1,81 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from adapters.image_scorer import ImageScore, ImageScorer
+from adapters.logger import Logger
+from domain.entities import Shot
+from infra.config import Config
+from infra.metrics import metrics
+
+logger = Logger()
+
+
+class Candidate(NamedTuple):
+    image: str  # data URI
+    prompt: str  # prompt that produced it (after remediation)
+    score: ImageScore
+    submitted: int  # candidates submitted for the shot
+
+
+class ImageCandidates:
+    """
+    Speculative keyframe generation for core shots: submits `count` Nano Banana tasks at once,
+    scores each result as it arrives and picks the best as soon as `quorum` of them pass the
+    quality thresholds. The remaining tasks are cancelled through the event passed to `attempt`
+    (the client stops polling and never downloads them).
+
+    A bad keyframe costs a Veo task and a manual regenerate; this trades it for at most
+    `count - 1` extra image tasks, on the shots that matter.
+    """
+
+    def __init__(self, scorer: Optional[ImageScorer] = None, count: Optional[int] = None,
+                 quorum: Optional[int] = None):
+        self.scorer = scorer or ImageScorer()
+        self.count = count or Config.IMAGE_CANDIDATES
+        self.quorum = max(1, min(quorum or Config.IMAGE_CANDIDATES_QUORUM, self.count))
+
+    def enabled_for(self, shot: Shot) -> bool:
+        return shot.core_flag and self.count > 1
+
+    def generate(self, attempt: Callable[[threading.Event], Tuple[str, str]],
+                 reference_path: Optional[str] = None) -> Candidate:
+        """
+        `attempt(cancel_event)` runs one image task and returns (image, prompt). Attempts run in
+        copies of the caller's context, so their retries are charged to the caller's budget.
+        Without any acceptable candidate the best-scored one is returned; if all attempts fail,
+        the first error is raised.
+        """
+        cancel = threading.Event()
+        scored: List[Candidate] = []
+        errors: List[Exception] = []
+        pool = ThreadPoolExecutor(max_workers=self.count, thread_name_prefix="candidate")
+        try:
+            futures = [pool.submit(contextvars.copy_context().run, attempt, cancel) for _ in range(self.count)]
+            for future in as_completed(futures):
+                try:
+                    image, prompt = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                score = self.scorer.score(image, reference_path)
+                scored.append(Candidate(image, prompt, score, self.count))
+                if not score.ok:
+                    logger.info(f"Image candidate rejected: {', '.join(score.problems)}")
+                if sum(1 for c in scored if c.score.ok) >= self.quorum:
+                    break
+        finally:
+            # Stragglers stop at their next poll; nothing waits for them
+            cancel.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        metrics.incr("image.candidates.scored", len(scored))
+        if not scored:
+            metrics.incr("image.candidates", result="failed")
+            raise errors[0]
+        best = max(scored, key=lambda c: (c.score.ok, c.score.value))
+        metrics.incr("image.candidates", result="accepted" if best.score.ok else "best_effort")
+        logger.info(f"Picked image candidate {scored.index(best) + 1}/{len(scored)} received "
+                    f"(sharpness {best.score.sharpness:.1f}, clipped {best.score.clipped:.1%})")
+        return best
@@ -0,0 +1,208 @@
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from adapters.latency_store import quantile
+from domain.entities import AssetMode, QualityTier, Shot, VideoEngine
+from infra.config import Config
+from usecases.quality_tiers import latency_stage
+
+# Kie.ai calls per shot: (Nano Banana images, Veo videos)
+CALLS_PER_MODE = {
+    AssetMode.STILL_ONLY: (1, 0),
+    AssetMode.IMAGE_1F_VIDEO: (1, 1),
+    AssetMode.IMAGE_2F_VIDEO: (2, 1),  # first and last keyframes, generated concurrently
+}
+
+
+class StageLatency(BaseModel):
+    """Latency assumed for a stage, from recorded samples or the configured prior"""
+    stage: str
+    samples: int
+    p50: float
+    p90: float
+
+
+class ShotPlan(BaseModel):
+    """What processing a shot would do"""
+    shot_id: str
+    block_id: str
+    action: str  # "process" | "skip" (unchanged, cached result) | "fail" (would fail before Kie.ai)
+    image_calls: int = 0
+    video_calls: int = 0
+    local_renders: int = 0  # videos rendered locally (video_engine LOCAL), no Kie.ai call
+    continuity_from: Optional[str] = None  # starts from this shot's last frame: no image task for it
+    keyframe_from: Optional[str] = None  # reuses this shot's keyframe: no image task for it
+    asset_file: Optional[str] = None
+    variant_cached: Optional[bool] = None
+    prompt_imagen: Optional[str] = None
+    prompt_video: Optional[str] = None
+    estimated_sec_p50: float = 0.0
+    estimated_sec_p90: float = 0.0
+    error: Optional[str] = None
+
+
+class StoryboardPlan(BaseModel):
+    """Dry run of a storyboard: upstream calls, cache hits and projected wall time, without calling Kie.ai"""
+    video_id: str
+    shots: int
+    to_process: int
+    skipped: int
+    would_fail: int
+    image_calls: int
+    video_calls: int
+    local_renders: int
+    variant_cache_hits: int
+    variant_cache_misses: int
+    concurrency: int
+    wall_time_sec_p50: float
+    wall_time_sec_p90: float
+    latencies: List[StageLatency]
+    plan: List[ShotPlan]
+
+
+class PlanStoryboard:
+    """
+    Dry-run planner for ProcessStoryboard: resolves assets, renders prompts, checks the result and
+    variant caches, counts the Kie.ai calls per asset_mode (and local renders) and projects wall time
+    by scheduling the shots' p50/p90 durations (from recorded stage latencies) on BATCH_CONCURRENCY
+    workers, following the shot dependency graph like ProcessStoryboard.
+    """
+
+    def __init__(self, storyboard, assets_repo, prompt_service, latency_store, variant_cache=None,
+                 image_candidates=None):
+        self.storyboard = storyboard
+        self.image_candidates = image_candidates
+        self.assets_repo = assets_repo
+        self.prompt_service = prompt_service
+        self.latency_store = latency_store
+        self.variant_cache = variant_cache
+
+    def execute(self, video_id: str, shots: List[Shot], force: bool = False) -> StoryboardPlan:
+        latencies = self._latencies()
+        graph = self.storyboard.graph(shots)
+        plans: List[Optional[ShotPlan]] = [None] * len(shots)
+        for i in graph.topological_order():
+            source = graph.continues.get(i)
+            owner = graph.shares_keyframe.get(i)
+            upstream = [plans[p] for p in graph.parents[i]]
+            plans[i] = self._plan_shot(shots[i], force, latencies, upstream,
+                                       shots[source] if source is not None else None,
+                                       shots[owner] if owner is not None else None)
+        concurrency = self.storyboard.concurrency
+        # Shots reusing a keyframe start once its image is ready, not when its shot is done
+        image_p50, image_p90 = zip(*(self._image_stage(plan, shot, latencies) for plan, shot in zip(plans, shots)))
+
+        to_process = [p for p in plans if p.action == "process"]
+        return StoryboardPlan(
+            video_id=video_id,
+            shots=len(shots),
+            to_process=len(to_process),
+            skipped=sum(1 for p in plans if p.action == "skip"),
+            would_fail=sum(1 for p in plans if p.action == "fail"),
+            image_calls=sum(p.image_calls for p in plans),
+            video_calls=sum(p.video_calls for p in plans),
+            local_renders=sum(p.local_renders for p in plans),
+            variant_cache_hits=sum(1 for p in to_process if p.variant_cached is True),
+            variant_cache_misses=sum(1 for p in to_process if p.variant_cached is False),
+            concurrency=concurrency,
+            # Scheduled like the batch runner: dependencies first, longest critical path first
+            wall_time_sec_p50=round(graph.makespan([p.estimated_sec_p50 for p in plans], concurrency, image_p50), 1),
+            wall_time_sec_p90=round(graph.makespan([p.estimated_sec_p90 for p in plans], concurrency, image_p90), 1),
+            latencies=list(latencies.values()),
+            plan=plans,
+        )
+
+    def _plan_shot(self, shot: Shot, force: bool, latencies: Dict[str, StageLatency],
+                   upstream: List[ShotPlan], continues: Optional[Shot] = None,
+                   keyframe_from: Optional[Shot] = None) -> ShotPlan:
+        plan = ShotPlan(shot_id=shot.shot_id, block_id=shot.block_id, action="process")
+        failed = next((p for p in upstream if p.action == "fail"), None)
+        if failed is not None:
+            plan.action = "fail"
+            plan.error = f"Depends on shot {failed.shot_id}, which would fail"
+            return plan
+        # A shot is regenerated whenever one of the shots it depends on is
+        upstream_changed = any(p.action == "process" for p in upstream)
+        # Cheap file checks only: a dry run neither decodes media nor downloads anything
+        if not force and not upstream_changed and self.storyboard.reusable_result(shot, verify=False) is not None:
+            plan.action = "skip"
+            return plan
+
+        asset = None
+        try:
+            if shot.asset_id:
+                asset = self.assets_repo.get_asset(shot.asset_id)
+                if asset is None:
+                    raise ValueError(f"Asset ID not found in catalog: {shot.asset_id}")
+                entry = self.assets_repo.get_file_entry(asset.file_name)
+                if entry is None:
+                    raise ValueError(f"Asset physical file not found: {asset.file_name}")
+                plan.asset_file = str(entry.path)
+                if self.variant_cache is not None:
+                    plan.variant_cached = self.variant_cache.lookup(str(entry.path), content_hash=entry.content_hash) is not None
+
+            plan.prompt_imagen = shot.prompt_imagen or self.prompt_service.generate_image_prompt(shot, asset=asset)
+            if shot.asset_mode != AssetMode.STILL_ONLY or shot.video_engine == VideoEngine.LOCAL:
+                plan.prompt_video = shot.prompt_video or self.prompt_service.generate_video_prompt(shot)
+        except Exception as e:
+            plan.action = "fail"
+            plan.error = str(e)
+            return plan
+
+        plan.image_calls, plan.video_calls = CALLS_PER_MODE[shot.asset_mode]
+        if continues is not None:
+            plan.continuity_from = continues.shot_id
+            plan.image_calls -= 1
+        elif keyframe_from is not None:
+            plan.keyframe_from = keyframe_from.shot_id
+            plan.image_calls -= 1
+        elif (self.image_candidates is not None and shot.asset_mode != AssetMode.IMAGE_2F_VIDEO
+              and self.image_candidates.enabled_for(shot)):
+            # Speculative candidates: worst case every one of them is submitted (and billed)
+            plan.image_calls += self.image_candidates.count - 1
+        image = latencies[latency_stage("image", shot.quality_tier)]
+        video = latencies[latency_stage("video", shot.quality_tier)]
+        local = latencies[latency_stage("video_local", shot.quality_tier)]
+        if shot.video_engine == VideoEngine.LOCAL:
+            plan.video_calls, plan.local_renders = 0, 1
+            video_p50, video_p90 = local.p50, local.p90
+        elif shot.video_engine == VideoEngine.AUTO:
+            # Veo is abandoned after VEO_QUEUE_TIMEOUT_SEC and the move rendered locally
+            cap = Config.VEO_QUEUE_TIMEOUT_SEC
+            video_p50, video_p90 = min(video.p50, cap + local.p50), min(video.p90, cap + local.p90)
+        else:
+            video_p50, video_p90 = video.p50, video.p90
+        video_count = plan.video_calls + plan.local_renders
+        # A shot's images are generated concurrently: the image stage lasts about one task
+        image_stages = 1 if plan.image_calls else 0
+        plan.estimated_sec_p50 = round(image_stages * image.p50 + video_count * video_p50, 1)
+        plan.estimated_sec_p90 = round(image_stages * image.p90 + video_count * video_p90, 1)
+        return plan
+
+    @staticmethod
+    def _image_stage(plan: ShotPlan, shot: Shot, latencies: Dict[str, StageLatency]) -> Tuple[float, float]:
+        """(p50, p90) of the shot's image stage, 0 when it generates no image."""
+        if plan.action != "process" or not plan.image_calls:
+            return 0.0, 0.0
+        image = latencies[latency_stage("image", shot.quality_tier)]
+        return image.p50, image.p90
+
+    def _latencies(self) -> Dict[str, StageLatency]:
+        """Per stage and tier; a tier without samples of its own falls back to FINAL, then to the prior."""
+        priors = {"image": Config.LATENCY_PRIOR_IMAGE_SEC, "video": Config.LATENCY_PRIOR_VIDEO_SEC,
+                  "video_local": Config.LATENCY_PRIOR_VIDEO_LOCAL_SEC}
+        recorded = self.latency_store.all_samples()
+        latencies = {}
+        for stage, prior in priors.items():
+            fallback = StageLatency(stage=stage, samples=0, p50=prior, p90=prior)
+            for tier in (QualityTier.FINAL, QualityTier.DRAFT):
+                key = latency_stage(stage, tier)
+                ordered = sorted(recorded.get(key, []))
+                if ordered:
+                    latencies[key] = StageLatency(stage=key, samples=len(ordered),
+                                                  p50=quantile(ordered, 0.5), p90=quantile(ordered, 0.9))
+                else:
+                    latencies[key] = fallback.model_copy(update={"stage": key, "samples": 0})
+                fallback = latencies[key]
+        return latencies
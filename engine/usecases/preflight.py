@@ -0,0 +1,168 @@
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from pydantic import BaseModel
+
+from domain.entities import AssetMode, Shot, VideoEngine
+from infra.config import Config
+from usecases.utils_prompt import CAMERA_MOVES
+
+
+class PreflightProblem(BaseModel):
+    """One problem found before processing. Errors would make the shot fail; warnings would not."""
+    shot_id: Optional[str] = None  # None: affects the whole storyboard
+    field: Optional[str] = None
+    code: str
+    severity: str  # "error" | "warning"
+    message: str
+
+
+class PreflightReport(BaseModel):
+    """All problems of a storyboard, found in one pass without calling Kie.ai"""
+    video_id: str
+    ok: bool
+    shots: int
+    errors: int
+    warnings: int
+    duration_ms: float
+    problems: List[PreflightProblem] = []
+
+
+class Preflight:
+    """
+    Validates a whole storyboard before any credits are spent: catalog lookups, asset files
+    (one directory scan for the whole batch), prompt rendering and reachability of PUBLIC_BASE_URL,
+    which Kie.ai needs to fetch the references.
+    """
+
+    def __init__(self, assets_repo, prompt_service, url_timeout_sec: Optional[float] = None,
+                 url_check_ttl_sec: Optional[float] = None):
+        self.assets_repo = assets_repo
+        self.prompt_service = prompt_service
+        self.url_timeout_sec = url_timeout_sec if url_timeout_sec is not None else Config.PREFLIGHT_URL_TIMEOUT_SEC
+        self.url_check_ttl_sec = url_check_ttl_sec if url_check_ttl_sec is not None else Config.PREFLIGHT_URL_CHECK_TTL_SEC
+        self._lock = threading.Lock()
+        self._url_checks: Dict[str, Tuple[float, Optional[str]]] = {}  # url -> (checked_at, error)
+
+    def execute(self, video_id: str, shots: List[Shot]) -> PreflightReport:
+        started = time.perf_counter()
+        problems: List[PreflightProblem] = []
+
+        if not Config.KIE_API_KEY:
+            problems.append(self._error(None, None, "missing_api_key", "KIE_API_KEY is not configured"))
+        url_error = self._check_public_url()
+        if url_error:
+            problems.append(self._error(None, None, "public_url_unreachable",
+                                        f"{Config.PUBLIC_BASE_URL} is not reachable: {url_error}"))
+
+        # One scan of ASSETS_FILES_DIR up front; every lookup below hits the in-memory index
+        self.assets_repo.refresh_file_index(force=True)
+
+        seen = set()
+        blocks_seen = set()
+        for shot in shots:
+            if shot.continuity and shot.block_id not in blocks_seen:
+                problems.append(self._warning(shot.shot_id, "continuity", "no_continuity_source",
+                                              "First shot of its block: there is no previous shot to continue, "
+                                              "a keyframe will be generated"))
+            blocks_seen.add(shot.block_id)
+            key = (shot.block_id, shot.shot_id)
+            if key in seen:
+                problems.append(self._error(shot.shot_id, "shot_id", "duplicate_shot",
+                                            f"Shot {shot.block_id}/{shot.shot_id} appears more than once"))
+            seen.add(key)
+            if shot.video_id != video_id:
+                problems.append(self._error(shot.shot_id, "video_id", "wrong_video",
+                                            f"Shot belongs to video {shot.video_id}, not {video_id}"))
+            problems += self._check_shot(shot)
+
+        errors = sum(1 for p in problems if p.severity == "error")
+        return PreflightReport(
+            video_id=video_id,
+            ok=errors == 0,
+            shots=len(shots),
+            errors=errors,
+            warnings=len(problems) - errors,
+            duration_ms=round((time.perf_counter() - started) * 1000, 2),
+            problems=problems,
+        )
+
+    def _check_shot(self, shot: Shot) -> List[PreflightProblem]:
+        problems = []
+        asset = None
+        if not shot.asset_id:
+            problems.append(self._warning(shot.shot_id, "asset_id", "missing_asset_id",
+                                          "No asset_id: the image will be generated from the prompt only"))
+        else:
+            asset = self.assets_repo.get_asset(shot.asset_id)
+            if asset is None:
+                problems.append(self._error(shot.shot_id, "asset_id", "unknown_asset",
+                                            f"Asset ID not found in catalog: {shot.asset_id}"))
+            else:
+                if self.assets_repo.resolve_file_path(asset.file_name) is None:
+                    problems.append(self._error(shot.shot_id, "asset_id", "missing_asset_file",
+                                                f"Asset physical file not found: {asset.file_name}"))
+                if shot.mv_context != asset.mv_context_default:
+                    problems.append(self._warning(shot.shot_id, "mv_context", "context_mismatch",
+                                                  f"Shot context {shot.mv_context} differs from asset default {asset.mv_context_default}"))
+
+        needs_video = shot.asset_mode != AssetMode.STILL_ONLY or shot.video_engine == VideoEngine.LOCAL
+        if shot.video_engine in (VideoEngine.LOCAL, VideoEngine.AUTO) and shutil.which(Config.FFMPEG_BIN) is None:
+            problems.append(self._error(shot.shot_id, "video_engine", "ffmpeg_unavailable",
+                                        f"video_engine {shot.video_engine.value} needs ffmpeg ({Config.FFMPEG_BIN}), not found"))
+        if needs_video:
+            move = (shot.camera_move or "").strip().lower()
+            if move not in CAMERA_MOVES:
+                problems.append(self._error(shot.shot_id, "camera_move", "unknown_camera_move",
+                                            f"Unknown camera_move '{shot.camera_move}'. Use one of: {', '.join(CAMERA_MOVES)}"))
+            if shot.duracion_seg <= 0:
+                problems.append(self._error(shot.shot_id, "duracion_seg", "invalid_duration",
+                                            f"duracion_seg must be positive, got {shot.duracion_seg}"))
+
+        if not shot.descripcion_visual.strip():
+            problems.append(self._error(shot.shot_id, "descripcion_visual", "empty_description",
+                                        "descripcion_visual is empty"))
+
+        prompts = [("prompt_imagen", shot.prompt_imagen, lambda: self.prompt_service.generate_image_prompt(shot, asset=asset))]
+        if needs_video:
+            prompts.append(("prompt_video", shot.prompt_video, lambda: self.prompt_service.generate_video_prompt(shot)))
+        for field, given, render in prompts:
+            try:
+                prompt = given or render()
+            except Exception as e:
+                problems.append(self._error(shot.shot_id, field, "prompt_render_failed", f"Could not render {field}: {e}"))
+                continue
+            if not prompt.strip():
+                problems.append(self._error(shot.shot_id, field, "empty_prompt", f"{field} is empty"))
+            elif self.prompt_service.sanitize_prompt(prompt) != prompt:
+                problems.append(self._warning(shot.shot_id, field, "content_policy_terms",
+                                              f"{field} contains terms likely to trip content filters"))
+        return problems
+
+    def _check_public_url(self) -> Optional[str]:
+        """GET {PUBLIC_BASE_URL}/health, cached for PREFLIGHT_URL_CHECK_TTL_SEC. Returns the error, if any."""
+        url = f"{Config.PUBLIC_BASE_URL.rstrip('/')}/health"
+        with self._lock:
+            cached = self._url_checks.get(url)
+        if cached and time.time() - cached[0] < self.url_check_ttl_sec:
+            return cached[1]
+
+        try:
+            response = requests.get(url, timeout=self.url_timeout_sec)
+            error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            error = type(e).__name__
+        with self._lock:
+            self._url_checks[url] = (time.time(), error)
+        return error
+
+    @staticmethod
+    def _error(shot_id, field, code, message) -> PreflightProblem:
+        return PreflightProblem(shot_id=shot_id, field=field, code=code, severity="error", message=message)
+
+    @staticmethod
+    def _warning(shot_id, field, code, message) -> PreflightProblem:
+        return PreflightProblem(shot_id=shot_id, field=field, code=code, severity="warning", message=message)
@@ -1,25 +1,73 @@
-from domain.entities import Shot, AssetMode, ShotEstado
+from domain.entities import Shot, AssetMode, QualityTier, ShotEstado, VideoEngine
+from domain.errors import MediaProcessingError, MediaVerificationError, VideoQueueTimeout
+from adapters.asset_dependency_index import descripcion_hash
+from infra.config import Config
+from infra.metrics import metrics
+from infra.retry import retry_scope
+from usecases.fingerprint import ShotFingerprinter
+from usecases.quality_tiers import latency_stage, tier_settings
+from usecases.remediation import FailureRemediator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+import contextvars
+import threading
+import time
 import traceback
 
 class ProcessShot:
-    def __init__(self, fs, prompt_service, image_client, video_client, logger, assets_repo):
+    def __init__(self, fs, prompt_service, image_client, video_client, logger, assets_repo, remediator=None,
+                 reference_host=None, asset_matcher=None, variant_cache=None, dependency_index=None,
+                 fingerprinter=None, latency_store=None, motion_renderer=None, image_candidates=None,
+                 media_verifier=None, video_qc=None, duration_conformer=None):
         self.fs = fs
         self.prompt_service = prompt_service
         self.image_client = image_client
         self.video_client = video_client
         self.logger = logger
         self.assets_repo = assets_repo
+        self.remediator = remediator or FailureRemediator(prompt_service, logger)
+        self.reference_host = reference_host
+        self.asset_matcher = asset_matcher
+        self.variant_cache = variant_cache
+        self.dependency_index = dependency_index
+        self.fingerprinter = fingerprinter or ShotFingerprinter(assets_repo)
+        self.latency_store = latency_store
+        self.motion_renderer = motion_renderer
+        self.image_candidates = image_candidates
+        self.media_verifier = media_verifier
+        self.video_qc = video_qc
+        self.duration_conformer = duration_conformer
 
-    def execute(self, shot: Shot) -> Shot:
+    def execute(self, shot: Shot, keyframe_path: Optional[str] = None,
+                on_image_ready: Optional[Callable[[str], None]] = None) -> Shot:
+        """
+        Generates the shot's image(s) and video. `keyframe_path` (continuity, shared keyframe) is used
+        as the first keyframe instead of generating one. `on_image_ready` is called with the image path
+        once the image stage is done, before the video stage starts.
+        """
+        # Every retry made while processing this shot is charged to its own budget
+        with retry_scope(f"{shot.video_id}/{shot.block_id}/{shot.shot_id}"):
+            return self._execute(shot, keyframe_path, on_image_ready)
+
+    def _execute(self, shot: Shot, keyframe_path: Optional[str] = None,
+                 on_image_ready: Optional[Callable[[str], None]] = None) -> Shot:
         try:
             self.logger.info(f"Starting processing for shot {shot.video_id}/{shot.block_id}/{shot.shot_id}")
             
             # State transition: PENDIENTE -> EN_PROCESO
             shot.estado = ShotEstado.EN_PROCESO
             
+            # Fingerprint the inputs as received, before the pipeline fills in prompts/assets
+            shot.input_fingerprint = self.fingerprinter.fingerprint(shot)
+            settings = tier_settings(shot.quality_tier)
+            
             # Asset Resolution
             asset_obj = None
             ref_image_url = None
+            ref_image_path = None
+            
+            if not shot.asset_id and self.asset_matcher is not None and Config.ASSET_AUTO_MATCH != "off":
+                self._match_asset(shot)
             
             if shot.asset_id:
                 self.logger.info(f"Resolving asset: {shot.asset_id}")
@@ -35,14 +83,18 @@ class ProcessShot:
                 # Update Shot metadata
                 shot.asset_resolved_file_name = asset_obj.file_name
                 shot.asset_resolved_path = str(resolved_path)
+                file_entry = self.assets_repo.get_file_entry(asset_obj.file_name)
+                shot.asset_content_hash = file_entry.content_hash if file_entry else None
+                shot.asset_descripcion_hash = descripcion_hash(asset_obj)
                 
                 # Check consistency
                 if shot.mv_context != asset_obj.mv_context_default:
                     shot.asset_mv_context_mismatch = True
                     self.logger.warning(f"Context mismatch! Shot: {shot.mv_context} vs Asset: {asset_obj.mv_context_default}")
                 
-                # Get public URL for reference
-                ref_image_url = self.fs.get_public_url(str(resolved_path))
+                # Get public URL for reference (downscaled variant when available)
+                ref_image_path = self._reference_variant(resolved_path, shot.asset_content_hash, settings.image_resolution)
+                ref_image_url = self._reference_url(ref_image_path)
                 self.logger.info(f"Using reference image: {ref_image_url} (image_input)")
                 self.logger.info(f"Asset resolved. Ref URL: {ref_image_url}")
             else:
@@ -73,32 +125,80 @@ class ProcessShot:
             # 2. Generar imagen (always required)
             self.logger.info(f"Generating image with prompt: {shot.prompt_imagen[:50]}...")
             
-            # Use ref_image_url if resolved
-            img_url = self.image_client.generate(shot.prompt_imagen, ref_image_url=ref_image_url)
+            # Use ref_image_url if resolved (re-hosted if Kie.ai could not fetch it)
+            def generate_image(prompt, rehost, cancel_event=None):
+                url = ref_image_url
+                if rehost and ref_image_path:
+                    url = self._reference_url(ref_image_path, rehost=True)
+                extra = {"cancel_event": cancel_event} if cancel_event is not None else {}
+                return self.image_client.generate(prompt, ref_image_url=url, model=settings.image_model,
+                                                  resolution=settings.image_resolution, **extra)
+            
+            if shot.asset_mode == AssetMode.IMAGE_2F_VIDEO and not shot.prompt_imagen_last:
+                shot.prompt_imagen_last = self.prompt_service.generate_last_frame_prompt(shot, shot.prompt_imagen)
             
-            shot.image_path = self.fs.save_image(shot, img_url)
+            if keyframe_path:
+                # Continuity / shared keyframe: the first keyframe already exists, no image task for it
+                shot.image_path = self.fs.save_image_file(shot, keyframe_path)
+                if shot.asset_mode == AssetMode.IMAGE_2F_VIDEO:
+                    last_url, shot.prompt_imagen_last = self._generate_image(shot, generate_image,
+                                                                             shot.prompt_imagen_last)
+                    shot.image_last_path = self.fs.save_image(shot, last_url, stem="image_last")
+            elif shot.asset_mode == AssetMode.IMAGE_2F_VIDEO:
+                # Both keyframes at once, so the image stage takes about as long as in IMAGE_1F_VIDEO.
+                # The task runs in a copy of this context: its retries are charged to this shot's budget.
+                # If the first keyframe fails, the last one is cancelled instead of awaited
+                cancel = threading.Event()
+                pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="keyframe")
+                try:
+                    last = pool.submit(contextvars.copy_context().run, self._generate_image, shot,
+                                       lambda prompt, rehost: generate_image(prompt, rehost, cancel),
+                                       shot.prompt_imagen_last)
+                    img_url, shot.prompt_imagen = self._generate_image(shot, generate_image, shot.prompt_imagen)
+                    last_url, shot.prompt_imagen_last = last.result()
+                except BaseException:
+                    cancel.set()
+                    raise
+                finally:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                shot.image_path = self.fs.save_image(shot, img_url)
+                shot.image_last_path = self.fs.save_image(shot, last_url, stem="image_last")
+            elif self.image_candidates is not None and self.image_candidates.enabled_for(shot):
+                img_url, shot.prompt_imagen = self._generate_candidates(shot, generate_image, ref_image_path)
+                shot.image_path = self.fs.save_image(shot, img_url)
+            else:
+                img_url, shot.prompt_imagen = self._generate_image(shot, generate_image, shot.prompt_imagen)
+                shot.image_path = self.fs.save_image(shot, img_url)
             self.logger.info(f"Image saved to {shot.image_path}")
+            if shot.image_last_path:
+                self.logger.info(f"Last keyframe saved to {shot.image_last_path}")
+            self._verify_images(shot)
+            if on_image_ready is not None:
+                on_image_ready(shot.image_path)
 
             # 3. Conditional video generation based on asset_mode
-            if shot.asset_mode == AssetMode.STILL_ONLY:
+            if shot.video_engine == VideoEngine.LOCAL:
+                # Camera move over the still, rendered locally (also for STILL_ONLY shots)
+                shot.video_path = self._render_local(shot)
+                self.logger.info(f"Video rendered locally to {shot.video_path}")
+            elif shot.asset_mode == AssetMode.STILL_ONLY:
                 self.logger.info("Asset mode is STILL_ONLY, skipping video generation")
-            elif shot.asset_mode == AssetMode.IMAGE_1F_VIDEO:
+            else:
+                # IMAGE_1F_VIDEO, or IMAGE_2F_VIDEO interpolating between both keyframes
                 self.logger.info(f"Generating video with prompt: {shot.prompt_video[:50]}...")
-                vid_url = self.video_client.generate(shot.image_path, shot.prompt_video)
-                shot.video_path = self.fs.save_video(shot, vid_url)
-                self.logger.info(f"Video saved to {shot.video_path}")
-            elif shot.asset_mode == AssetMode.IMAGE_2F_VIDEO:
-                # Future implementation - for now, treat as IMAGE_1F_VIDEO
-                self.logger.warning("IMAGE_2F_VIDEO not fully implemented, using IMAGE_1F_VIDEO logic")
-                vid_url = self.video_client.generate(shot.image_path, shot.prompt_video)
-                shot.video_path = self.fs.save_video(shot, vid_url)
+                shot.video_path = self._produce_video(shot)
                 self.logger.info(f"Video saved to {shot.video_path}")
+            if shot.video_path:
+                self._verify_video(shot)
+                self._quality_check(shot)
+                self._conform_duration(shot)
             
             # State transition: EN_PROCESO -> COMPLETADO
             shot.estado = ShotEstado.COMPLETADO
             
             # 4. Save metadata
             self.fs.save_metadata(shot)
+            self._record_dependency(shot)
             
         except Exception as e:
             shot.estado = ShotEstado.ERROR
@@ -112,3 +212,184 @@ class ProcessShot:
                 pass 
         
         return shot
+
+    def _match_asset(self, shot: Shot) -> None:
+        """Suggests the closest catalog asset for a shot without asset_id, and assigns it if configured and confident."""
+        match = self.asset_matcher.best_match(shot)
+        if not match:
+            return
+        
+        shot.asset_match_suggestion = match.asset_id
+        shot.asset_match_score = match.score
+        
+        if Config.ASSET_AUTO_MATCH == "assign" and match.score >= Config.ASSET_MATCH_THRESHOLD:
+            shot.asset_id = match.asset_id
+            shot.asset_auto_matched = True
+            self.logger.info(f"Auto-assigned asset {match.asset_id} (score {match.score:.2f})")
+        else:
+            self.logger.info(f"Suggested asset {match.asset_id} (score {match.score:.2f}), not assigned")
+
+    def _reference_variant(self, resolved_path, content_hash, resolution: str) -> str:
+        """Reference asset scaled down to the image output size, so Kie.ai downloads fewer bytes."""
+        if self.variant_cache is None:
+            return str(resolved_path)
+        return self.variant_cache.variant_for(str(resolved_path), resolution=resolution, content_hash=content_hash)
+
+    def _record_dependency(self, shot: Shot) -> None:
+        """Links the completed shot to the asset version it was generated from (final renders only)."""
+        if self.dependency_index is None or shot.quality_tier != QualityTier.FINAL:
+            return
+        try:
+            self.dependency_index.record(shot)
+        except OSError as e:
+            self.logger.warning(f"Could not update asset dependency index: {e}")
+
+    def _reference_url(self, local_path: str, rehost: bool = False) -> str:
+        """Signed, content-hashed URL from the reference host (plain /assets URL when none is configured)."""
+        if self.reference_host is None:
+            return self.fs.get_public_url(local_path)
+        if rehost:
+            return self.reference_host.rehost(local_path)
+        return self.reference_host.url_for(local_path)
+
+    def _generate_image(self, shot: Shot, generate_image, prompt: str):
+        """One Nano Banana task with automatic remediation. Returns the image and the prompt that produced it."""
+        started = time.perf_counter()
+        result = self.remediator.run("image", generate_image, prompt)
+        self._record_latency("image", started, shot)
+        return result
+
+    def _generate_candidates(self, shot: Shot, generate_image, reference_path: Optional[str]):
+        """Several Nano Banana tasks at once for a core shot; the best-scored image wins (see ImageCandidates)."""
+        started = time.perf_counter()
+        candidate = self.image_candidates.generate(
+            lambda cancel: self.remediator.run("image", lambda prompt, rehost: generate_image(prompt, rehost, cancel),
+                                               shot.prompt_imagen),
+            reference_path,
+        )
+        self._record_latency("image", started, shot)
+        shot.image_candidates = candidate.submitted
+        shot.image_score = round(candidate.score.value, 3)
+        if not candidate.score.ok:
+            self.logger.warning(f"No image candidate passed the quality checks, using the best one: "
+                                f"{', '.join(candidate.score.problems)}")
+        return candidate.image, candidate.prompt
+
+    def _verify_images(self, shot: Shot) -> None:
+        """Keyframes must decode before any video is generated from them."""
+        if self.media_verifier is None:
+            return
+        for path in filter(None, [shot.image_path, shot.image_last_path]):
+            report = self.media_verifier.verify_image(path)
+            if not report.ok:
+                raise MediaVerificationError(f"Invalid keyframe: {'; '.join(report.problems)}")
+
+    def _verify_video(self, shot: Shot) -> None:
+        """Checks the saved video; a corrupt download is fetched again from its result URL, not regenerated."""
+        if self.media_verifier is None:
+            return
+        report = self.media_verifier.verify_video(shot.video_path, shot.duracion_seg, shot.video_source_url,
+                                                  self.fs.download)
+        if not report.ok:
+            raise MediaVerificationError(f"Invalid video: {'; '.join(report.problems)}")
+        shot.video_duration_sec = round(report.video.duration_sec, 3)
+        shot.media_warnings = list(report.warnings) or None
+        for warning in report.warnings:
+            self.logger.warning(f"Video of shot {shot.shot_id}: {warning}")
+
+    def _quality_check(self, shot: Shot) -> None:
+        """
+        Content QC of Veo videos (local renders are deterministic). A failing clip is flagged in the
+        shot metadata; with QC_ACTION=requeue it is generated again, up to QC_MAX_REQUEUES times.
+        """
+        if self.video_qc is None or shot.video_rendered_by != VideoEngine.VEO:
+            return
+        requeues = Config.QC_MAX_REQUEUES if Config.QC_ACTION == "requeue" else 0
+        for attempt in range(requeues + 1):
+            try:
+                report = self.video_qc.check(shot.video_path)
+            except MediaProcessingError as e:
+                self.logger.warning(f"Could not run QC on the video of shot {shot.shot_id}: {e}")
+                return
+            shot.qc_passed, shot.qc_reasons, shot.qc_stats = report.passed, list(report.reasons) or None, report.stats
+            if report.passed:
+                return
+            if attempt == requeues:
+                break
+            self.logger.warning(f"Video of shot {shot.shot_id} failed QC ({'; '.join(report.reasons)}), "
+                                f"generating it again")
+            metrics.incr("video.qc.requeued")
+            shot.video_path = self._produce_video(shot)
+            self._verify_video(shot)
+            if shot.video_rendered_by != VideoEngine.VEO:
+                shot.qc_passed = shot.qc_reasons = shot.qc_stats = None
+                return
+        self.logger.warning(f"Video of shot {shot.shot_id} flagged by QC: {'; '.join(report.reasons)}")
+
+    def _conform_duration(self, shot: Shot) -> None:
+        """
+        Trims or loops the video to duracion_seg by stream copy (see DurationConformer). The original
+        stays in video_path; assembly uses video_conformed_path when there is one.
+        """
+        if self.duration_conformer is None:
+            return
+        shot.video_conformed_path = shot.video_conformed_sec = None
+        try:
+            result = self.duration_conformer.conform(shot.video_path, shot.duracion_seg,
+                                                     self.fs.conformed_video_path(shot))
+        except MediaProcessingError as e:
+            self.logger.warning(f"Could not conform the video of shot {shot.shot_id} to {shot.duracion_seg}s: {e}")
+            return
+        if result is None:
+            return
+        shot.video_conformed_path, shot.video_conformed_sec = result.path, result.duration_sec
+        self.logger.info(f"Video {result.action} to {result.duration_sec}s "
+                         f"({result.reencoded_sec}s re-encoded) in {result.path}")
+
+    def _produce_video(self, shot: Shot) -> str:
+        """Veo video saved to the shot folder; with video_engine=AUTO, rendered locally if Veo takes too long."""
+        fallback = shot.video_engine == VideoEngine.AUTO and self.motion_renderer is not None
+        try:
+            vid_url = self._generate_video(shot, max_wait_sec=Config.VEO_QUEUE_TIMEOUT_SEC if fallback else None)
+        except VideoQueueTimeout as e:
+            if not fallback:
+                raise
+            self.logger.warning(f"{e}: rendering the camera move locally instead")
+            return self._render_local(shot)
+        shot.video_rendered_by = VideoEngine.VEO
+        return self.fs.save_video(shot, vid_url)
+
+    def _render_local(self, shot: Shot) -> str:
+        """Ken Burns render of shot.camera_move over the generated image (no Kie.ai call)."""
+        if self.motion_renderer is None:
+            raise Exception("video_engine LOCAL requires a local motion renderer")
+        started = time.perf_counter()
+        path = self.motion_renderer.render(shot.image_path, shot.camera_move, shot.duracion_seg,
+                                           self.fs.video_output_path(shot))
+        self._record_latency("video_local", started, shot)
+        shot.video_rendered_by = VideoEngine.LOCAL
+        return path
+
+    def _generate_video(self, shot: Shot, max_wait_sec: float = None) -> str:
+        """Runs Veo with automatic remediation."""
+        model = tier_settings(shot.quality_tier).video_model
+        extra = {}
+        if shot.asset_mode == AssetMode.IMAGE_2F_VIDEO:
+            extra["last_image_path"] = shot.image_last_path
+        if max_wait_sec is not None:
+            # Only AUTO shots bound the wait (the Veo task itself keeps running on Kie.ai)
+            extra["max_wait_sec"] = max_wait_sec
+        started = time.perf_counter()
+        vid_url, shot.prompt_video = self.remediator.run(
+            "video",
+            lambda prompt, rehost: self.video_client.generate(shot.image_path, prompt, rehost=rehost, model=model,
+                                                              **extra),
+            shot.prompt_video,
+        )
+        self._record_latency("video", started, shot)
+        return vid_url
+
+    def _record_latency(self, stage: str, started: float, shot: Shot) -> None:
+        """Stage timings feed the dry-run planner's wall time projections."""
+        if self.latency_store is not None:
+            self.latency_store.record(latency_stage(stage, shot.quality_tier), time.perf_counter() - started)
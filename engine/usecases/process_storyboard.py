@@ -0,0 +1,214 @@
+import contextvars
+import heapq
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+from pydantic import BaseModel
+
+from domain.entities import Shot, ShotEstado
+from infra.config import Config
+from infra.metrics import metrics
+from usecases.assemble_video import clip_path
+from usecases.shot_graph import ShotGraph, prior_cost
+
+
+class ShotOutcome(BaseModel):
+    """Result of one shot in a storyboard run"""
+    shot: Shot
+    skipped: bool = False  # unchanged inputs and valid artifacts: previous result reused
+
+
+class StoryboardResult(BaseModel):
+    """Result of processing a storyboard"""
+    video_id: str
+    processed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    shots: List[ShotOutcome] = []
+
+
+class ProcessStoryboard:
+    """
+    Processes every shot of a storyboard, reusing the previous result of shots whose input
+    fingerprint did not change and whose artifacts are still on disk. Only edited shots
+    (or shots that failed / lost their files) are generated again.
+
+    Shots run as a dependency graph (usecases/shot_graph.py): a shot starts as soon as its parents
+    are done, and free workers take the ready shot with the longest critical path first. A shot is
+    regenerated whenever one of its parents is; a failed shot only cancels its descendants.
+    `continuity` shots start from the last frame of the shot they continue (extracted through `frame_cache`).
+    With `share_keyframes`, shots with identical image inputs reuse the first one's keyframe (hardlinked)
+    and start their video stage as soon as that image is ready.
+    """
+
+    def __init__(self, process_shot, fs, fingerprinter, logger, concurrency: Optional[int] = None,
+                 frame_cache=None, share_keyframes: Optional[bool] = None, media_verifier=None):
+        self.process_shot = process_shot
+        self.fs = fs
+        self.fingerprinter = fingerprinter
+        self.logger = logger
+        self.concurrency = concurrency or Config.BATCH_CONCURRENCY
+        self.frame_cache = frame_cache
+        self.media_verifier = media_verifier
+        self.share_keyframes = Config.SHARED_KEYFRAMES_ENABLED if share_keyframes is None else share_keyframes
+
+    def graph(self, shots: List[Shot]) -> ShotGraph:
+        return ShotGraph.from_storyboard(shots, share_keyframes=self.share_keyframes)
+
+    def execute(self, video_id: str, shots: List[Shot], force: bool = False) -> StoryboardResult:
+        outcomes: List[Optional[ShotOutcome]] = [None] * len(shots)
+        graph = self.graph(shots)
+        pending: Set[int] = set()
+        for i in graph.topological_order():
+            upstream_changed = bool(graph.parents[i] & pending)
+            previous = None if force or upstream_changed else self.reusable_result(shots[i])
+            if previous is not None:
+                outcomes[i] = ShotOutcome(shot=previous, skipped=True)
+            else:
+                pending.add(i)
+
+        self.logger.info(f"Storyboard {video_id}: {len(shots) - len(pending)} unchanged, {len(pending)} to process")
+        if pending:
+            self._run_graph(graph, shots, pending, outcomes)
+
+        result = StoryboardResult(video_id=video_id, shots=outcomes)
+        for outcome in outcomes:
+            if outcome.skipped:
+                result.skipped += 1
+            elif outcome.shot.estado == ShotEstado.COMPLETADO:
+                result.processed += 1
+            else:
+                result.failed += 1
+        metrics.incr("storyboard.shots", result.skipped, result="skipped")
+        metrics.incr("storyboard.shots", result.processed, result="processed")
+        metrics.incr("storyboard.shots", result.failed, result="failed")
+        return result
+
+    def _run_graph(self, graph: ShotGraph, shots: List[Shot], pending: Set[int],
+                   outcomes: List[Optional[ShotOutcome]]) -> None:
+        own_image = [i not in graph.continues and i not in graph.shares_keyframe for i in range(len(shots))]
+        priority = graph.critical_path([prior_cost(shot, own_image[i]) for i, shot in enumerate(shots)],
+                                       [Config.LATENCY_PRIOR_IMAGE_SEC if own else 0.0 for own in own_image])
+        waiting_on = {i: len(graph.parents[i] & pending) for i in pending}
+        ready = [(-priority[i], i) for i in pending if waiting_on[i] == 0]
+        heapq.heapify(ready)
+        # Keyframes of the shots already done (reused) plus the ones announced by running shots
+        images: Dict[int, str] = {i: o.shot.image_path for i, o in enumerate(outcomes) if o is not None}
+        events: "queue.Queue" = queue.Queue()  # ("image", i, path) | ("done", i, future)
+        started: Set[int] = set()
+        running = 0
+
+        def release(parent: int, children) -> None:
+            for child in children:
+                if child in pending and outcomes[child] is None:
+                    waiting_on[child] -= 1
+                    if waiting_on[child] == 0:
+                        heapq.heappush(ready, (-priority[child], child))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="storyboard") as pool:
+            while ready or running:
+                while ready and running < self.concurrency:
+                    _, i = heapq.heappop(ready)
+                    started.add(i)
+                    running += 1
+                    on_image = None
+                    if any((i, child) in graph.image_edges for child in graph.children[i]):
+                        on_image = lambda path, i=i: events.put(("image", i, path))
+                    # Each shot runs in a copy of the caller's context (retry scopes are context variables)
+                    future = pool.submit(contextvars.copy_context().run, self._run_shot, i, shots, graph, outcomes,
+                                         images, on_image)
+                    future.add_done_callback(lambda f, i=i: events.put(("done", i, f)))
+
+                kind, i, payload = events.get()
+                image_children = [c for c in graph.children[i] if (i, c) in graph.image_edges]
+                if kind == "image":
+                    images[i] = payload
+                    release(i, image_children)
+                    continue
+                running -= 1
+                outcomes[i] = ShotOutcome(shot=payload.result())
+                if outcomes[i].shot.estado != ShotEstado.COMPLETADO:
+                    self._cancel_descendants(i, graph, shots, outcomes, started)
+                    continue
+                if i not in images:
+                    # Finished without announcing its image: release the shots waiting for it now
+                    images[i] = outcomes[i].shot.image_path
+                    release(i, image_children)
+                release(i, [c for c in graph.children[i] if (i, c) not in graph.image_edges])
+
+    def _run_shot(self, i: int, shots: List[Shot], graph: ShotGraph, outcomes: List[Optional[ShotOutcome]],
+                  images: Dict[int, str], on_image_ready=None) -> Shot:
+        shot = shots[i]
+        kwargs = {"on_image_ready": on_image_ready} if on_image_ready is not None else {}
+        owner = graph.shares_keyframe.get(i)
+        if owner is not None:
+            shot.keyframe_from = shots[owner].shot_id
+            return self.process_shot.execute(shot, keyframe_path=images[owner], **kwargs)
+        source = graph.continues.get(i)
+        keyframe = self._continuity_frame(outcomes[source].shot) if source is not None else None
+        if keyframe is None:
+            return self.process_shot.execute(shot, **kwargs)
+        shot.continuity_from = shots[source].shot_id
+        return self.process_shot.execute(shot, keyframe_path=keyframe, **kwargs)
+
+    def _cancel_descendants(self, failed: int, graph: ShotGraph, shots: List[Shot],
+                            outcomes: List[Optional[ShotOutcome]], started: Set[int]) -> None:
+        """
+        Fails the shots depending on `failed`. Shots already started (released by its image) run on,
+        and so do the shots depending on them: those are settled when they finish.
+        """
+        stack = [child for child in graph.children[failed] if child not in started]
+        while stack:
+            i = stack.pop()
+            if outcomes[i] is None:
+                stack.extend(child for child in graph.children[i] if child not in started)
+                shots[i].estado = ShotEstado.ERROR
+                shots[i].error_message = f"Depends on shot {shots[failed].shot_id}, which failed"
+                outcomes[i] = ShotOutcome(shot=shots[i])
+
+    def _continuity_frame(self, previous: Shot) -> Optional[str]:
+        """
+        Last frame of the previous shot's video as it appears in the cut (conformed to duracion_seg when
+        it was, see clip_path); its image for stills. None to generate a fresh keyframe.
+        """
+        if not previous.video_path:
+            return previous.image_path
+        if self.frame_cache is None:
+            return None
+        try:
+            return self.frame_cache.last_frame(clip_path(previous))
+        except Exception as e:
+            self.logger.warning(f"Could not extract the last frame of shot {previous.shot_id}, "
+                                f"generating a keyframe instead: {e}")
+            return None
+
+    def reusable_result(self, shot: Shot, verify: bool = True) -> Optional[Shot]:
+        """
+        Previous result of the shot if its inputs are unchanged and its files are valid.
+        With a media verifier (and `verify`), files are fully verified and a corrupt video is
+        downloaded again from its result URL rather than regenerated.
+        """
+        try:
+            previous = self.fs.load_metadata(shot.video_id, shot.block_id, shot.shot_id, shot.quality_tier)
+        except Exception as e:
+            self.logger.warning(f"Unreadable metadata for shot {shot.shot_id}, reprocessing: {e}")
+            return None
+        if previous is None or previous.estado != ShotEstado.COMPLETADO or not previous.input_fingerprint:
+            return None
+        if previous.input_fingerprint != self.fingerprinter.fingerprint(shot):
+            return None
+        if previous.qc_passed is False and Config.QC_ACTION == "requeue":
+            self.logger.warning(f"Video of shot {shot.shot_id} failed QC, reprocessing")
+            return None
+        if verify and self.media_verifier is not None:
+            # Also catches what has_valid_artifacts does (missing files, error text in place of media)
+            report = self.media_verifier.verify_shot(previous, download=self.fs.download)
+            if not report.ok:
+                self.logger.warning(f"Artifacts of shot {shot.shot_id} failed verification, reprocessing: "
+                                    f"{'; '.join(report.problems)}")
+                return None
+        elif not self.fs.has_valid_artifacts(previous):
+            self.logger.warning(f"Artifacts of shot {shot.shot_id} are missing or invalid, reprocessing")
+            return None
+        return previous
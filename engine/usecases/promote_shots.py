@@ -0,0 +1,66 @@
+from typing import List, Tuple
+
+from pydantic import BaseModel
+
+from domain.entities import QualityTier, Shot, ShotEstado
+
+
+class ShotRef(BaseModel):
+    """Identifies a shot of a video"""
+    block_id: str
+    shot_id: str
+
+
+class PromoteShots:
+    """
+    Re-renders approved DRAFT shots at FINAL quality. The final shot is rebuilt from the draft's
+    saved inputs (prompts are regenerated, as on a normal run), so it gets the same fingerprint a
+    FINAL storyboard run would, and shots already rendered at FINAL from the same inputs are skipped.
+    """
+
+    def __init__(self, storyboard, fs):
+        self.storyboard = storyboard
+        self.fs = fs
+
+    def load_drafts(self, video_id: str, refs: List[ShotRef]) -> Tuple[List[Shot], List[ShotRef]]:
+        """Approved drafts ready to promote, and the refs without a completed draft."""
+        drafts, missing = [], []
+        for ref in refs:
+            draft = self.fs.load_metadata(video_id, ref.block_id, ref.shot_id, QualityTier.DRAFT)
+            if draft is None or draft.estado != ShotEstado.COMPLETADO:
+                missing.append(ref)
+            else:
+                drafts.append(draft)
+        return drafts, missing
+
+    def execute(self, video_id: str, drafts: List[Shot]):
+        finals = [self._as_final(draft) for draft in drafts]
+        return self.storyboard.execute(video_id, finals)
+
+    @staticmethod
+    def _as_final(draft: Shot) -> Shot:
+        return draft.model_copy(update={
+            "quality_tier": QualityTier.FINAL,
+            "prompt_imagen": None,
+            "prompt_video": None,
+            "prompt_imagen_last": None,
+            "image_path": None,
+            "image_last_path": None,
+            "continuity_from": None,
+            "keyframe_from": None,
+            "image_candidates": None,
+            "image_score": None,
+            "video_path": None,
+            "video_source_url": None,
+            "video_duration_sec": None,
+            "video_conformed_path": None,
+            "video_conformed_sec": None,
+            "media_warnings": None,
+            "qc_passed": None,
+            "qc_reasons": None,
+            "qc_stats": None,
+            "video_rendered_by": None,
+            "estado": ShotEstado.PENDIENTE,
+            "error_message": None,
+            "input_fingerprint": None,
+        })
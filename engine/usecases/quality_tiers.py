@@ -0,0 +1,23 @@
+from typing import NamedTuple
+
+from domain.entities import QualityTier
+from infra.config import Config
+
+
+class TierSettings(NamedTuple):
+    """Kie.ai models/settings used to render a quality tier"""
+    image_model: str
+    image_resolution: str
+    video_model: str
+
+
+def tier_settings(tier: QualityTier) -> TierSettings:
+    if tier == QualityTier.DRAFT:
+        return TierSettings(Config.KIE_DRAFT_NANO_BANANA_MODEL, Config.KIE_DRAFT_IMAGE_RESOLUTION,
+                            Config.KIE_DRAFT_VEO_MODEL)
+    return TierSettings(Config.KIE_NANO_BANANA_MODEL, Config.KIE_IMAGE_RESOLUTION, Config.KIE_VEO_MODEL)
+
+
+def latency_stage(stage: str, tier: QualityTier) -> str:
+    """Latency store key of a stage: drafts run on other models, so they are timed apart."""
+    return stage if tier == QualityTier.FINAL else f"{stage}_{tier.value.lower()}"
@@ -7,6 +7,21 @@ class RegenerateShot:
     def execute(self, shot: Shot) -> Shot:
         shot.prompt_imagen = None
         shot.prompt_video = None
+        shot.prompt_imagen_last = None
         shot.image_path = None
+        shot.image_last_path = None
+        shot.continuity_from = None
+        shot.keyframe_from = None
+        shot.image_candidates = None
+        shot.image_score = None
         shot.video_path = None
+        shot.video_source_url = None
+        shot.video_duration_sec = None
+        shot.video_conformed_path = None
+        shot.video_conformed_sec = None
+        shot.media_warnings = None
+        shot.qc_passed = None
+        shot.qc_reasons = None
+        shot.qc_stats = None
+        shot.video_rendered_by = None
         return self.process_shot.execute(shot)
@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+from domain.failures import KieFailure, RemediationAction, REMEDIATIONS
+from infra.config import Config
+from infra.metrics import metrics
+from infra.retry import RetryPolicy, charge_retry_budget
+
+T = TypeVar("T")
+
+
+class FailureStats:
+    """Thread-safe counters of classified Kie.ai failures and their remediation outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._codes: Dict[str, int] = {}
+
+    def record(self, failure: KieFailure, outcome: str) -> None:
+        """outcome: 'remediated' (resubmitted), 'gave_up' or 'recovered'."""
+        key = failure.category.value
+        with self._lock:
+            entry = self._stats.setdefault(key, {"failures": 0, "remediated": 0, "recovered": 0, "gave_up": 0})
+            if outcome != "recovered":
+                entry["failures"] += 1
+                code_key = f"{failure.source}:{failure.fail_code or '-'}"
+                self._codes[code_key] = self._codes.get(code_key, 0) + 1
+            entry[outcome] += 1
+        metrics.incr("kie.failures", source=failure.source, category=key, outcome=outcome)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "taxonomy": {category.value: action.value for category, action in REMEDIATIONS.items()},
+                "categories": {k: dict(v) for k, v in self._stats.items()},
+                "codes": dict(self._codes),
+            }
+
+
+# Process-wide stats, exposed through GET /failures/stats
+failure_stats = FailureStats()
+
+
+class FailureRemediator:
+    """
+    Runs a generation call and, when Kie.ai reports a classified task failure,
+    applies the category's automatic action before resubmitting:
+    - CONTENT_POLICY: sanitize the prompt
+    - BAD_REFERENCE: re-host the reference image
+    - CAPACITY: back off
+    - INTERNAL / UNKNOWN: give up immediately
+    """
+
+    def __init__(self, prompt_service, logger, max_rounds: Optional[int] = None,
+                 policy: Optional[RetryPolicy] = None, stats: Optional[FailureStats] = None):
+        self.prompt_service = prompt_service
+        self.logger = logger
+        self.max_rounds = max_rounds if max_rounds is not None else Config.KIE_MAX_REMEDIATIONS
+        self.policy = policy or RetryPolicy(base_delay=Config.REMEDIATION_BACKOFF_SEC)
+        self.stats = stats or failure_stats
+
+    def run(self, stage: str, attempt: Callable[[str, bool], T], prompt: str) -> Tuple[T, str]:
+        """
+        Calls `attempt(prompt, rehost)` until it succeeds or the failure cannot be remediated.
+        Returns the result and the prompt that produced it (it may have been sanitized).
+        """
+        rehost = False
+        last_failure: Optional[KieFailure] = None
+
+        for round_ in range(self.max_rounds + 1):
+            try:
+                result = attempt(prompt, rehost)
+                if last_failure is not None:
+                    self.stats.record(last_failure, "recovered")
+                return result, prompt
+            except Exception as e:
+                failure = getattr(e, "failure", None)
+                if failure is None:
+                    raise
+
+                action = REMEDIATIONS[failure.category]
+                self.logger.warning(f"{stage} task failed ({failure.category.value}, code={failure.fail_code}): "
+                                    f"{failure.fail_msg} -> {action.value}")
+
+                if action == RemediationAction.GIVE_UP or round_ == self.max_rounds or not charge_retry_budget():
+                    self.stats.record(failure, "gave_up")
+                    raise
+
+                if action == RemediationAction.SANITIZE_PROMPT:
+                    sanitized = self.prompt_service.sanitize_prompt(prompt)
+                    if sanitized == prompt:
+                        # Nothing we know how to remove: resubmitting would fail the same way
+                        self.stats.record(failure, "gave_up")
+                        raise
+                    prompt = sanitized
+                elif action == RemediationAction.REHOST_REFERENCE:
+                    rehost = True
+                elif action == RemediationAction.BACKOFF:
+                    time.sleep(self.policy.compute_delay(round_))
+
+                self.stats.record(failure, "remediated")
+                last_failure = failure
@@ -0,0 +1,152 @@
+import heapq
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from domain.entities import AssetMode, Shot, VideoEngine
+from infra.config import Config
+
+
+def prior_cost(shot: Shot, generates_image: bool = True) -> float:
+    """Rough duration of a shot from the configured stage priors, used to rank shots by critical path."""
+    cost = Config.LATENCY_PRIOR_IMAGE_SEC if generates_image or shot.asset_mode == AssetMode.IMAGE_2F_VIDEO else 0.0
+    if shot.video_engine == VideoEngine.LOCAL:
+        cost += Config.LATENCY_PRIOR_VIDEO_LOCAL_SEC
+    elif shot.asset_mode != AssetMode.STILL_ONLY:
+        cost += Config.LATENCY_PRIOR_VIDEO_SEC
+    return cost
+
+
+def keyframe_key(shot: Shot) -> Optional[Tuple]:
+    """
+    Everything a shot's (first) keyframe depends on: shots with the same key get the same image whatever
+    their camera_move / duracion_seg. None for shots whose keyframe comes from elsewhere (continuity)
+    or that need a keyframe pair of their own (IMAGE_2F_VIDEO).
+    """
+    if shot.continuity or shot.asset_mode == AssetMode.IMAGE_2F_VIDEO:
+        return None
+    return (shot.mv_context, shot.descripcion_visual.strip(), (shot.funcion_narrativa or "").strip(),
+            shot.asset_id, shot.prompt_imagen, shot.quality_tier)
+
+
+class ShotGraph:
+    """
+    Dependencies between the shots of a storyboard, by index in the storyboard list.
+    A shot runs once all its parents are done; a failed shot cancels its descendants only.
+
+    Edges come from:
+    - continuity: a `continuity` shot depends on the previous shot of its block (`continues` maps it to that shot)
+    - shared keyframes: shots with the same keyframe_key reuse the image of the first of them
+      (`shares_keyframe` maps them to it). They only wait for that image, not for its video:
+      these edges are released as soon as the parent's image is ready (`image_edges`).
+    Shots that merely share an asset need no edge: concurrent variant renders of one asset are already
+    collapsed into one job by the variant cache.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.parents: List[Set[int]] = [set() for _ in range(size)]
+        self.children: List[Set[int]] = [set() for _ in range(size)]
+        self.image_edges: Set[Tuple[int, int]] = set()
+        self.continues: Dict[int, int] = {}
+        self.shares_keyframe: Dict[int, int] = {}
+
+    @classmethod
+    def from_storyboard(cls, shots: Sequence[Shot], share_keyframes: bool = False) -> "ShotGraph":
+        graph = cls(len(shots))
+        last_in_block: Dict[str, int] = {}
+        keyframe_owner: Dict[Tuple, int] = {}
+        for i, shot in enumerate(shots):
+            previous = last_in_block.get(shot.block_id)
+            if shot.continuity and previous is not None:
+                graph.continues[i] = previous
+                graph.add_edge(previous, i)
+            elif share_keyframes and keyframe_key(shot) is not None:
+                owner = keyframe_owner.setdefault(keyframe_key(shot), i)
+                if owner != i:
+                    graph.shares_keyframe[i] = owner
+                    graph.add_edge(owner, i, on_image=True)
+            last_in_block[shot.block_id] = i
+        return graph
+
+    def add_edge(self, parent: int, child: int, on_image: bool = False) -> None:
+        """`child` waits for `parent` to finish, or only for its image with `on_image`."""
+        self.parents[child].add(parent)
+        self.children[parent].add(child)
+        if on_image:
+            self.image_edges.add((parent, child))
+
+    def topological_order(self) -> List[int]:
+        """Shots ordered so every parent comes before its children (storyboard order among independent ones)."""
+        remaining = [len(parents) for parents in self.parents]
+        ready = [i for i in range(self.size) if remaining[i] == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            node = heapq.heappop(ready)
+            order.append(node)
+            for child in self.children[node]:
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    heapq.heappush(ready, child)
+        if len(order) != self.size:
+            raise ValueError("Shot dependencies contain a cycle")
+        return order
+
+    def critical_path(self, durations: Sequence[float],
+                      image_durations: Optional[Sequence[float]] = None) -> List[float]:
+        """
+        For each shot: the time from its start until it and everything depending on it is done
+        (children behind an image edge start `image_durations[node]` after it).
+        """
+        image_durations = image_durations or durations
+        longest = [0.0] * self.size
+        for node in reversed(self.topological_order()):
+            longest[node] = durations[node]
+            for child in self.children[node]:
+                released = image_durations[node] if (node, child) in self.image_edges else durations[node]
+                longest[node] = max(longest[node], released + longest[child])
+        return longest
+
+    def descendants(self, node: int) -> Set[int]:
+        seen: Set[int] = set()
+        stack = list(self.children[node])
+        while stack:
+            child = stack.pop()
+            if child not in seen:
+                seen.add(child)
+                stack.extend(self.children[child])
+        return seen
+
+    def makespan(self, durations: Sequence[float], workers: int,
+                 image_durations: Optional[Sequence[float]] = None) -> float:
+        """
+        Wall time of running the graph on `workers` workers the way ProcessStoryboard does: whenever
+        a worker is free it takes the ready shot with the longest critical path. `image_durations`
+        is when each shot's image is ready, which releases its image edges.
+        """
+        image_durations = image_durations or durations
+        priority = self.critical_path(durations, image_durations)
+        remaining = [len(parents) for parents in self.parents]
+        ready = [(-priority[i], i) for i in range(self.size) if remaining[i] == 0]
+        heapq.heapify(ready)
+        events: List[tuple] = []  # (time, is_finish, node, child): a shot finishing, or an image edge released
+        running = 0
+        now = 0.0
+        while ready or events:
+            while ready and running < max(1, workers):
+                _, node = heapq.heappop(ready)
+                running += 1
+                heapq.heappush(events, (now + durations[node], 1, node, -1))
+                for child in self.children[node]:
+                    if (node, child) in self.image_edges:
+                        heapq.heappush(events, (now + image_durations[node], 0, node, child))
+            now, is_finish, node, child = heapq.heappop(events)
+            if is_finish:
+                running -= 1
+                released = [c for c in self.children[node] if (node, c) not in self.image_edges]
+            else:
+                released = [child]
+            for child in released:
+                remaining[child] -= 1
+                if remaining[child] == 0:
+                    heapq.heappush(ready, (-priority[child], child))
+        return now
@@ -1,3 +1,4 @@
+import re
 from domain.entities import Shot, Asset
 from typing import Optional
 
@@ -5,7 +6,52 @@ from typing import Optional
 IMAGE_STYLE = "cinematic, photorealistic, 8k, highly detailed, dramatic lighting, movie still"
 VIDEO_STYLE = "high quality, stable, 4k, cinematic motion, smooth transition"
 
+# Terms that commonly trip the providers' content filters. Removed when a task
+# fails with a content policy error (see usecases/remediation.py).
+SENSITIVE_TERMS = [
+    "blood", "bloody", "gore", "gory", "corpse", "dead body", "kill", "killing", "murder",
+    "weapon", "weapons", "gun", "guns", "rifle", "knife", "bomb", "explosion", "terror", "terrorist",
+    "violence", "violent", "suicide", "drug", "drugs", "cocaine", "nude", "naked", "sexy", "nsfw",
+]
+_SENSITIVE_RE = re.compile(r"\b(" + "|".join(re.escape(t) for t in SENSITIVE_TERMS) + r")\b", re.IGNORECASE)
+
+# Supported camera_move values and their wording in the video prompt
+CAMERA_MOVES = {
+    "static": "Static camera",
+    "zoom_in": "Slow zoom in",
+    "zoom_out": "Slow zoom out",
+    "dolly_in": "Smooth dolly in",
+    "dolly_out": "Smooth dolly out",
+    "orbit_left": "Orbiting left",
+    "orbit_right": "Orbiting right",
+    "pan_left": "Panning left",
+    "pan_right": "Panning right",
+    "tilt_up": "Tilting up",
+    "tilt_down": "Tilting down",
+    "handheld_subtle": "Subtle handheld camera movement"
+}
+
+# How the frame looks once each camera_move has played out (last keyframe of IMAGE_2F_VIDEO)
+CAMERA_MOVE_END_FRAMES = {
+    "static": "the same framing as the first frame",
+    "zoom_in": "a tighter framing, the subject filling more of the frame",
+    "zoom_out": "a wider framing that reveals more of the surroundings",
+    "dolly_in": "the camera closer to the subject, tighter framing with deeper perspective",
+    "dolly_out": "the camera further back, a wider framing with more of the environment",
+    "orbit_left": "the subject seen from a viewpoint rotated to the left around it",
+    "orbit_right": "the subject seen from a viewpoint rotated to the right around it",
+    "pan_left": "the framing moved to the left side of the scene",
+    "pan_right": "the framing moved to the right side of the scene",
+    "tilt_up": "the framing moved up to the upper part of the scene",
+    "tilt_down": "the framing moved down to the lower part of the scene",
+    "handheld_subtle": "almost the same framing, slightly offset as by a handheld camera"
+}
+
 class PromptService:
+    # Bump whenever the prompt templates below change: it is part of each shot's
+    # input fingerprint, so shots are regenerated with the new templates
+    TEMPLATE_VERSION = "2"
+
     def generate_image_prompt(self, shot: Shot, asset: Optional[Asset] = None) -> str:
         """
         Generates image prompt using V2 semantic fields.
@@ -34,6 +80,30 @@ class PromptService:
         prompt = f"{context_prefix}, {visual_desc}. {shot.funcion_narrativa}.{asset_anchor} {IMAGE_STYLE}"
         return prompt
 
+    def sanitize_prompt(self, prompt: str) -> str:
+        """
+        Removes terms likely to trigger content filters.
+        Returns the prompt unchanged if nothing was removed.
+        """
+        cleaned = _SENSITIVE_RE.sub("", prompt)
+        if cleaned == prompt:
+            return prompt
+        # Tidy up the gaps left behind
+        cleaned = re.sub(r"\s+([,.])", r"\1", cleaned)
+        cleaned = re.sub(r"\s{2,}", " ", cleaned).strip()
+        return cleaned
+
+    def generate_last_frame_prompt(self, shot: Shot, first_prompt: str) -> str:
+        """
+        Prompt for the last keyframe of an IMAGE_2F_VIDEO shot: the first frame's prompt plus
+        where the camera move ends, so both images depict the same scene.
+        """
+        raw_move = (shot.camera_move or "static").strip().lower()
+        movement = CAMERA_MOVES.get(raw_move, raw_move)
+        end_frame = CAMERA_MOVE_END_FRAMES.get(raw_move, f"the framing at the end of the camera move ({raw_move})")
+        return (f"{first_prompt} Last frame of the shot, after {movement.lower()} for {shot.duracion_seg} seconds: "
+                f"{end_frame}. Same scene, subjects, lighting and style as the first frame.")
+
     def generate_video_prompt(self, shot: Shot) -> str:
         """
         Generates video prompt with camera movement and duration context.
@@ -43,22 +113,7 @@ class PromptService:
         raw_move = shot.camera_move.strip().lower()
         duration = shot.duracion_seg
         
-        move_map = {
-            "static": "Static camera",
-            "zoom_in": "Slow zoom in",
-            "zoom_out": "Slow zoom out",
-            "dolly_in": "Smooth dolly in",
-            "dolly_out": "Smooth dolly out",
-            "orbit_left": "Orbiting left", 
-            "orbit_right": "Orbiting right",
-            "pan_left": "Panning left",
-            "pan_right": "Panning right",
-            "tilt_up": "Tilting up",
-            "tilt_down": "Tilting down",
-            "handheld_subtle": "Subtle handheld camera movement"
-        }
-        
-        movement = move_map.get(raw_move, raw_move)
+        movement = CAMERA_MOVES.get(raw_move, raw_move)
         
         # Include duration hint for motion pacing
         prompt = f"{movement} of {visual_desc}, {duration} seconds duration. {VIDEO_STYLE}"